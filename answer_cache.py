@@ -0,0 +1,284 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+ANSWER_CACHE_PATH = './.answer_cache.sqlite'
+# question -> embedding and retrieved chunks, in memory only
+QUESTION_CACHE_ENTRIES = 4096
+QUESTION_CACHE_TTL = 24 * 60 * 60
+ANSWER_CACHE_ENTRIES = 1024
+ANSWER_CACHE_DISK_ENTRIES = 100_000
+ANSWER_CACHE_TTL = 7 * 24 * 60 * 60
+# cosine similarity at which two questions count as the same; rephrasings land around 0.95, related questions lower
+SEMANTIC_THRESHOLD = 0.95
+
+
+def normalize_question(question: str) -> str:
+    """Case, spacing and punctuation do not change the question; word order does."""
+    return ' '.join(re.findall(r"[\w+#'-]+", question.lower()))
+
+
+class QuestionCache:
+    """Normalized question -> query embedding and the chunks each retrieval returned for it.
+
+    LRU bounded, entries expire after `ttl`, and everything goes when the index version changes.
+    """
+
+    def __init__(self, max_entries: int = QUESTION_CACHE_ENTRIES, ttl: float = QUESTION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str, create: bool = False) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry['created_at'] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None and create:
+            entry = self._entries[key] = {'created_at': time.time(), 'vector': None, 'docs': {}}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get(self, question: str, field: str, retrieval=None):
+        """The cached 'vector', or the 'docs' for `retrieval` (e.g. (mode, k)); None on a miss."""
+        with self._lock:
+            entry = self._entry(normalize_question(question))
+            value = None
+            if entry is not None:
+                value = entry['vector'] if field == 'vector' else entry['docs'].get(retrieval)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, question: str, field: str, value, retrieval=None):
+        with self._lock:
+            entry = self._entry(normalize_question(question), create=True)
+            if field == 'vector':
+                entry['vector'] = value
+            else:
+                entry['docs'][retrieval] = value
+
+    def invalidate(self, version: str):
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AnswerStore:
+    """SQLite rows of (scope, question, unit embedding, answer) per index version.
+
+    One file serves every corpus: scopes start with the corpus they belong to
+    (see SemanticAnswerCache), and purging one corpus leaves the others alone.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_DISK_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # opened on first use: importing or constructing a DocumentQA must not create (or lock) the file
+        with self._lock:
+            if self._db is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS answer_cache (
+                        scope TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        index_version TEXT NOT NULL,
+                        question TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        answer TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (scope, key, index_version)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS answer_cache_created_at ON answer_cache (created_at)")
+                conn.commit()
+                self._db = conn
+            return self._db
+
+    def recent(self, scope: str, version: str, ttl: float, limit: int) -> List[Tuple[str, np.ndarray, str, float]]:
+        """(key, vector, answer, created_at) of the newest live rows, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, vector, answer, created_at FROM answer_cache "
+                "WHERE scope = ? AND index_version = ? AND created_at >= ? ORDER BY created_at DESC LIMIT ?",
+                (scope, version, time.time() - ttl, limit)
+            ).fetchall()
+        return [(key, np.frombuffer(vector, dtype=np.float32), answer, created_at) for key, vector, answer, created_at in reversed(rows)]
+
+    def put(self, scope: str, key: str, version: str, question: str, vector: np.ndarray, answer: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache (scope, key, index_version, question, vector, answer, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scope, key, version, question, vector.astype(np.float32).tobytes(), answer, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM answer_cache WHERE rowid IN "
+                "(SELECT rowid FROM answer_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def purge(self, scope_prefix: str, version: str, ttl: float = ANSWER_CACHE_TTL):
+        """Drops rows of scopes starting with `scope_prefix` built on other index versions, and every row older than `ttl`."""
+        with self._lock:
+            # a literal prefix: LIKE would treat '_' and '%' in paths as wildcards
+            self._conn.execute(
+                "DELETE FROM answer_cache WHERE (substr(scope, 1, length(?)) = ? AND index_version != ?) OR created_at < ?",
+                (scope_prefix, scope_prefix, version, time.time() - ttl)
+            )
+            self._conn.commit()
+
+
+class SemanticAnswerCache:
+    """Answers keyed by question embedding: a new question whose cosine similarity to a
+    cached one reaches `threshold` gets that answer.
+
+    Scopes (LLM and retrieval mode) never share answers, and neither do corpora:
+    `corpus` (the vector store's path) prefixes every scope, so caches of other
+    stores sharing the SQLite file keep their answers when this one's index
+    changes. The memory tier is an LRU of `max_entries` per scope in front of the
+    optional SQLite store; entries expire after `ttl` and are dropped when the
+    index version changes.
+    """
+
+    def __init__(self, store: Optional[AnswerStore] = None, corpus: str = '', threshold: float = SEMANTIC_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_ENTRIES, ttl: float = ANSWER_CACHE_TTL):
+        self.store = store
+        self.corpus = corpus
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # scope -> key -> (unit vector, answer, created_at)
+        self._scopes: Dict[str, OrderedDict] = {}
+        # scope -> (keys, stacked vectors), rebuilt after a change
+        self._matrices: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _stored_scope(self, scope: str) -> str:
+        return f'{self.corpus}|{scope}'
+
+    def _scope(self, scope: str) -> OrderedDict:
+        entries = self._scopes.get(scope)
+        if entries is None:
+            entries = self._scopes[scope] = OrderedDict()
+            if self.store is not None and self.version is not None:
+                for key, vector, answer, created_at in self.store.recent(self._stored_scope(scope), self.version, self.ttl, self.max_entries):
+                    entries[key] = (vector, answer, created_at)
+        return entries
+
+    def _matrix(self, scope: str, entries: OrderedDict):
+        if scope not in self._matrices:
+            keys = list(entries)
+            self._matrices[scope] = (keys, np.stack([entries[key][0] for key in keys]) if keys else None)
+        return self._matrices[scope]
+
+    def lookup(self, scope: str, question: str, vector) -> Optional[str]:
+        key = normalize_question(question)
+        with self._lock:
+            entries = self._scope(scope)
+            now = time.time()
+            expired = [cached for cached, (_, _, created_at) in entries.items() if now - created_at > self.ttl]
+            for cached in expired:
+                del entries[cached]
+            if expired:
+                self._matrices.pop(scope, None)
+
+            if key in entries:
+                entries.move_to_end(key)
+                self.exact_hits += 1
+                return entries[key][1]
+            keys, matrix = self._matrix(scope, entries)
+            if matrix is not None:
+                similarities = matrix @ _unit(vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entries.move_to_end(keys[best])
+                    self.semantic_hits += 1
+                    return entries[keys[best]][1]
+            self.misses += 1
+            return None
+
+    def put(self, scope: str, question: str, vector, answer: str):
+        key = normalize_question(question)
+        vector = _unit(vector)
+        with self._lock:
+            entries = self._scope(scope)
+            entries[key] = (vector, answer, time.time())
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._matrices.pop(scope, None)
+        if self.store is not None and self.version is not None:
+            self.store.put(self._stored_scope(scope), key, self.version, question, vector, answer)
+
+    def invalidate(self, version: str):
+        """Answers were built from another version of the index: forget them."""
+        with self._lock:
+            if version == self.version:
+                return
+            self._scopes.clear()
+            self._matrices.clear()
+            self.version = version
+        if self.store is not None:
+            self.store.purge(self._stored_scope(''), version, self.ttl)
+
+    def stats(self):
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+        }
+
+    def clear(self):
+        """Forget the in-memory answers (the disk store is left alone)."""
+        with self._lock:
+            self._scopes.clear()
+            self._matrices.clear()
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def default_answer_cache(corpus: str = '') -> Optional[SemanticAnswerCache]:
+    """`corpus` names what the answers are about, e.g. the vector store's path."""
+    if os.environ.get('ANSWER_CACHE', '1') == '0':
+        return None
+    return SemanticAnswerCache(AnswerStore(os.environ.get('ANSWER_CACHE_PATH', ANSWER_CACHE_PATH)), corpus)
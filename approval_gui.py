@@ -2,10 +2,12 @@ import tkinter as tk
 from tkinter import messagebox
 from tkhtmlview import HTMLLabel
 import markdown
+import time
 from langchain_ollama import ChatOllama
+from startup import Lazy
 
 
-llm = ChatOllama(model='smollm2:135m')
+llm = Lazy(lambda: ChatOllama(model='smollm2:135m'))
 
 class ApprovalGUI:
     def __init__(self, topic, content, section = None):
@@ -75,7 +77,7 @@ class ApprovalGUI:
     def improve_action(self):
         feedback = self.text_area.get("1.0", tk.END).strip()
         messagebox.showinfo("Improve", f"Content improving based on feedback: \n\n{feedback}")
-        response = llm.invoke(f"""
+        stream = llm.stream(f"""
             You are expert content generator.
             for the following topic, section and content, 
             improve the content based on user feedback
@@ -83,7 +85,17 @@ class ApprovalGUI:
             CONTENT: "{self.content}"
             FEEDBACK: "{feedback}
         """.strip())
-        self.content = response.content
+
+        # show the improved content as it is written
+        content = ''
+        last_render = time.monotonic()
+        for chunk in stream:
+            content += chunk.content
+            if time.monotonic() - last_render > 0.15:
+                self.html_label.set_html(markdown.markdown(content))
+                self.root.update_idletasks()
+                last_render = time.monotonic()
+        self.content = content
         self.update_content_label()
         self.text_area.delete("1.0", tk.END)
         messagebox.showinfo("Improve", f"Content improved!")
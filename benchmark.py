@@ -0,0 +1,791 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import types
+import typing
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from token_budget import count_tokens
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.join(ROOT, 'content_crator_agent')
+
+# latency profiles: 'zero' isolates graph overhead, 'default' approximates a small local model;
+# 'prefill' is extra LLM time in ms per 1000 prompt tokens
+PROFILES = {
+    'zero': {'llm': 'fixed:0', 'search': 'fixed:0', 'embed': 'fixed:0', 'prefill': '0'},
+    'default': {'llm': 'lognormal:40:0.4', 'search': 'lognormal:60:0.6', 'embed': 'fixed:5', 'prefill': '100'},
+}
+SECTION_COUNTS = [2, 4, 8]
+CONCURRENCY_LEVELS = [1, 4]
+CONDITIONAL_INPUTS = 64
+CONDITIONAL_CONCURRENCY = [1, 4, 16]
+BENCH_TOPIC = 'Benchmark Topic'
+# a mix of titles that the keyword router sends down every route, plus some it has to ask about
+TITLE_TEMPLATES = [
+    'History of {topic}', 'Latest trends in {topic}', 'Introduction to {topic}', 'Core ideas of {topic}',
+    'Architecture and market of {topic}', 'Benefits of {topic}', 'Notable people in {topic}', 'Future of {topic}',
+]
+DOCUMENT_PAGES = 50
+CORPUS_FILES = 8
+ASK_QUESTIONS = 20
+# pages each ask-stage question is about
+ASK_TOPICS = (1, 3)
+# context tokens of a model with room to spare, next to gemma3:4b's 1024
+ASK_LARGE_BUDGET = 2048
+RETRIEVAL_PAGES = 200
+RETRIEVAL_QUESTIONS = 100
+# synthetic clustered vectors for the index comparison: the fake embeddings are too uniform to cluster
+# sections of ~400 tokens (five paragraphs) synthesized into one note
+SYNTHESIS_SECTIONS = [8, 32]
+SYNTHESIS_SECTION_SENTENCES = 40
+# search results per section: snippets, one in ten about the section, of this many tokens in all
+COMPRESSION_RAW_TOKENS = [2000, 8000]
+COMPRESSION_TITLE = 'How photosynthesis works in chloroplasts'
+FILLER_WORDS = 'market stock weather football recipe travel music movie election garden'.split()
+# GUI entry points (label, module, directory): importing one is everything before its window is built
+ENTRY_POINTS = [('note.py', 'note', ROOT), ('main.py', 'main', ROOT), ('content_crator_agent/main.py', 'main', AGENT_DIR)]
+# what the entry points load behind the window
+DEFERRED_IMPORTS = [('note_taker', ROOT), ('note_graph, section_graph', AGENT_DIR)]
+COLD_START_BUDGET_MS = 500
+INDEX_VECTORS = 20_000
+INDEX_DIM = 128
+INDEX_QUERIES = 200
+INDEX_K = 10
+# trained index types learn from this many of the vectors (0: as many as document_analyzer would)
+INDEX_TRAIN_SAMPLE = 5_000
+INDEX_SWEEP = {
+    'flat': [None],
+    'ivf_flat': [1, 4, 16, 64],
+    'ivf_sq8': [1, 4, 16, 64],
+    'ivf_pq': [1, 4, 16, 64],
+    'hnsw': [16, 64, 256],
+}
+CONDITIONAL_SAMPLES = [
+    'Hello there!', 'What is a vector database?', 'Write a script that renames files',
+    'The last answer was great', 'hmm', 'Can you explain conditional edges?',
+]
+
+
+class Latency:
+    """A latency distribution, written as 'fixed:MS', 'uniform:LOW:HIGH' or 'lognormal:MEDIAN:SIGMA'.
+
+    Samples are keyed by the call's content, so a run draws the same delays
+    whatever order concurrent calls happen to be made in.
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(':')
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"unknown latency distribution {spec!r}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(param) for param in params]
+
+    def sample(self, key: str, seed: int) -> float:
+        rng = random.Random(f'{seed}:{key}')
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(*self.params)
+        else:
+            median, sigma = self.params
+            ms = rng.lognormvariate(0.0, sigma) * median
+        return ms / 1000.0
+
+
+def digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class FakeBackend:
+    """In-process stand-ins for Ollama (chat and embeddings), DuckDuckGo, Wikipedia and the approval GUI.
+
+    install() patches the model-call methods on the real classes, so every
+    instance (CachedChatOllama included) and every caller goes through the fakes.
+    Structured outputs are filled in from the schema: lists get `sections` titles,
+    literals and booleans a choice keyed by the prompt.
+    """
+
+    def __init__(self, llm: Latency, search: Latency, embed: Latency, sections: int = 4,
+                 response_words: int = 60, seed: int = 0, prefill_ms: float = 0.0):
+        self.llm = llm
+        self.prefill_ms = prefill_ms
+        self.search = search
+        self.embed = embed
+        self.sections = sections
+        self.response_words = response_words
+        self.seed = seed
+        self.calls = Counter()
+
+    def titles(self, topic: str = BENCH_TOPIC) -> List[str]:
+        return [
+            TITLE_TEMPLATES[i % len(TITLE_TEMPLATES)].format(topic=topic) + (f' ({i // len(TITLE_TEMPLATES) + 1})' if i >= len(TITLE_TEMPLATES) else '')
+            for i in range(self.sections)
+        ]
+
+    def respond(self, messages) -> tuple:
+        prompt = '\n'.join(str(getattr(message, 'content', message)) for message in messages)
+        key = digest(prompt)
+        self.calls['llm'] += 1
+        words = ' '.join(f'word{(int(key[:8], 16) + i) % 997}' for i in range(self.response_words))
+        prefill = count_tokens(prompt) / 1000 * self.prefill_ms / 1000
+        return f"Fake response {key[:12]}. {words}", self.llm.sample(key, self.seed) + prefill
+
+    def canned(self, schema, key: str):
+        rng = random.Random(f'{self.seed}:{schema.__name__}:{key}')
+        values = {}
+        for name, field in schema.model_fields.items():
+            annotation = field.annotation
+            origin = typing.get_origin(annotation)
+            if origin in (list, List):
+                values[name] = self.titles()
+            elif origin is typing.Literal:
+                values[name] = rng.choice(typing.get_args(annotation))
+            elif annotation is bool:
+                values[name] = rng.random() < 0.75
+            elif annotation is float:
+                values[name] = 0.9
+            else:
+                values[name] = f"{name.replace('_', ' ')} {key[:8]}"
+        return schema(**values)
+
+    def search_result(self, source: str, query: str) -> tuple:
+        key = digest(f'{source}:{query}')
+        self.calls[source] += 1
+        text = ' '.join(f'fact{(int(key[:8], 16) + i) % 991}' for i in range(120))
+        return f"{source} results for {query}: {text}", self.search.sample(key, self.seed)
+
+    def vector(self, text: str) -> List[float]:
+        vector = [0.0] * 64
+        for word in text.lower().split():
+            vector[int(digest(word)[:8], 16) % 64] += 1.0
+        return [value + 1e-3 for value in vector]
+
+    def install(self):
+        from langchain_core.messages import AIMessage, AIMessageChunk
+        from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+        from langchain_core.runnables import RunnableLambda
+        from langchain_ollama import ChatOllama, OllamaEmbeddings
+        from langchain_community.tools import DuckDuckGoSearchRun, WikipediaQueryRun
+
+        backend = self
+
+        def _generate(model, messages, stop=None, run_manager=None, **kwargs):
+            text, delay = backend.respond(messages)
+            time.sleep(delay)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(text))])
+
+        async def _agenerate(model, messages, stop=None, run_manager=None, **kwargs):
+            text, delay = backend.respond(messages)
+            await asyncio.sleep(delay)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(text))])
+
+        def _stream(model, messages, stop=None, run_manager=None, **kwargs):
+            text, delay = backend.respond(messages)
+            words = text.split(' ')
+            for word in words:
+                time.sleep(delay / len(words))
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + ' '))
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+        async def _astream(model, messages, stop=None, run_manager=None, **kwargs):
+            text, delay = backend.respond(messages)
+            words = text.split(' ')
+            for word in words:
+                await asyncio.sleep(delay / len(words))
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + ' '))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+        def with_structured_output(model, schema, **kwargs):
+            # still one model call (latency, callbacks, cache), then the canned object
+            return model | RunnableLambda(lambda message: backend.canned(schema, digest(message.content)))
+
+        ChatOllama._generate = _generate
+        ChatOllama._agenerate = _agenerate
+        ChatOllama._stream = _stream
+        ChatOllama._astream = _astream
+        ChatOllama.with_structured_output = with_structured_output
+
+        def search_tool(source: str):
+            def _run(tool, query: str, run_manager=None) -> str:
+                text, delay = backend.search_result(source, query)
+                time.sleep(delay)
+                return text
+
+            async def _arun(tool, query: str, run_manager=None) -> str:
+                text, delay = backend.search_result(source, query)
+                await asyncio.sleep(delay)
+                return text
+            return _run, _arun
+
+        DuckDuckGoSearchRun._run, DuckDuckGoSearchRun._arun = search_tool('duck_duck_go')
+        WikipediaQueryRun._run, WikipediaQueryRun._arun = search_tool('wikipedia')
+
+        def embed_documents(model, texts):
+            backend.calls['embed'] += 1
+            time.sleep(backend.embed.sample(digest('\n'.join(texts)), backend.seed))
+            return [backend.vector(text) for text in texts]
+
+        def embed_query(model, text):
+            return embed_documents(model, [text])[0]
+
+        async def aembed_documents(model, texts):
+            return embed_documents(model, texts)
+
+        async def aembed_query(model, text):
+            return embed_query(model, text)
+
+        OllamaEmbeddings.embed_documents = embed_documents
+        OllamaEmbeddings.embed_query = embed_query
+        OllamaEmbeddings.aembed_documents = aembed_documents
+        OllamaEmbeddings.aembed_query = aembed_query
+
+        class AutoApprovalGUI:
+            """Approves whatever it is shown, without opening a window."""
+
+            def __init__(self, topic, content, section=None):
+                self.topic = topic
+                self.content = content
+                self.section = section
+
+            def run(self):
+                backend.calls['approval'] += 1
+
+        class AutoReviewDesk:
+            """Approves every draft it is sent, as one window would, without opening it."""
+
+            def __init__(self, root=None):
+                self.reviewed = 0
+
+            def submit(self, topic, section, content):
+                if not self.reviewed:
+                    backend.calls['approval'] += 1
+                self.reviewed += 1
+                future = Future()
+                future.set_result(content)
+                return future
+
+        @contextlib.asynccontextmanager
+        async def review_desk_on_loop():
+            yield AutoReviewDesk()
+
+        approval_gui = types.ModuleType('approval_gui')
+        approval_gui.ApprovalGUI = AutoApprovalGUI
+        approval_gui.ReviewDesk = AutoReviewDesk
+        approval_gui.review_desk_on_loop = review_desk_on_loop
+        sys.modules['approval_gui'] = approval_gui
+
+
+def write_text_pdf(path: str, pages: List[str], line_chars: int = 95):
+    """Minimal text-only PDF (Helvetica, one content stream per page) that PyPDFLoader can read."""
+    def escape(line: str) -> str:
+        return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    body = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    }
+    kids = []
+    for i, text in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f'{page_id} 0 R')
+        lines = textwrap.wrap(text, line_chars)[:70] or ['']
+        stream = ('BT /F1 9 Tf 40 800 Td 11 TL ' + ' '.join(f"({escape(line)}) '" for line in lines) + ' ET').encode('latin-1', 'replace')
+        body[content_id] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+        body[page_id] = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>'
+        ).encode()
+    body[2] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(pages)} >>'.encode()
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for number in sorted(body):
+        offsets[number] = len(out)
+        out += b'%d 0 obj\n' % number + body[number] + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(body) + 1)
+    for number in range(1, len(body) + 1):
+        out += b'%010d 00000 n \n' % offsets[number]
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(body) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def document_page(i: int) -> str:
+    # shared boilerplate on every page plus text of its own, like a real manual
+    rng = random.Random(i)
+    words = ' '.join(f'term{rng.randrange(5000)}' for _ in range(450))
+    return f"Project documentation, chapter {i // 10 + 1}. Page {i}. {words} Confidential - do not distribute."
+
+
+def search_results(raw_tokens: int, seed: int = 0) -> Tuple[str, int]:
+    """DuckDuckGo and Wikipedia shaped raw_content, and how many snippets in it are about COMPRESSION_TITLE."""
+    rng = random.Random(seed)
+    snippets = []
+    while count_tokens(' '.join(snippets)) < raw_tokens:
+        i = len(snippets)
+        core = 'Photosynthesis converts light energy in the chloroplasts of plant leaves. ' if i % 10 == 3 else ''
+        snippets.append(f"Result {i}: {core}{' '.join(rng.choice(FILLER_WORDS) for _ in range(30))} is discussed here.")
+    half = len(snippets) // 2
+    wiki = '\n\n'.join(f"Page: Article {i}\nSummary: " + ' '.join(snippets[j:j + 6]) for i, j in enumerate(range(half, len(snippets), 6)))
+    raw = f"[DucDucGo search result]: {' '.join(snippets[:half])}\n\n[Wikipedia search result]: {wiki}"
+    return raw, sum(1 for snippet in snippets if 'Photosynthesis' in snippet)
+
+
+def subprocess_seconds(code: str, cwd: str = ROOT) -> float:
+    """Runs `code` in a fresh interpreter; it prints the seconds it measured."""
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+    return {
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(percentile(50) * 1000, 3),
+        'p95_ms': round(percentile(95) * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class Benchmark:
+    def __init__(self, backend: FakeBackend, profile: str, runs: int, warm: bool = False):
+        self.backend = backend
+        self.profile = profile
+        self.runs = runs
+        self.warm = warm
+        self.results = []
+        self._caches: List[Callable[[], None]] = []
+
+    def record(self, graph: str, case: dict, seconds: List[float], units: int = 1, extra: Optional[dict] = None):
+        """`units` is how many inputs one run processes (for throughput)."""
+        total = sum(seconds)
+        result = {
+            'graph': graph,
+            'profile': self.profile,
+            'case': case,
+            'runs': len(seconds),
+            'latency': summarize(seconds),
+            'throughput_per_s': round(units * len(seconds) / total, 3) if total else None,
+            'calls_per_run': {name: round(count / len(seconds), 2) for name, count in sorted(self.backend.calls.items())},
+        }
+        if extra:
+            result.update(extra)
+        self.results.append(result)
+        print(f"{graph:22} {self.profile:8} {json.dumps(case):48} p50 {result['latency']['p50_ms']:9.1f} ms  "
+              f"{result['throughput_per_s']}/s", file=sys.__stdout__)
+
+    def add_caches(self, *clears: Callable[[], None]):
+        for clear in clears:
+            if clear not in self._caches:
+                self._caches.append(clear)
+
+    def timed(self, run_once: Callable[[], None]) -> List[float]:
+        """Wall time of `runs` calls; caches are emptied before each one unless warm."""
+        self.backend.calls.clear()
+        seconds = []
+        for _ in range(self.runs):
+            if not self.warm:
+                for clear in self._caches:
+                    clear()
+            started = time.perf_counter()
+            run_once()
+            seconds.append(time.perf_counter() - started)
+        return seconds
+
+    def linear_workflow(self):
+        import linear_workflow
+        initial_state = {'messages': [], 'user_input': 'What is the weather like?', 'processing_step': 'initialized', 'result': ''}
+        self.record('linear_workflow', {}, self.timed(lambda: linear_workflow.app.invoke(initial_state)))
+
+    def conditional_workflow(self, inputs: int = CONDITIONAL_INPUTS, concurrency_levels=CONDITIONAL_CONCURRENCY):
+        import conditional_workflow
+        conditional_workflow.intent_classifier.folder_path = os.path.join(tempfile.mkdtemp(), 'intent_faiss_store')
+        workdir = tempfile.mkdtemp()
+        input_path = os.path.join(workdir, 'inputs.jsonl')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for i in range(inputs):
+                f.write(json.dumps({'id': i, 'user_input': f"{CONDITIONAL_SAMPLES[i % len(CONDITIONAL_SAMPLES)]} #{i}"}) + '\n')
+
+        for classifier in ('embedding', 'llm'):
+            conditional_workflow.INTENT_CLASSIFIER = classifier
+            for concurrency in concurrency_levels:
+                async def batch():
+                    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+                    return await conditional_workflow.run_batch(input_path, os.path.join(workdir, 'out.jsonl'), concurrency)
+
+                stats = {}
+                seconds = self.timed(lambda: stats.update(asyncio.run(batch())))
+                self.record('conditional_workflow', {'classifier': classifier, 'concurrency': concurrency, 'inputs': inputs},
+                            seconds, units=inputs, extra={'routes': stats['routes'], 'item_latency': stats['latency']})
+
+    def note_taker(self, section_counts=SECTION_COUNTS, concurrency_levels=CONCURRENCY_LEVELS):
+        import note_taker
+        note_taker.router.log_path = None
+        self.add_caches(note_taker.llm_cache.clear, note_taker.ddg_search.clear, note_taker.wkp_search.clear, note_taker.router.memory.clear)
+        for sections in section_counts:
+            self.backend.sections = sections
+            self.record('note_taker', {'sections': sections, 'mode': 'sequential'},
+                        self.timed(lambda: note_taker.run_note_taker(BENCH_TOPIC)))
+            for concurrency in concurrency_levels:
+                self.record('note_taker', {'sections': sections, 'mode': 'parallel', 'concurrency': concurrency},
+                            self.timed(lambda: note_taker.run_note_taker(BENCH_TOPIC, parallel=True, max_parallel_sections=concurrency)))
+
+    def compression(self, raw_sizes=COMPRESSION_RAW_TOKENS):
+        """Compressing search results and drafting from them, against drafting from everything."""
+        from langchain_ollama import ChatOllama
+        from compression import compress
+        llm = ChatOllama(model='smollm2:135m')
+        for raw_tokens in raw_sizes:
+            raw, relevant = search_results(raw_tokens)
+            for mode in ('off', 'bm25'):
+                kept = {}
+
+                def draft():
+                    content, kept['ratio'] = compress(raw, BENCH_TOPIC, COMPRESSION_TITLE, mode=mode)
+                    kept['prompt_tokens'] = count_tokens(content)
+                    kept['relevant_kept'] = content.count('Photosynthesis') / relevant
+                    llm.invoke(f'TOPIC: "{BENCH_TOPIC}"\nTITLE: "{COMPRESSION_TITLE}"\nRAW CONTENT: "{content}"')
+                seconds = self.timed(draft)
+                self.record('compression', {'raw_tokens': raw_tokens, 'mode': mode}, seconds, extra={
+                    'compression_ratio': round(kept['ratio'], 3),
+                    'prompt_tokens': kept['prompt_tokens'],
+                    'relevant_kept': round(kept['relevant_kept'], 3),
+                })
+
+    def synthesis(self, section_counts=SYNTHESIS_SECTIONS):
+        """One call over every section against the merge tree; prefill latency grows with the prompt."""
+        from langchain_ollama import ChatOllama
+        from synthesis import Synthesizer, section_parts
+        llm = ChatOllama(model='smollm2:135m')
+        for sections in section_counts:
+            parts = section_parts([
+                (f'Section title {i}', ' '.join(f'Point {i}.{j} of the section is made in this sentence.' for j in range(SYNTHESIS_SECTION_SENTENCES)))
+                for i in range(sections)
+            ])
+            for mode in ('single', 'hierarchical'):
+                synthesizer = Synthesizer(llm, mode=mode)
+                seconds = self.timed(lambda: synthesizer.run(BENCH_TOPIC, parts))
+                self.record('synthesis', {'sections': sections, 'mode': mode}, seconds, extra={
+                    key: synthesizer.stats[key] for key in ('levels', 'merge_calls', 'max_call_tokens')
+                })
+
+    def cold_start(self):
+        """Import time of each GUI entry point in a fresh interpreter, and of the graphs they load in the background."""
+        import startup
+        for label, module, cwd in ENTRY_POINTS:
+            seconds = [
+                subprocess_seconds(f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)", cwd)
+                for _ in range(self.runs)
+            ]
+            packages = startup.package_costs(startup.import_costs(module, cwd))
+            self.record('cold_start', {'entry': label}, seconds, extra={
+                'within_budget': summarize(seconds)['p50_ms'] <= COLD_START_BUDGET_MS,
+                'top_packages_ms': {package: round(self_us / 1000, 1) for package, self_us in list(packages.items())[:5]},
+            })
+        for modules, cwd in DEFERRED_IMPORTS:
+            self.record('cold_start', {'deferred': modules}, [
+                subprocess_seconds(f"import time; started = time.perf_counter(); import {modules}; print(time.perf_counter() - started)", cwd)
+                for _ in range(self.runs)
+            ])
+
+    def document_qa(self, pages: int = DOCUMENT_PAGES):
+        """Import cost in a fresh interpreter, then building, reopening and querying the index."""
+        import document_analyzer
+        workdir = tempfile.mkdtemp()
+        pdf = os.path.join(workdir, 'document.pdf')
+        write_text_pdf(pdf, [document_page(i) for i in range(pages)])
+
+        self.backend.calls.clear()
+        self.record('document_qa', {'stage': 'import'}, [
+            subprocess_seconds("import time; started = time.perf_counter(); import document_analyzer; print(time.perf_counter() - started)")
+            for _ in range(self.runs)
+        ])
+        self.record('document_qa', {'stage': 'construct'}, self.timed(lambda: document_analyzer.DocumentQA([pdf])))
+
+        stores = iter(range(1_000_000))
+        self.record('document_qa', {'stage': 'warm_cold_index', 'pages': pages},
+                    self.timed(lambda: document_analyzer.DocumentQA([pdf], os.path.join(workdir, f'store-{next(stores)}')).warm()), units=pages)
+        saved = os.path.join(workdir, 'store-0')
+        self.record('document_qa', {'stage': 'warm_saved_index', 'pages': pages},
+                    self.timed(lambda: document_analyzer.DocumentQA([pdf], saved).warm()))
+        # keyword questions about text that the first and second chunk of a page share (the splitter's overlap, around
+        # characters 800-1000), so retrieval brings back neighbouring chunks the way it does on real documents; a
+        # question about several pages asks about such text on each of them
+        rng = random.Random(self.backend.seed)
+        k = document_analyzer.RETRIEVAL_K
+        for topics in ASK_TOPICS:
+            questions = [[' '.join(document_page(rng.randrange(pages))[850:].split()[1:4]) for _ in range(topics)]
+                         for _ in range(ASK_QUESTIONS)]
+            # the raw top k chunks, then packed contexts from k and from more candidates, in the model's budget and in
+            # a larger one: the prompt tokens paid against how often the asked-about text reaches the prompt
+            for pack_context, candidates, context_tokens in ((False, k, None), (True, k, None),
+                                                             (True, document_analyzer.CONTEXT_CANDIDATES, None),
+                                                             (True, document_analyzer.CONTEXT_CANDIDATES, ASK_LARGE_BUDGET)):
+                qa = document_analyzer.DocumentQA([pdf], saved, cache_answers=False, pack_context=pack_context,
+                                                  context_candidates=candidates, context_tokens=context_tokens,
+                                                  retrieval_mode='bm25').warm()
+                self.add_caches(qa.question_cache.clear)
+                prompt_tokens = statistics.fmean(count_tokens(qa.prompt(' '.join(parts))) for parts in questions)
+                hit_rate = statistics.fmean(part in qa.context(' '.join(parts)) for parts in questions for part in parts)
+                self.record('document_qa', {'stage': 'ask', 'pages_asked': topics, 'pack_context': pack_context,
+                                            'candidates': candidates, 'context_tokens': context_tokens, 'retrieval': 'bm25'},
+                            self.timed(lambda: [qa.ask(' '.join(parts)) for parts in questions]), units=len(questions),
+                            extra={'prompt_tokens': round(prompt_tokens, 1), 'hit_rate': round(hit_rate, 3)})
+        question = 'What is the project about?'
+        # repeats and reorderings of an answered question (the fake embeddings ignore word order)
+        cached = document_analyzer.DocumentQA([pdf], saved).warm()
+        cached.ask('What is the project about?')
+        self.record('document_qa', {'stage': 'ask_repeat'}, self.timed(lambda: cached.ask('what is the project about')),
+                    extra={'answer_cache': cached.answer_cache.stats()})
+        self.record('document_qa', {'stage': 'ask_rephrased'}, self.timed(lambda: cached.ask('is the project about? What')),
+                    extra={'answer_cache': cached.answer_cache.stats()})
+
+        corpus = os.path.join(workdir, 'corpus')
+        os.makedirs(corpus)
+        for i in range(CORPUS_FILES):
+            write_text_pdf(os.path.join(corpus, f'document-{i}.pdf'), [document_page(i * pages + j) for j in range(pages // CORPUS_FILES or 1)])
+        for workers in sorted({1, os.cpu_count() or 1}):
+            stats = {}
+            seconds = self.timed(lambda: stats.update(document_analyzer.ingest_corpus(corpus, os.path.join(workdir, f'corpus-{next(stores)}'), workers)))
+            self.record('document_qa', {'stage': 'ingest_corpus', 'files': CORPUS_FILES, 'workers': workers}, seconds,
+                        units=stats['pages'], extra={'failed_files': len(stats['failed'])})
+
+    def retrieval(self, pages: int = RETRIEVAL_PAGES, questions: int = RETRIEVAL_QUESTIONS):
+        """Per-question latency and hit rate (a returned chunk contains the phrase asked about) of every retrieval mode."""
+        import document_analyzer
+        workdir = tempfile.mkdtemp()
+        pdf = os.path.join(workdir, 'document.pdf')
+        write_text_pdf(pdf, [document_page(i) for i in range(pages)])
+        qa = document_analyzer.DocumentQA([pdf], os.path.join(workdir, 'store'))
+        vector_store = qa.vector_store
+
+        self.backend.calls.clear()
+        started = time.perf_counter()
+        qa.keyword_index
+        qa.positions
+        self.record('retrieval', {'stage': 'keyword_index_build', 'chunks': vector_store.index.ntotal}, [time.perf_counter() - started])
+
+        # keyword questions: a short phrase lifted from a random chunk
+        rng = random.Random(self.backend.seed)
+        ids = list(vector_store.index_to_docstore_id.values())
+        phrases = []
+        for doc_id in rng.sample(ids, min(questions, len(ids))):
+            words = vector_store.docstore.search(doc_id).page_content.split()
+            start = rng.randrange(max(1, len(words) - 3))
+            phrases.append(' '.join(words[start:start + 3]))
+        for mode in document_analyzer.RETRIEVAL_MODES:
+            self.backend.calls.clear()
+            seconds, hits = [], 0
+            for phrase in phrases:
+                started = time.perf_counter()
+                docs = qa.retrieve(phrase, mode)
+                seconds.append(time.perf_counter() - started)
+                hits += any(phrase in doc.page_content for doc in docs)
+            self.record('retrieval', {'mode': mode, 'chunks': vector_store.index.ntotal, 'k': document_analyzer.RETRIEVAL_K},
+                        seconds, extra={'hit_rate': round(hits / len(phrases), 3)})
+
+    def faiss_index(self, vectors: int = INDEX_VECTORS, dim: int = INDEX_DIM, queries: int = INDEX_QUERIES, k: int = INDEX_K,
+                    train_sample: int = INDEX_TRAIN_SAMPLE):
+        """Recall@k against exact search vs per-query latency for every index type and nprobe/efSearch setting."""
+        import faiss
+        import numpy as np
+        import document_analyzer
+
+        rng = np.random.default_rng(self.backend.seed)
+        centers = rng.standard_normal((max(1, vectors // 500), dim)).astype(np.float32) * 4
+        def sample(n):
+            return centers[rng.integers(len(centers), size=n)] + rng.standard_normal((n, dim)).astype(np.float32)
+        data, query_vectors = sample(vectors), sample(queries)
+        exact = faiss.IndexFlatL2(dim)
+        exact.add(data)
+        _, truth = exact.search(query_vectors, k)
+        workdir = tempfile.mkdtemp()
+
+        self.backend.calls.clear()
+        for index_type, settings in INDEX_SWEEP.items():
+            started = time.perf_counter()
+            index, factory = document_analyzer.build_index(data, index_type, train_sample or document_analyzer.TRAIN_SAMPLE)
+            build_seconds = time.perf_counter() - started
+            path = os.path.join(workdir, f'{index_type}.faiss')
+            faiss.write_index(index, path)
+            for mmap in (False, True):
+                flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+                seconds = []
+                for _ in range(self.runs):
+                    started = time.perf_counter()
+                    faiss.read_index(path, flags)
+                    seconds.append(time.perf_counter() - started)
+                self.record('faiss_index', {'index': factory, 'stage': 'open', 'mmap': mmap, 'vectors': vectors}, seconds,
+                            extra={'bytes': os.path.getsize(path)})
+            for setting in settings:
+                if setting is not None:
+                    document_analyzer.tune_index(index, nprobe=setting, ef_search=setting)
+                seconds, hits = [], 0
+                for i in range(queries):
+                    # one query at a time, the way the retriever searches
+                    started = time.perf_counter()
+                    _, found = index.search(query_vectors[i:i + 1], k)
+                    seconds.append(time.perf_counter() - started)
+                    hits += len(set(found[0]) & set(truth[i]))
+                knob = {'hnsw': 'efSearch', 'flat': None}.get(index_type, 'nprobe')
+                case = {'index': factory, 'stage': 'search', 'vectors': vectors, **({knob: setting} if knob else {})}
+                self.record('faiss_index', case, seconds, extra={
+                    f'recall_at_{k}': round(hits / (queries * k), 4),
+                    'build_s': round(build_seconds, 3),
+                    'train_sample': min(vectors, train_sample or document_analyzer.TRAIN_SAMPLE),
+                })
+
+    def _agent_modules(self, max_sections: int):
+        import config
+        import section_graph
+        import note_graph
+        from scheduler import SectionScheduler
+        section_graph.router.log_path = None
+        self.add_caches(config.llm_cache.clear, section_graph.ddg_search.clear, section_graph.wkp_search.clear, section_graph.router.memory.clear)
+        scheduler = SectionScheduler(max_sections, config.RESOURCE_LIMITS)
+        section_graph.scheduler = note_graph.scheduler = scheduler
+        return config, section_graph, note_graph
+
+    def section_graph(self, section_counts=SECTION_COUNTS, concurrency_levels=CONCURRENCY_LEVELS):
+        for sections in section_counts:
+            for concurrency in concurrency_levels:
+                config, section_graph, _ = self._agent_modules(concurrency)
+                self.backend.sections = sections
+                titles = self.backend.titles()
+
+                async def run_sections():
+                    # fresh thread ids, so no run resumes an earlier one
+                    config.checkpointer.delete_threads('bench-section')
+                    # admitted through the scheduler the way the note graph runs its sections
+                    return await asyncio.gather(*[
+                        section_graph.scheduler.run(
+                            title,
+                            lambda i=i, title=title: section_graph.run_section_graph(
+                                section_graph.SectionState(topic=BENCH_TOPIC, title=title), thread_id=f'bench-section-{i}'
+                            ),
+                            priority=i
+                        )
+                        for i, title in enumerate(titles)
+                    ])
+
+                self.record('section_graph', {'sections': sections, 'concurrency': concurrency},
+                            self.timed(lambda: asyncio.run(run_sections())), units=sections)
+
+    def note_graph(self, section_counts=SECTION_COUNTS, concurrency_levels=CONCURRENCY_LEVELS):
+        for sections in section_counts:
+            for concurrency in concurrency_levels:
+                for review_mode in ('immediate', 'batch'):
+                    _, _, note_graph = self._agent_modules(concurrency)
+                    note_graph.SECTION_REVIEW_MODE = review_mode
+                    self.backend.sections = sections
+                    self.record('note_graph', {'sections': sections, 'concurrency': concurrency, 'review': review_mode},
+                                self.timed(lambda: asyncio.run(note_graph.run_note_graph(note_graph.NoteState(topic=BENCH_TOPIC)))))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+GRAPHS = ['linear_workflow', 'conditional_workflow', 'note_taker', 'section_graph', 'note_graph', 'document_qa', 'retrieval', 'faiss_index', 'cold_start', 'synthesis', 'compression']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the graphs against in-process fakes of Ollama and the search tools')
+    parser.add_argument('--graphs', default=','.join(GRAPHS), help='comma separated, any of ' + ', '.join(GRAPHS))
+    parser.add_argument('--profiles', default='zero,default', help='latency profiles: ' + ', '.join(PROFILES))
+    parser.add_argument('--llm-latency', help='override the profile, e.g. lognormal:40:0.4')
+    parser.add_argument('--search-latency', help='override the profile, e.g. uniform:20:80')
+    parser.add_argument('--sections', default=','.join(map(str, SECTION_COUNTS)))
+    parser.add_argument('--concurrency', default=','.join(map(str, CONCURRENCY_LEVELS)))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--index-train-sample', type=int, default=INDEX_TRAIN_SAMPLE,
+                        help='vectors the faiss_index suite trains IVF/PQ indexes on (0: as many as document_analyzer would)')
+    parser.add_argument('--warm', action='store_true', help='keep LLM/search caches and routing memory between runs')
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    # throwaway state: no disk caches, checkpoints or routing memory leak into (or out of) the benchmark
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    os.environ.update({
+        'LLM_CACHE': '0',
+        'SEARCH_CACHE': '0',
+        'EMBEDDING_CACHE': '0',
+        'ANSWER_CACHE_PATH': os.path.join(workdir, 'answers.sqlite'),
+        'ROUTING_MEMORY_PATH': ':memory:',
+        'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoints.sqlite'),
+    })
+    os.environ.pop('TRACE_DIR', None)
+    sys.path[:0] = [ROOT, AGENT_DIR]
+
+    section_counts = [int(value) for value in args.sections.split(',')]
+    concurrency_levels = [int(value) for value in args.concurrency.split(',')]
+    backend = FakeBackend(Latency('fixed:0'), Latency('fixed:0'), Latency('fixed:0'), seed=args.seed)
+    backend.install()
+
+    results = []
+    for profile in args.profiles.split(','):
+        latencies = dict(PROFILES[profile])
+        if args.llm_latency:
+            latencies['llm'] = args.llm_latency
+        if args.search_latency:
+            latencies['search'] = args.search_latency
+        backend.llm, backend.search, backend.embed = (Latency(latencies[name]) for name in ('llm', 'search', 'embed'))
+        backend.prefill_ms = float(latencies['prefill'])
+
+        bench = Benchmark(backend, profile, args.runs, warm=args.warm)
+        for graph in args.graphs.split(','):
+            # the graphs print a lot; only the benchmark lines reach the terminal
+            with contextlib.redirect_stdout(io.StringIO()):
+                if graph in ('note_taker', 'section_graph', 'note_graph'):
+                    getattr(bench, graph)(section_counts, concurrency_levels)
+                elif graph == 'faiss_index':
+                    bench.faiss_index(train_sample=args.index_train_sample)
+                else:
+                    getattr(bench, graph)()
+        results += bench.results
+
+    report = {
+        'meta': {
+            'git_commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'runs': args.runs,
+            'warm_caches': args.warm,
+            'index_train_sample': args.index_train_sample,
+            'profiles': {profile: PROFILES[profile] for profile in args.profiles.split(',')},
+            'overrides': {'llm': args.llm_latency, 'search': args.search_latency},
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("BENCHMARK WRITTEN:", args.output)
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINT_PATH = './.checkpoints.sqlite'
+CHECKPOINTS_KEPT_PER_THREAD = 2
+
+
+def thread_id_for(*parts: str) -> str:
+    """Stable, readable thread id: the same topic/job always maps to the same thread."""
+    text = ' '.join(part.strip().lower() for part in parts if part)
+    slug = re.sub(r'[^a-z0-9]+', '-', text).strip('-')[:40]
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+    return f"{slug}-{digest}"
+
+
+class DurableSqliteSaver(SqliteSaver):
+    """SqliteSaver that the async graphs can use directly.
+
+    Like MemorySaver, the async API runs the (local, millisecond) sync calls
+    inline, so one saver works across the separate event loops the GUIs start.
+    The database file is opened on first use, not when the graphs are imported.
+    """
+
+    def __init__(self, path: str, *, serde=None):
+        self.path = path
+        self._db = None
+        self._connect_lock = threading.Lock()
+        super().__init__(None, serde=serde)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self._connect_lock:
+            if self._db is None:
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+            return self._db
+
+    @conn.setter
+    def conn(self, conn):
+        self._db = conn
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=''):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return self.delete_thread(thread_id)
+
+    # prefixes are compared literally: LIKE would treat '_' and '%' in a slug as wildcards (and ignore case)
+    def list_threads(self, prefix: str = ''):
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                """
+                SELECT thread_id, COUNT(*), MAX(checkpoint_id)
+                FROM checkpoints
+                WHERE checkpoint_ns = '' AND substr(thread_id, 1, length(?)) = ?
+                GROUP BY thread_id
+                ORDER BY MAX(checkpoint_id) DESC
+                """,
+                (prefix, prefix)
+            )
+            return cur.fetchall()
+
+    def delete_threads(self, prefix: str):
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoints WHERE substr(thread_id, 1, length(?)) = ?", (prefix, prefix))
+            cur.execute("DELETE FROM writes WHERE substr(thread_id, 1, length(?)) = ?", (prefix, prefix))
+
+    def compact(self, prefix: str = '', keep: int = CHECKPOINTS_KEPT_PER_THREAD):
+        """Drop all but the newest `keep` checkpoints (and their writes) of every matching thread."""
+        with self.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                        ) AS position
+                        FROM checkpoints
+                        WHERE substr(thread_id, 1, length(?)) = ?
+                    )
+                    WHERE position > ?
+                )
+                """,
+                (prefix, prefix, keep)
+            )
+            removed = cur.rowcount
+            cur.execute(
+                """
+                DELETE FROM writes
+                WHERE substr(thread_id, 1, length(?)) = ? AND NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = writes.thread_id
+                    AND c.checkpoint_ns = writes.checkpoint_ns
+                    AND c.checkpoint_id = writes.checkpoint_id
+                )
+                """,
+                (prefix, prefix)
+            )
+        return removed
+
+    def vacuum(self):
+        with self.lock:
+            self.conn.execute("VACUUM")
+
+
+def durable_checkpointer(path: str = None, state_types=()) -> DurableSqliteSaver:
+    """`state_types`: (module, class name) of the graph states the saver may rebuild from a checkpoint."""
+    path = path or os.environ.get('CHECKPOINT_PATH', CHECKPOINT_PATH)
+    serde = JsonPlusSerializer(allowed_msgpack_modules=list(state_types)) if state_types else None
+    return DurableSqliteSaver(path, serde=serde)
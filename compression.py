@@ -0,0 +1,153 @@
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from keyword_index import BM25Index, tokenize
+from token_budget import count_tokens, split_sentences, truncate_to_tokens
+
+# how passages of search results are scored against the section: 'bm25' (no model needed),
+# 'embedding' (local Ollama embeddings, falls back to bm25) or 'off' (raw content as is)
+COMPRESSION_MODES = ('bm25', 'embedding', 'off')
+COMPRESSION_MODE = 'bm25'
+# search content kept per section for the draft prompt (RAW_CONTENT_TOKENS overrides)
+RAW_CONTENT_TOKENS = 768
+# a passage is a snippet or a short paragraph
+PASSAGE_TOKENS = 80
+# the title says what the section is about, the topic only narrows it
+TITLE_WEIGHT = 2
+COMPRESSION_EMBED_MODEL = 'embeddinggemma:300m'
+PASSAGE_SEPARATOR = '\n'
+
+# "[Wikipedia search result]: ..." starts each source in raw_content
+_SOURCE = re.compile(r'^\[([^\]\n]+)\]: ', re.M)
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def split_sources(raw_content: str) -> List[Tuple[str, str]]:
+    """(label, text) per labelled block; text before the first label gets ''."""
+    pieces = _SOURCE.split(raw_content)
+    sources = [('', pieces[0].strip())] if pieces[0].strip() else []
+    sources += [(label, text.strip()) for label, text in zip(pieces[1::2], pieces[2::2])]
+    return sources
+
+
+def split_passages(text: str, tokens: int = PASSAGE_TOKENS) -> List[str]:
+    """Paragraphs (a Wikipedia page, a run of snippets), cut at sentence breaks into passages of about `tokens`."""
+    passages = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        passage = ''
+        for sentence in split_sentences(paragraph):
+            if passage and count_tokens(passage + sentence) > tokens:
+                passages.append(passage.strip())
+                passage = ''
+            passage += sentence
+        if passage.strip():
+            passages.append(passage.strip())
+    return passages
+
+
+def query_text(topic: str, title: str) -> str:
+    # for embeddings: the repeated title pulls the query vector towards it
+    return ' '.join([title] * TITLE_WEIGHT + [topic])
+
+
+def query_weights(topic: str, title: str) -> Dict[str, float]:
+    """BM25 term weights scoring TITLE_WEIGHT * title + topic (a word in both counts for both)."""
+    weights = dict.fromkeys(tokenize(topic), 1.0)
+    for term in set(tokenize(title)):
+        weights[term] = weights.get(term, 0.0) + TITLE_WEIGHT
+    return weights
+
+
+def bm25_ranking(passages: List[str], topic: str, title: str) -> List[int]:
+    """Indexes of the passages sharing a term with the title or topic, best first."""
+    index = BM25Index()
+    for i, passage in enumerate(passages):
+        index.add(str(i), passage)
+    weights = query_weights(topic, title)
+    return [int(doc_id) for doc_id, score in index.search(' '.join(weights), len(passages), weights) if score > 0]
+
+
+def embedding_ranking(passages: List[str], query: str, embeddings=None) -> List[int]:
+    """Indexes of all passages by cosine similarity to the query, best first."""
+    embeddings = embeddings or default_compression_embeddings()
+    vectors = np.asarray(embeddings.embed_documents(passages), dtype=np.float32)
+    query_vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+    similarities = vectors @ query_vector / np.where(norms > 0, norms, 1.0)
+    return [int(i) for i in np.argsort(-similarities, kind='stable')]
+
+
+def compress(raw_content: str, topic: str, title: str, tokens: Optional[int] = None, mode: Optional[str] = None,
+             embeddings=None) -> Tuple[str, float]:
+    """The passages of `raw_content` most relevant to the section, within `tokens`, and the compression ratio.
+
+    Passages are chosen best first and put back in their original order under
+    their source labels. The ratio is kept / raw tokens (1.0: nothing dropped).
+    """
+    tokens = tokens or int(os.environ.get('RAW_CONTENT_TOKENS', RAW_CONTENT_TOKENS))
+    mode = mode or os.environ.get('COMPRESSION_MODE', COMPRESSION_MODE)
+    raw_tokens = count_tokens(raw_content)
+    if mode == 'off' or raw_tokens <= tokens:
+        return raw_content, 1.0
+
+    passages = []
+    for label, text in split_sources(raw_content):
+        passages += [(label, passage) for passage in split_passages(text)]
+    texts = [passage for _, passage in passages]
+
+    ranking = None
+    if mode == 'embedding':
+        try:
+            ranking = embedding_ranking(texts, query_text(topic, title), embeddings)
+        except Exception as e:
+            print(f"COMPRESS: embeddings unavailable ({type(e).__name__}: {e}), scoring with bm25")
+    if ranking is None:
+        ranking = bm25_ranking(texts, topic, title)
+    if not ranking:
+        # nothing matches the section: the leading passages are the search engines' best guess
+        ranking = list(range(len(passages)))
+
+    # room for each source's label and the break before it
+    labels = {label for label, _ in passages}
+    budget = tokens - sum(count_tokens(f"\n\n[{label}]: ") for label in labels)
+    kept, used = [], 0
+    separator = count_tokens(PASSAGE_SEPARATOR)
+    for i in ranking:
+        cost = count_tokens(texts[i]) + (separator if kept else 0)
+        if used + cost <= budget:
+            kept.append(i)
+            used += cost
+    if not kept:
+        # the best passage alone is over budget
+        kept = [ranking[0]]
+        passages[ranking[0]] = (passages[ranking[0]][0], truncate_to_tokens(texts[ranking[0]], budget))
+
+    blocks = []
+    for i in sorted(kept):
+        label, passage = passages[i]
+        if blocks and blocks[-1][0] == label:
+            blocks[-1][1].append(passage)
+        else:
+            blocks.append((label, [passage]))
+    compressed = '\n\n'.join(
+        (f"[{label}]: " if label else '') + PASSAGE_SEPARATOR.join(block) for label, block in blocks
+    )
+    ratio = count_tokens(compressed) / raw_tokens
+    print(f"COMPRESS: {title!r} {raw_tokens} -> {count_tokens(compressed)} tokens ({ratio:.0%}), "
+          f"{len(kept)}/{len(passages)} passages")
+    return compressed, ratio
+
+
+def default_compression_embeddings():
+    """Cached local embeddings, shared by every section."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            from langchain_ollama.embeddings import OllamaEmbeddings
+            from embedding_cache import CachedEmbeddings, default_embedding_store
+            _embeddings = CachedEmbeddings(OllamaEmbeddings(model=COMPRESSION_EMBED_MODEL), COMPRESSION_EMBED_MODEL, default_embedding_store())
+        return _embeddings
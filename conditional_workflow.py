@@ -4,6 +4,16 @@ from langchain_core.messages import HumanMessage, AIMessage
 from langchain_ollama import ChatOllama
 from operator import add
 from pydantic import BaseModel, Field
+from intent_classifier import EmbeddingIntentClassifier, MIN_MARGIN
+from tracing import traced
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
 
 llm = ChatOllama(model='smollm2:135m')
 
@@ -23,7 +33,14 @@ class ClassificationResponse(BaseModel):
     confidence: float = Field(description='number between 0.0 and 1.0')
     reasoning: str = Field(description='brief explanation')
 
-def input_node(state: AgentState) -> AgentState:
+# 'embedding': kNN over labelled exemplars, the LLM only breaks close calls
+# 'llm': structured LLM classification for every input
+INTENT_CLASSIFIER = os.environ.get('INTENT_CLASSIFIER', 'embedding')
+# below this the query is routed to the fallback handler
+MIN_CONFIDENCE = 0.6
+intent_classifier = EmbeddingIntentClassifier()
+
+def classify_with_llm(user_input: str) -> ClassificationResponse:
     classification_prompt = f"""
 Analyze this user input and classify it into ONE of these categories:
 - GREETING: Social pleasantries, hellos, goodbyes
@@ -32,11 +49,24 @@ Analyze this user input and classify it into ONE of these categories:
 - FEEDBACK: Opinions, complaints, praise, suggestions
 - UNCLEAR: Ambiguous or off-topic inputs
 
-User input: "{state['user_input']}"
+User input: "{user_input}"
 """.strip()
     
     structured_llm = llm.with_structured_output(ClassificationResponse)
-    response: ClassificationResponse = structured_llm.invoke(classification_prompt)
+    return structured_llm.invoke(classification_prompt)
+
+def classify_with_embeddings(user_input: str) -> ClassificationResponse:
+    category, confidence, margin, reasoning = intent_classifier.classify(user_input)
+    # close calls (or ones route_query would send to fallback anyway) go to the LLM
+    if category is None or margin < MIN_MARGIN or confidence < MIN_CONFIDENCE:
+        return classify_with_llm(user_input)
+    return ClassificationResponse(category=category, confidence=confidence, reasoning=reasoning)
+
+def input_node(state: AgentState) -> AgentState:
+    if INTENT_CLASSIFIER == 'embedding':
+        response = classify_with_embeddings(state['user_input'])
+    else:
+        response = classify_with_llm(state['user_input'])
     return {
         'messages': [HumanMessage(state['user_input'])],
         'query_type': response.category,
@@ -125,7 +155,7 @@ def route_query(state: AgentState) -> Literal["greeting", "question", "command",
     query_type = state['query_type'].upper()
     confidence = state['confidence']
 
-    if confidence < 0.6:
+    if confidence < MIN_CONFIDENCE:
         return 'fallback'
     
     if query_type == 'GREETING':
@@ -178,15 +208,8 @@ workflow.add_edge(OUTPUT, END)
 
 app = workflow.compile()
 
-def run_workflow(user_input: str):
-    """
-    Helper function to run the workflow
-    """
-    print(f"\n{'=' * 70}")
-    print(f"RUNNING WORKFLOW: '{user_input}'")
-    print(f"{'=' * 70}")
-
-    initial_state = {
+def initial_state(user_input: str) -> AgentState:
+    return {
         "messages": [],
         "user_input": user_input,
         "query_type": "",
@@ -197,7 +220,16 @@ def run_workflow(user_input: str):
         "llm_reasoning": ""
     }
 
-    final_state = app.invoke(initial_state)
+def run_workflow(user_input: str):
+    """
+    Helper function to run the workflow
+    """
+    print(f"\n{'=' * 70}")
+    print(f"RUNNING WORKFLOW: '{user_input}'")
+    print(f"{'=' * 70}")
+
+    with traced('conditional_workflow'):
+        final_state = app.invoke(initial_state(user_input))
 
     print(f"\n{'=' * 70}")
     print(f"WORKFLOW COMPLETED")
@@ -223,6 +255,111 @@ def run_workflow(user_input: str):
     return final_state
 
 
+BATCH_CONCURRENCY = 16
+LATENCY_SAMPLE_SIZE = 10_000
+
+class LatencyReservoir:
+    """Uniform fixed-size sample of latencies, so percentiles need flat memory on any input size."""
+
+    def __init__(self, size: int = LATENCY_SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.count = 0
+        self.samples = []
+        self._random = random.Random(seed)
+
+    def add(self, value: float):
+        self.count += 1
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+            return
+        index = self._random.randrange(self.count)
+        if index < self.size:
+            self.samples[index] = value
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+def read_batch_lines(path: str):
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield line_number, line
+
+async def route_batch_line(line_number: int, line: str) -> dict:
+    """One input line ({"id": ..., "user_input": ...} or a bare JSON string) -> one output record."""
+    started = time.perf_counter()
+    record = {'id': line_number}
+    try:
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {'user_input': item}
+        record['id'] = item.get('id', line_number)
+        record['user_input'] = item['user_input']
+        final_state = await app.ainvoke(initial_state(item['user_input']))
+        record.update({
+            'query_type': final_state['query_type'],
+            'confidence': final_state['confidence'],
+            'route_taken': final_state['route_taken'],
+            'result': final_state['result'],
+        })
+    except Exception as e:
+        record['route_taken'] = 'error'
+        record['error'] = f'{type(e).__name__}: {e}'
+    record['latency'] = round(time.perf_counter() - started, 4)
+    return record
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Routes every line of a JSONL file through `app`, at most `concurrency` at a time.
+
+    Inputs are read lazily and records are written as they complete (in completion
+    order, keyed by id), so memory stays flat however large the file is.
+    """
+    routes = Counter()
+    latencies = LatencyReservoir()
+    pending = set()
+    started = time.perf_counter()
+
+    with open(output_path, 'w', encoding='utf-8') as out:
+        def write(done):
+            for task in done:
+                record = task.result()
+                routes[record['route_taken']] += 1
+                latencies.add(record['latency'])
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+
+        for line_number, line in read_batch_lines(input_path):
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                write(done)
+            pending.add(asyncio.create_task(route_batch_line(line_number, line)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write(done)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'inputs': latencies.count,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(latencies.count / elapsed, 2) if elapsed else 0.0,
+        'routes': dict(routes),
+        'latency': {f'p{p}': round(latencies.percentile(p), 4) for p in (50, 90, 95, 99)},
+    }
+    print_batch_report(stats)
+    return stats
+
+def print_batch_report(stats: dict):
+    print(f"\n{'=' * 70}")
+    print(f"BATCH COMPLETED: {stats['inputs']} inputs in {stats['elapsed']:.1f}s ({stats['throughput']:.1f}/s)")
+    print(f"{'=' * 70}")
+    for route, count in sorted(stats['routes'].items(), key=lambda item: item[1], reverse=True):
+        print(f"  - {route}: {count}")
+    print("  Latency: " + ', '.join(f"{name} {value:.3f}s" for name, value in stats['latency'].items()))
+
+
 # print("\n" + "=" * 70)
 # print("DEMO: Testing LLM-Powered Conditional Routing")
 # print("=" * 70)
@@ -257,8 +394,27 @@ def run_workflow(user_input: str):
 
 
 
-from IPython.display import Image, display
-conditional_workflow_diagram = Image(
-        app.get_graph()
-        .draw_mermaid_png()
-    )
\ No newline at end of file
+def __getattr__(name):
+    # rendered on first access (locally, cached by graph structure; see diagram.py): batch runs never need it
+    if name == 'conditional_workflow_diagram':
+        from IPython.display import Image
+        from diagram import diagram_png
+        diagram = Image(diagram_png(app))
+        globals()[name] = diagram
+        return diagram
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Route a JSONL file of inputs through the workflow')
+    parser.add_argument('input', help='JSONL file, one {"id": ..., "user_input": ...} per line')
+    parser.add_argument('output', help='JSONL file the results are written to')
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    args = parser.parse_args()
+
+    async def main():
+        # the handlers are sync nodes run in the default executor: give it one thread per slot
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+        await run_batch(args.input, args.output, args.concurrency)
+
+    asyncio.run(main())
@@ -1,9 +1,37 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk
 from tkhtmlview import HTMLLabel
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
 import markdown
+import asyncio
+import queue
+import time
 from config import llm
 
+REVIEW_POLL_MS = 50
+
+def improve_content(topic, content, feedback, section, html_label, root) -> str:
+    """Rewrites `content` with the reviewer's feedback, showing it in `html_label` as it is written."""
+    stream = llm.stream(f"""
+        You are expert content generator.
+        for the following topic, section and content, 
+        improve the content based on user feedback
+        TOPIC: "{topic}" {f'\nSECTION: "{section}"' if section else ''}
+        CONTENT: "{content}"
+        FEEDBACK: "{feedback}
+    """.strip())
+
+    improved = ''
+    last_render = time.monotonic()
+    for chunk in stream:
+        improved += chunk.content
+        if time.monotonic() - last_render > 0.15:
+            html_label.set_html(markdown.markdown(improved))
+            root.update_idletasks()
+            last_render = time.monotonic()
+    return improved
+
 class ApprovalGUI:
     def __init__(self, topic, content, section = None):
         title = "Section Approval" if section else "Final Approval"
@@ -73,15 +101,7 @@ class ApprovalGUI:
     def improve_action(self):
         feedback = self.text_area.get("1.0", tk.END).strip()
         messagebox.showinfo("Improve", f"Content improving based on feedback: \n\n{feedback}")
-        response = llm.invoke(f"""
-            You are expert content generator.
-            for the following topic, section and content, 
-            improve the content based on user feedback
-            TOPIC: "{self.topic}" {f'\nSECTION: "{self.section}"' if self.section else ''}
-            CONTENT: "{self.content}"
-            FEEDBACK: "{feedback}
-        """.strip())
-        self.content = response.content
+        self.content = improve_content(self.topic, self.content, feedback, self.section, self.html_label, self.root)
         self.update_content_label()
         self.text_area.delete("1.0", tk.END)
         messagebox.showinfo("Improve", f"Content improved!")
@@ -92,3 +112,139 @@ class ApprovalGUI:
 
     def run(self):
         self.root.mainloop()
+
+
+class BatchApprovalGUI:
+    """One review window for many sections: a tab per draft, added as drafts arrive and approved one by one."""
+
+    def __init__(self, topic, root):
+        self.root = tk.Toplevel(root)
+        self.root.title("Sections Approval")
+        self.topic = topic
+        self.tabs = []
+
+        container = tk.Frame(self.root, padx=15, pady=15)
+        container.pack(fill="both", expand=True)
+
+        topic_label = tk.Label(
+            container,
+            text=f"📝 Topic: {topic} (Sections Approval)",
+            font=("Arial", 16, "bold")
+        )
+        topic_label.pack(anchor="w", pady=(0, 10))
+
+        self.notebook = ttk.Notebook(container)
+        self.notebook.pack(fill="both", expand=True, pady=(0, 12))
+
+        approve_button = tk.Button(
+            container,
+            text="Approve all",
+            command=self.approve_all_action,
+            width=12
+        )
+        approve_button.pack(side="left")
+        # closing the window approves what is left as it stands, like closing an ApprovalGUI
+        self.root.protocol("WM_DELETE_WINDOW", self.approve_all_action)
+
+    def add(self, section, content, on_approve):
+        """Adds a tab for `section`; on_approve(content) is called once it is approved."""
+        frame = tk.Frame(self.notebook, padx=5, pady=5)
+        self.notebook.add(frame, text=section[:24])
+        tab = {'section': section, 'content': content, 'on_approve': on_approve, 'frame': frame}
+
+        section_label = tk.Label(frame, text=f"✍️ Section: {section}", font=("Arial", 14, "bold"))
+        section_label.pack(anchor="w", pady=(0, 10))
+
+        tab['html_label'] = HTMLLabel(frame, html=markdown.markdown(content), width=60)
+        tab['html_label'].pack(fill="x", pady=(0, 12))
+        tab['text_area'] = tk.Text(frame, height=6)
+        tab['text_area'].pack(fill="both", expand=True, pady=(0, 12))
+
+        button_frame = tk.Frame(frame)
+        button_frame.pack(fill="x")
+        approve_button = tk.Button(button_frame, text="Approve", command=lambda: self.approve_action(tab), width=12)
+        approve_button.pack(side="left", padx=(0, 10))
+        improve_button = tk.Button(button_frame, text="Improve", command=lambda: self.improve_action(tab), width=12)
+        improve_button.pack(side="left")
+        self.tabs.append(tab)
+
+    def approve_action(self, tab):
+        self.tabs.remove(tab)
+        self.notebook.forget(tab['frame'])
+        tab['on_approve'](tab['content'])
+        if not self.tabs:
+            self.root.destroy()
+
+    def approve_all_action(self):
+        for tab in list(self.tabs):
+            self.approve_action(tab)
+        if self.root.winfo_exists():
+            self.root.destroy()
+
+    def improve_action(self, tab):
+        feedback = tab['text_area'].get("1.0", tk.END).strip()
+        messagebox.showinfo("Improve", f"Content improving based on feedback: \n\n{feedback}", parent=self.root)
+        tab['content'] = improve_content(self.topic, tab['content'], feedback, tab['section'], tab['html_label'], self.root)
+        tab['html_label'].set_html(markdown.markdown(tab['content']))
+        tab['text_area'].delete("1.0", tk.END)
+        messagebox.showinfo("Improve", f"Content improved!", parent=self.root)
+
+
+class ReviewDesk:
+    """Reviews section drafts in one BatchApprovalGUI on the thread that owns `root`, whichever thread the graph runs on.
+
+    `submit` may be called from any thread: the draft is queued, the Tk loop polls the queue
+    (Tk is not thread safe) and adds a tab for it, and the returned future resolves with the
+    approved content. Drafts that arrive while the window is open join it.
+    """
+
+    def __init__(self, root, poll_ms: int = REVIEW_POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.requests = queue.Queue()
+        self.window = None
+        self.root.after(self.poll_ms, self.poll)
+
+    def submit(self, topic, section, content) -> Future:
+        future = Future()
+        self.requests.put((topic, section, content, future))
+        return future
+
+    def poll(self):
+        while True:
+            try:
+                topic, section, content, future = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            # a section cancelled while queued is not shown
+            if not future.set_running_or_notify_cancel():
+                continue
+            if self.window is None or not self.window.root.winfo_exists():
+                self.window = BatchApprovalGUI(topic, self.root)
+            self.window.add(section, content, future.set_result)
+        self.root.after(self.poll_ms, self.poll)
+
+
+@asynccontextmanager
+async def review_desk_on_loop():
+    """A ReviewDesk for graphs run on the thread that would own Tk (from the command line):
+    the running event loop drives the Tk loop. Yields None when no window can be opened."""
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        yield None
+        return
+    root.withdraw()
+    desk = ReviewDesk(root)
+
+    async def pump():
+        while True:
+            root.update()
+            await asyncio.sleep(desk.poll_ms / 1000)
+
+    task = asyncio.create_task(pump())
+    try:
+        yield desk
+    finally:
+        task.cancel()
+        root.destroy()
@@ -2,26 +2,61 @@
 from langchain_ollama import ChatOllama
 import tkinter as tk
 import uuid
+import sys
+import os
 
-llm = ChatOllama(model='smollm2:135m')
+# shared helpers (llm_cache, ...) live in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_cache import default_llm_cache, with_cache
+from scheduler import SectionScheduler
+from checkpoints import durable_checkpointer, thread_id_for
+from startup import Lazy
+
+llm_cache = default_llm_cache()
+# built on first use, so the GUI and the graphs import without a model client
+llm = Lazy(lambda: with_cache(ChatOllama(model='smollm2:135m'), llm_cache))
 # llm = ChatOllama(model='gemma3:4b')
 # llm = ChatOllama(model='llama3.1:8b')
 # llm = ChatOllama(model='llama3.2:3b')
 
-def get_config():
-    config = {'configurable': {'thread_id': str(uuid.uuid4())}}
+# how many sections run at once, and how many LLM / search calls they share
+MAX_CONCURRENT_SECTIONS = 4
+RESOURCE_LIMITS = {'llm': 2, 'search': 4}
+scheduler = SectionScheduler(MAX_CONCURRENT_SECTIONS, RESOURCE_LIMITS)
+
+# 'immediate': each section opens its approval window as soon as its draft is ready
+# 'batch': drafts join one review window (on the Tk thread) as they are ready, and each section
+#          resumes once approved, so the others keep working while the reviewer reads
+SECTION_REVIEW_MODE = 'immediate'
+
+# durable graph state; thread ids derived from the topic let a crashed run resume
+# the state classes checkpoints may hold (as imported from this directory, or run as a script)
+CHECKPOINT_STATE_TYPES = [
+    ('note_graph', 'NoteState'), ('section_graph', 'SectionState'),
+    ('__main__', 'NoteState'), ('__main__', 'SectionState'),
+]
+checkpointer = durable_checkpointer(state_types=CHECKPOINT_STATE_TYPES)
+
+def get_config(thread_id: str = None):
+    config = {'configurable': {'thread_id': thread_id or str(uuid.uuid4())}}
     return config
 
+async def astream_tokens(app, graph_input, config, nodes, on_token=None):
+    """Run `app` to its next interrupt or end, passing model tokens produced in `nodes` to on_token(node, text)."""
+    if on_token is None:
+        await app.ainvoke(graph_input, config)
+        return
+    async for message, metadata in app.astream(graph_input, config, stream_mode='messages'):
+        node = metadata.get('langgraph_node')
+        if node in nodes and isinstance(message.content, str) and message.content:
+            on_token(node, message.content)
+
 def app_diagram(app, filename):
-    from IPython.display import Image as IP_Image
     from PIL import ImageTk, Image as PIL_Image
+    from diagram import diagram_png
     import io
 
-    diagram = IP_Image(
-        app.get_graph()
-        .draw_mermaid_png()
-    )
-    bytes = diagram.data
+    bytes = diagram_png(app)
 
     with open(f"{filename}.png", "wb") as f:
         f.write(bytes)
@@ -1,14 +1,29 @@
+import sys
+import os
+
+# shared helpers (startup, diagram, ...) live in the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import startup
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from datetime import datetime
-from note_graph import note_app, run_note_graph, NoteState
-from section_graph import section_app
-from IPython.display import Image as IP_Image
 from PIL import ImageTk, Image as PIL_Image
 import threading
 import asyncio
+import queue
 import io
 
+# how often the window picks up streamed tokens
+STREAM_POLL_MS = 150
+
+
+def load_workflow_diagram() -> bytes:
+    # the graphs (langgraph, model client, tools, checkpointer) load here, off the Tk thread
+    import note_graph
+    from section_graph import section_app
+    from diagram import diagram_png
+    return diagram_png(section_app)
+
 
 class NoteTakerAgentGUI:
     def __init__(self):
@@ -16,6 +31,10 @@ class NoteTakerAgentGUI:
         self.root.title("Content Generator Agent")
         # root.geometry("600x450")
         self.content = None
+        self.review_desk = None
+        # tokens from the generation thread, drained by the Tk loop
+        self.stream_queue = queue.Queue()
+        self.stream_buffers = {}
 
         container = tk.Frame(self.root, padx=30, pady=30)
         container.pack(fill="both", expand=True)
@@ -53,32 +72,91 @@ class NoteTakerAgentGUI:
         )
         discard_button.pack(side="left")
 
+        # live preview of section drafts and the final note while they are generated;
+        # made with the first tokens (tkhtmlview pulls in requests, ~130 ms)
+        self.container = container
+        self.preview_label = None
 
-        note_taker_workflow_diagram = IP_Image(section_app.get_graph().draw_mermaid_png())
-        image_bytes = note_taker_workflow_diagram.data
-        pil_image = PIL_Image.open(io.BytesIO(image_bytes))
-        tk_image = ImageTk.PhotoImage(pil_image)
-        img_label = tk.Label(container, image=tk_image)
-        # img_label.pack(anchor='center')
+        # the window is usable right away; the graphs load behind it
+        self.img_label = tk.Label(container)
+        # self.img_label.pack(anchor='center')
+        startup.run_in_background(self.root, load_workflow_diagram, self.show_diagram, self.show_load_error)
+        self.root.after(STREAM_POLL_MS, self.poll_stream)
+        self.root.after_idle(startup.mark, 'window ready')
 
         self.root.mainloop()
 
+    def show_diagram(self, image_bytes):
+        pil_image = PIL_Image.open(io.BytesIO(image_bytes))
+        # kept on self: Tk drops images nothing in Python refers to
+        self.tk_image = ImageTk.PhotoImage(pil_image)
+        self.img_label.configure(image=self.tk_image)
+        startup.mark('graphs loaded')
+
+    def show_load_error(self, error):
+        # the diagram label is not packed in this window: the failure gets a dialog (Generate would fail too)
+        messagebox.showerror("Loading Failed", f"The graphs could not be loaded:\n{type(error).__name__}: {error}")
+
     def generate_content(self):
         topic = self.topic_entry.get().strip()
         if not topic:
             messagebox.showwarning("Missing Topic", "Please enter a topic name.")
             return
         
+        if self.review_desk is None:
+            from approval_gui import ReviewDesk
+            # batch-mode section drafts are reviewed in a window of this (the Tk) thread
+            self.review_desk = ReviewDesk(self.root)
+        review_desk = self.review_desk
+
         def run_async_task():
             try:
                 self.root.after(0, lambda: messagebox.showinfo("Acknowledgement", f"Generating Content: \n\n{topic}"))
-                content = asyncio.run(run_note_graph(NoteState(topic=topic)))
+                from note_graph import run_note_graph, NoteState
+                content = asyncio.run(run_note_graph(NoteState(topic=topic), on_token=self.on_token, review_desk=review_desk))
                 self.content = content.improved_note
                 self.root.after(0, lambda: messagebox.showinfo("Success", f"Generate: \n\n{self.content[:250]}..."))
             except Exception as e:
                 self.root.after(0, lambda: messagebox.showerror("Error", str(e)))
+        self.stream_buffers = {}
         threading.Thread(target=run_async_task, daemon=True).start()
 
+    def on_token(self, label, text):
+        # called from the generation thread: Tk is not thread safe, so the tokens are queued
+        # and the Tk loop picks them up (see startup.run_in_background)
+        self.stream_queue.put((label, text))
+
+    def poll_stream(self):
+        # rendering is batched: one redraw per poll for however many tokens arrived
+        received = False
+        while True:
+            try:
+                label, text = self.stream_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.stream_buffers[label] = self.stream_buffers.get(label, '') + text
+            received = True
+        if received:
+            self.render_preview()
+        self.root.after(STREAM_POLL_MS, self.poll_stream)
+
+    def render_preview(self):
+        buffers = self.stream_buffers
+
+        # once the note-level drafts start, they replace the per-section view
+        if 'Improved note' in buffers:
+            markdown_text = buffers['Improved note']
+        elif 'Draft note' in buffers:
+            markdown_text = buffers['Draft note']
+        else:
+            markdown_text = "\n\n".join(f"## {label}\n\n{text}" for label, text in buffers.items())
+        import markdown
+        if self.preview_label is None:
+            from tkhtmlview import HTMLLabel
+            self.preview_label = HTMLLabel(self.container, html='', width=70, height=20)
+            self.preview_label.pack(fill="both", expand=True, pady=(15, 0))
+        self.preview_label.set_html(markdown.markdown(markdown_text))
+
     def save_content(self):
         content = self.content
         topic = self.topic_entry.get().strip()
@@ -106,4 +184,5 @@ class NoteTakerAgentGUI:
         self.topic_entry.delete(0, tk.END)
         self.content = ''
 
-NoteTakerAgentGUI()
\ No newline at end of file
+if __name__ == '__main__':
+    NoteTakerAgentGUI()
\ No newline at end of file
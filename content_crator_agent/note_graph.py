@@ -1,11 +1,15 @@
 from typing import List
 from pydantic import BaseModel, Field
-from approval_gui import ApprovalGUI
+from approval_gui import ApprovalGUI, review_desk_on_loop
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import interrupt, Command
-from langgraph.checkpoint.memory import MemorySaver
-from section_graph import SectionState, run_section_graph
-from config import llm, get_config, app_diagram
+from langchain_core.runnables import RunnableConfig
+from section_graph import SectionState, run_section_graph, start_section_graph, review_section_at_desk, resume_section_graph, ddg_search, wkp_search
+from config import llm, llm_cache, scheduler, checkpointer, SECTION_REVIEW_MODE, get_config, thread_id_for, astream_tokens, app_diagram
+from tracing import traced
+from synthesis import default_synthesizer, section_parts
+from contextlib import nullcontext
+import argparse
 import asyncio
 
 class NoteState(BaseModel):
@@ -37,36 +41,80 @@ async def planning_node(state: NoteState) -> NoteState:
         )
     return state
 
-async def section_content_generator_node(state: NoteState) -> NoteState:
+def section_thread_id(note_thread_id: str, index: int, section: SectionState) -> str:
+    return f"{note_thread_id}/{index}-{thread_id_for(section.title)}"
+
+def section_token_stream(on_token, section: SectionState):
+    if on_token is None:
+        return None
+    return lambda text: on_token(section.title, text)
+
+async def gather_or_cancel(tasks):
+    """Results of all `tasks`; if one fails the others are cancelled (and awaited) before the error propagates."""
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def review_sections_in_batch(sections: List[SectionState], note_thread_id: str, review_desk, on_token=None) -> List[SectionState]:
+    async def run(i, section):
+        thread_id = section_thread_id(note_thread_id, i, section)
+        stream = section_token_stream(on_token, section)
+        config, interrupt_state = await scheduler.run(
+            section.title, lambda: start_section_graph(section, thread_id, stream), priority=i
+        )
+        final_content = None
+        if interrupt_state is not None:
+            # the draft joins the one review window while the other sections keep working,
+            # and this section resumes from its own checkpoint as soon as it is approved
+            final_content = await review_section_at_desk(interrupt_state, review_desk)
+        return await resume_section_graph(config, final_content)
+
+    return await gather_or_cancel([asyncio.create_task(run(i, section)) for i, section in enumerate(sections)])
+
+async def section_content_generator_node(state: NoteState, config: RunnableConfig) -> NoteState:
     print("SECTION CONTENT GENERATOR NODE")
+    note_thread_id = config['configurable']['thread_id']
+    on_token = config['configurable'].get('on_token')
+    scheduler.reset()
+    if SECTION_REVIEW_MODE == 'batch':
+        review_desk = config['configurable'].get('review_desk')
+        # without a Tk loop of the caller's to review on (command line), this thread drives one
+        desk = nullcontext(review_desk) if review_desk is not None else review_desk_on_loop()
+        async with desk as review_desk:
+            state.sections = await review_sections_in_batch(state.sections, note_thread_id, review_desk, on_token)
+        scheduler.report()
+        return state
+
+    # earlier sections get priority so they reach the reviewer first
     tasks = [
         asyncio.create_task(
-            run_section_graph(section)
+            scheduler.run(
+                section.title,
+                lambda i=i, section=section: run_section_graph(
+                    section,
+                    section_thread_id(note_thread_id, i, section),
+                    section_token_stream(on_token, section)
+                ),
+                priority=i
+            )
         ) 
-        for section in state.sections
+        for i, section in enumerate(state.sections)
     ]
     sections = await asyncio.gather(*tasks)
+    scheduler.report()
     state.sections = sections
     return state
 
 async def draft_note_generator_node(state: NoteState) -> NoteState:
     print("FINAL CONTENT GENERATOR NODE")
-    current_content = ''
-    
-    for i, section in enumerate(state.sections, start=1):
-        current_content += f"""
-            ## Section {i}: {section.title}
-            {section.final_content} \n\n
-        """
-
-    response = await llm.ainvoke(f"""
-        You are expert content generator.
-        for the following topic and its content, 
-        tell me organized and improved idea in proper markdown format
-        TOPIC: "{state.topic}"
-        CONTENT: "{current_content}"
-    """.strip())
-    state.draft_note = response.content
+    parts = section_parts([(section.title, section.final_content) for section in state.sections])
+    # sections are merged in groups that fit the model's context (sharing the llm slots), then
+    # the merges, down to one call; only that last call streams into the draft preview
+    state.draft_note = await default_synthesizer(llm).arun(state.topic, parts, llm_slot=lambda: scheduler.limit('llm'))
     return state
 
 async def final_human_approval_node(state: NoteState) -> NoteState:
@@ -108,39 +156,108 @@ note_graph.add_edge(DRAFT_NOTE, FINAL_HUMAN_APPROVAL)
 note_graph.add_edge(FINAL_HUMAN_APPROVAL, IMPROVE_MARKDOWN)
 note_graph.add_edge(IMPROVE_MARKDOWN, END)
 
-note_app = note_graph.compile(checkpointer=MemorySaver())
-async def run_note_graph(state: NoteState):
-    print("START NOTE, Topic:", state.topic)
-    config = get_config()
-    result = await note_app.ainvoke(state, config)
-    interrupt_state: NoteState = result['__interrupt__'][0].value['interrupt_state']
-    final_note = interrupt_state.draft_note
-    
-    try:
-        gui = ApprovalGUI(
-            topic=interrupt_state.topic,
-            content=interrupt_state.draft_note
-        )
-        gui.run()
-        final_note = gui.content
-    except:
-        pass
+note_app = note_graph.compile(checkpointer=checkpointer)
+# what the streaming preview calls the note-level drafts
+STREAM_LABELS = {DRAFT_NOTE: 'Draft note', IMPROVE_MARKDOWN: 'Improved note'}
+
+def note_config(thread_id: str, on_token=None, review_desk=None):
+    """on_token(label, text) receives section drafts and the final note as the model writes them;
+    in batch mode, sections are reviewed in `review_desk` (an approval_gui.ReviewDesk on the caller's Tk thread)."""
+    config = get_config(thread_id)
+    # objects and callables are never written to checkpoint metadata
+    if on_token is not None:
+        config['configurable']['on_token'] = on_token
+    if review_desk is not None:
+        config['configurable']['review_desk'] = review_desk
+    return config
+
+async def advance_note_graph(graph_input, config):
+    on_token = config['configurable'].get('on_token')
+    stream = (lambda node, text: on_token(STREAM_LABELS[node], text)) if on_token else None
+    await astream_tokens(note_app, graph_input, config, set(STREAM_LABELS), stream)
+
+async def finish_note_graph(config) -> NoteState:
+    snapshot = await note_app.aget_state(config)
+    if snapshot.interrupts:
+        interrupt_state: NoteState = snapshot.interrupts[0].value['interrupt_state']
+        final_note = interrupt_state.draft_note
+
+        try:
+            gui = ApprovalGUI(
+                topic=interrupt_state.topic,
+                content=interrupt_state.draft_note
+            )
+            gui.run()
+            final_note = gui.content
+        except:
+            pass
 
-    if not final_note:
-        final_note = interrupt_state.final_note
+        if not final_note:
+            final_note = interrupt_state.final_note
 
-    end_of_task = await note_app.ainvoke(Command(resume=final_note), config)
-    final_state = NoteState(**end_of_task)
+        await advance_note_graph(Command(resume=final_note), config)
+        snapshot = await note_app.aget_state(config)
+    final_state = NoteState(**snapshot.values)
 
+    checkpointer.compact(config['configurable']['thread_id'])
+    print("LLM CACHE:", llm_cache.stats())
+    print("SEARCH CACHE:", {'duck_duck_go': ddg_search.stats(), 'wikipedia': wkp_search.stats()})
     print("END NOTE")
     return final_state
 
+async def run_note_graph(state: NoteState, on_token=None, review_desk=None):
+    print("START NOTE, Topic:", state.topic)
+    thread_id = thread_id_for(state.topic)
+    config = note_config(thread_id, on_token, review_desk)
+    snapshot = await note_app.aget_state(config)
+    if snapshot.next:
+        print("RESUMING UNFINISHED NOTE:", thread_id)
+        return await resume_note_graph(thread_id, on_token, review_desk)
+
+    with traced(f"note-{thread_id}"):
+        # a finished run of the same topic starts over, sections included
+        checkpointer.delete_threads(thread_id)
+        await advance_note_graph(state, config)
+        return await finish_note_graph(config)
+
+async def resume_note_graph(thread_id: str, on_token=None, review_desk=None) -> NoteState:
+    config = note_config(thread_id, on_token, review_desk)
+    with traced(f"note-{thread_id}"):
+        snapshot = await note_app.aget_state(config)
+        if snapshot.next and not snapshot.interrupts:
+            await advance_note_graph(None, config)
+        return await finish_note_graph(config)
+
+def list_note_runs():
+    for thread_id, checkpoints, _ in checkpointer.list_threads():
+        if '/' in thread_id:
+            continue
+        snapshot = note_app.get_state(get_config(thread_id))
+        status = f"paused before {', '.join(snapshot.next)}" if snapshot.next else 'finished'
+        print(f"{thread_id}  topic={snapshot.values.get('topic')!r}  {status}  ({checkpoints} checkpoints)")
+
 
 if __name__ == '__main__':
-    final_state = asyncio.run(
-        run_note_graph(NoteState(
-            topic='Artificial Intelligence (AI)'
-        ))
-    )    
-    # app_diagram(note_app, './note_taker/note_taker_app')
-    print(final_state.improved_note)
+    parser = argparse.ArgumentParser(description='Generate a note, or manage saved runs')
+    commands = parser.add_subparsers(dest='command')
+    run_command = commands.add_parser('run', help='generate (or resume) a note for a topic')
+    run_command.add_argument('topic', nargs='?', default='Artificial Intelligence (AI)')
+    commands.add_parser('list', help='list saved runs')
+    resume_command = commands.add_parser('resume', help='continue a saved run from its last completed node')
+    resume_command.add_argument('thread_id')
+    commands.add_parser('compact', help='drop old checkpoints of every saved run')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        list_note_runs()
+    elif args.command == 'compact':
+        print("REMOVED CHECKPOINTS:", checkpointer.compact())
+        checkpointer.vacuum()
+    else:
+        if args.command == 'resume':
+            final_state = asyncio.run(resume_note_graph(args.thread_id))
+        else:
+            topic = getattr(args, 'topic', 'Artificial Intelligence (AI)')
+            final_state = asyncio.run(run_note_graph(NoteState(topic=topic)))
+        # app_diagram(note_app, './note_taker/note_taker_app')
+        print(final_state.improved_note)
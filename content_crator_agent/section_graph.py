@@ -5,12 +5,18 @@ from langchain_community.utilities import WikipediaAPIWrapper
 from approval_gui import ApprovalGUI
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import interrupt, Command
-from langgraph.checkpoint.memory import MemorySaver
-from config import llm, get_config, app_diagram
+from config import llm, scheduler, checkpointer, get_config, thread_id_for, astream_tokens, app_diagram
+from search_cache import CachedSearchTool, default_search_store
+from routing import default_router
+from tracing import traced
+from startup import Lazy
+from compression import compress
 import asyncio
 
-wkp_search = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
-ddg_search = DuckDuckGoSearchRun()
+search_store = default_search_store()
+wkp_search = CachedSearchTool(Lazy(lambda: WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())), 'wikipedia', search_store)
+ddg_search = CachedSearchTool(Lazy(DuckDuckGoSearchRun), 'duck_duck_go', search_store)
+router = default_router(llm)
 
 class SectionState(BaseModel):
     topic: str = ''
@@ -18,65 +24,53 @@ class SectionState(BaseModel):
     raw_content: str = ''
     draft_content: str = ''
     final_content: str = ''
+    route: str = ''
+    route_source: str = ''
+    # compressed / raw search content tokens (1.0 when nothing was dropped)
+    compression_ratio: float = 1.0
 
 
-class IsSearchNeedDecisionResponse(BaseModel):
-    is_search_need: bool = Field(description='is searching is necessary or not?')
-
-async def is_search_need(state: SectionState) -> Literal['need_search', 'not_need_search']:
-    print("IS SEARCH NEED NODE")
-    structured_llm = llm.with_structured_output(IsSearchNeedDecisionResponse)
-    decision: IsSearchNeedDecisionResponse = await structured_llm.ainvoke(f"""
-        You are expert content generator.
-        for the following general topic and its specific title is need further search?
-        TOPIC: "{state.topic}"
-        TITLE: "{state.title}"
-    """.strip())
+async def route_section_node(state: SectionState) -> SectionState:
+    print("ROUTE SECTION NODE")
+    # one decision for both branches; the LLM is only asked when the local router is unsure
+    decision = await router.aroute(state.topic, state.title, llm_slot=scheduler.limit('llm'))
+    state.route = decision.route
+    state.route_source = decision.source
+    return state
 
-    if decision.is_search_need:
-        return 'need_search'
-    else:
+def is_search_need(state: SectionState) -> Literal['need_search', 'not_need_search']:
+    if state.route == 'not_need_search':
         return 'not_need_search'
+    return 'need_search'
 
-class SearchTypeDecisionResponse(BaseModel):
-    search_type: Literal['duck_duck_go', 'wikipedia', 'both'] = Field(description='Best search tool')
-
-async def decide_search_type(state: SectionState) -> Literal['duck_duck_go', 'wikipedia', 'both']:
-    print("DECIDE SEARCH TYPE NODE")
-    structured_llm = llm.with_structured_output(SearchTypeDecisionResponse)
-    decision: SearchTypeDecisionResponse = await structured_llm.ainvoke(f"""
-        You are expert content generator.
-        which search tool is best for the following general topic and its specific title?
-        TOPIC: "{state.topic}"
-        TITLE: "{state.title}"
-    """.strip())
-    return decision.search_type.lower()
+def decide_search_type(state: SectionState) -> Literal['duck_duck_go', 'wikipedia', 'both']:
+    return state.route
 
 async def duck_duck_go_search_node(state: SectionState) -> SectionState:
     print("DUCK DUCK GO SEARCH NODE")
-    response = await llm.ainvoke(f"""
+    response = await scheduler.limited('llm', llm.ainvoke(f"""
         You are expert content generator.
         for the following general topic and its specific title, 
         give me search query on duck duck go search engine.
         remember that the query is pure text (not markdown format and any description)
         TOPIC: "{state.topic}"
         TITLE: "{state.title}"
-    """.strip())
-    search_result = await ddg_search.ainvoke(response.content)
+    """.strip()))
+    search_result = await scheduler.limited('search', ddg_search.ainvoke(response.content))
     state.raw_content = f"[DucDucGo search result]: {search_result}"
     return state
 
 async def wikipedia_search_node(state: SectionState) -> SectionState:
     print("WIKIPEDIA SEARCH NODE")
-    response = await llm.ainvoke(f"""
+    response = await scheduler.limited('llm', llm.ainvoke(f"""
         You are expert content generator.
         for the following general topic and its specific title, 
         give me search query on Wikipedia encyclopedia.
         remember that the query is pure text (not markdown format and any description)
         TOPIC: "{state.topic}"
         TITLE: "{state.title}"
-    """.strip())
-    search_result = await wkp_search.ainvoke(response.content)
+    """.strip()))
+    search_result = await scheduler.limited('search', wkp_search.ainvoke(response.content))
     state.raw_content = f"[Wikipedia search result]: {search_result}"
     return state
 
@@ -87,21 +81,21 @@ class SearchQueryResponse(BaseModel):
 async def both_search_node(state: SectionState) -> SectionState:
     print("BOTH SEARCH NODE")
     structured_llm = llm.with_structured_output(SearchQueryResponse)
-    queries: SearchQueryResponse = await structured_llm.ainvoke(f"""
+    queries: SearchQueryResponse = await scheduler.limited('llm', structured_llm.ainvoke(f"""
         You are expert content generator.
         for the following general topic and its specific title, 
         give me search query for both DucDuckGo search and engine Wikipedia encyclopedia.
         remember that the query is pure text (not markdown format and any description)
         TOPIC: "{state.topic}"
         TITLE: "{state.title}"
-    """.strip())
+    """.strip()))
     
     tasks = [
         asyncio.create_task(
-            ddg_search.ainvoke(queries.duck_duck_go_search_query)
+            scheduler.limited('search', ddg_search.ainvoke(queries.duck_duck_go_search_query))
         ),
         asyncio.create_task(
-            wkp_search.ainvoke(queries.wikipedia_search_query)
+            scheduler.limited('search', wkp_search.ainvoke(queries.wikipedia_search_query))
         ),
     ]
     ddg_search_result, wkp_search_result = await asyncio.gather(*tasks)
@@ -109,28 +103,35 @@ async def both_search_node(state: SectionState) -> SectionState:
     state.raw_content = f"[DucDucGo search result]: {ddg_search_result}\n\n[Wikipedia search result]: {wkp_search_result}"
     return state
 
+async def compress_content_node(state: SectionState) -> SectionState:
+    print("COMPRESS CONTENT NODE")
+    # only the passages most relevant to the title, within a token budget, reach the draft prompt;
+    # off the event loop, since embedding mode calls the local model
+    state.raw_content, state.compression_ratio = await asyncio.to_thread(compress, state.raw_content, state.topic, state.title)
+    return state
+
 async def background_idea_generator_node(state: SectionState) -> SectionState:
     print("BACKGROUND IDEA NODE")
-    response = await llm.ainvoke(f"""
+    response = await scheduler.limited('llm', llm.ainvoke(f"""
         You are expert content generator.
         for the following general topic and its specific title, 
         tell me background idea
         TOPIC: "{state.topic}"
         TITLE: "{state.title}"
-    """.strip())
+    """.strip()))
     state.raw_content = f"[Background idea]: {response.content}"
     return state
 
 async def draft_content_generator_node(state: SectionState) -> SectionState:
     print("DRAFT CONTENT GENERATOR NODE")
-    response = await llm.ainvoke(f"""
+    response = await scheduler.limited('llm', llm.ainvoke(f"""
         You are expert content generator.
         for the following general topic, its specific title and raw content, 
         organize the idea in proper markdown format
         TOPIC: "{state.topic}"
         TITLE: "{state.title}"
         RAW CONTENT: "{state.raw_content}"
-    """.strip())
+    """.strip()))
     state.draft_content = response.content
     return state
 
@@ -152,16 +153,18 @@ DDG_SEARCH = 'ddg_search'
 WKP_SEARCH = 'wkp_search'
 BOTH_SEARCH = 'both_search'
 BACKGROUND_IDEA = 'background_idea'
+COMPRESS_CONTENT = 'compress_content'
 DRAFT_CONTENT = 'draft_content'
 SECTION_HUMAN_APPROVAL = 'section_human_approval'
 
 section_graph = StateGraph(SectionState)
-section_graph.add_node(IS_SEARCH_NEED, default_node)
+section_graph.add_node(IS_SEARCH_NEED, route_section_node)
 section_graph.add_node(DECIDE_SEARCH_TYPE, default_node)
 section_graph.add_node(DDG_SEARCH, duck_duck_go_search_node)
 section_graph.add_node(WKP_SEARCH, wikipedia_search_node)
 section_graph.add_node(BOTH_SEARCH, both_search_node)
 section_graph.add_node(BACKGROUND_IDEA, background_idea_generator_node)
+section_graph.add_node(COMPRESS_CONTENT, compress_content_node)
 section_graph.add_node(DRAFT_CONTENT, draft_content_generator_node)
 section_graph.add_node(SECTION_HUMAN_APPROVAL, section_human_approval_node)
 
@@ -184,20 +187,43 @@ section_graph.add_conditional_edges(
     }
 )
 section_graph.add_edge(BACKGROUND_IDEA, DRAFT_CONTENT)
-section_graph.add_edge(DDG_SEARCH, DRAFT_CONTENT)
-section_graph.add_edge(WKP_SEARCH, DRAFT_CONTENT)
-section_graph.add_edge(BOTH_SEARCH, DRAFT_CONTENT)
+section_graph.add_edge(DDG_SEARCH, COMPRESS_CONTENT)
+section_graph.add_edge(WKP_SEARCH, COMPRESS_CONTENT)
+section_graph.add_edge(BOTH_SEARCH, COMPRESS_CONTENT)
+section_graph.add_edge(COMPRESS_CONTENT, DRAFT_CONTENT)
 section_graph.add_edge(DRAFT_CONTENT, SECTION_HUMAN_APPROVAL)
 section_graph.add_edge(SECTION_HUMAN_APPROVAL, END)
 
-section_app = section_graph.compile(checkpointer=MemorySaver())
-async def run_section_graph(state: SectionState) -> SectionState:
+section_app = section_graph.compile(checkpointer=checkpointer)
+async def start_section_graph(state: SectionState, thread_id: str = None, on_token=None):
     print("START SECTION, Title:", state.title)
-    config = get_config()
-    result = await section_app.ainvoke(state, config)
-    interrupt_state: SectionState = result['__interrupt__'][0].value['interrupt_state']
+    if thread_id is None:
+        thread_id = thread_id_for(state.topic, state.title)
+        snapshot = await section_app.aget_state(get_config(thread_id))
+        if snapshot.values and not snapshot.next:
+            # a finished standalone run of the same section starts over (the note graph
+            # passes its own thread ids, and a finished section there is one to keep)
+            await checkpointer.adelete_thread(thread_id)
+    config = get_config(thread_id)
+    # on_token(text) receives the draft as the model writes it
+    stream = (lambda node, text: on_token(text)) if on_token else None
+    snapshot = await section_app.aget_state(config)
+    if not snapshot.values:
+        await astream_tokens(section_app, state, config, {DRAFT_CONTENT}, stream)
+    elif snapshot.next and not snapshot.interrupts:
+        # left over from a crashed run: continue after the last completed node
+        await astream_tokens(section_app, None, config, {DRAFT_CONTENT}, stream)
+
+    snapshot = await section_app.aget_state(config)
+    if not snapshot.interrupts:
+        # already approved in an earlier run
+        return config, None
+    interrupt_state: SectionState = snapshot.interrupts[0].value['interrupt_state']
+    return config, interrupt_state
+
+def review_section(interrupt_state: SectionState) -> str:
     final_content = interrupt_state.draft_content
-    
+
     try:
         gui = ApprovalGUI(
             topic=interrupt_state.topic,
@@ -211,13 +237,32 @@ async def run_section_graph(state: SectionState) -> SectionState:
 
     if not final_content:
         final_content = interrupt_state.draft_content
+    return final_content
+
+async def review_section_at_desk(interrupt_state: SectionState, review_desk) -> str:
+    """The approved content, once the draft is approved in `review_desk`'s window; the event loop keeps running meanwhile."""
+    if review_desk is None:
+        # no window could be opened: approved as drafted, as when an ApprovalGUI fails
+        return interrupt_state.draft_content
+    final_content = await asyncio.wrap_future(
+        review_desk.submit(interrupt_state.topic, interrupt_state.title, interrupt_state.draft_content)
+    )
+    return final_content or interrupt_state.draft_content
 
-    end_of_task = await section_app.ainvoke(Command(resume=final_content), config)
-    final_state = SectionState(**end_of_task)
+async def resume_section_graph(config, final_content: str = None) -> SectionState:
+    if final_content is not None:
+        await section_app.ainvoke(Command(resume=final_content), config)
+    snapshot = await section_app.aget_state(config)
+    final_state = SectionState(**snapshot.values)
 
     print("END SECTION")
     return final_state
 
+async def run_section_graph(state: SectionState, thread_id: str = None, on_token=None) -> SectionState:
+    with traced(f"section-{state.title}"):
+        config, interrupt_state = await start_section_graph(state, thread_id, on_token)
+        final_content = review_section(interrupt_state) if interrupt_state is not None else None
+        return await resume_section_graph(config, final_content)
 
 if __name__ == '__main__':
     final_state = asyncio.run(
@@ -1,9 +1,255 @@
-from note_taker import app
-from IPython.display import Image
+import hashlib
+import io
+import json
+import os
 
-workflow_diagram = Image(
-    app.get_graph().draw_mermaid_png()
-)
+# graph pictures are drawn locally (Pillow) and cached by graph structure, so a GUI start
+# needs no network; DIAGRAM_RENDERER=mermaid uses the mermaid.ink service instead
+DIAGRAM_CACHE_DIR = './.diagram_cache'
+DIAGRAM_RENDERER = 'local'
+# bump when the drawing changes, so cached pictures are redrawn
+RENDERER_VERSION = 1
 
-with open("./workflow.png", "wb") as f:
-    f.write(workflow_diagram.data)
+FONT_SIZE = 14
+PAD_X, PAD_Y = 14, 8
+H_GAP, V_GAP = 24, 48
+MARGIN = 20
+LANE_GAP = 16
+# where along its edge a label sits, from source (0) to target (1)
+LABEL_AT = 0.6
+NODE_FILL, NODE_LINE = '#ECECFF', '#9370DB'
+TERMINAL_FILL = '#DDDDDD'
+EDGE_COLOR = '#333333'
+
+
+def _graph(app):
+    return app.get_graph() if hasattr(app, 'get_graph') else app
+
+
+def graph_hash(app, renderer: str = DIAGRAM_RENDERER) -> str:
+    """sha256 of the nodes and edges (and the renderer): equal for any graph that draws the same."""
+    graph = _graph(app)
+    payload = {
+        'renderer': renderer,
+        'version': RENDERER_VERSION,
+        'nodes': sorted((node_id, str(node.name)) for node_id, node in graph.nodes.items()),
+        'edges': sorted((edge.source, edge.target, '' if edge.data is None else str(edge.data), bool(edge.conditional))
+                        for edge in graph.edges),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _layers(graph):
+    """Nodes by layer (longest path from the start over forward edges) and the edges that point back up."""
+    ids = list(graph.nodes)
+    successors = {node_id: [] for node_id in ids}
+    for edge in graph.edges:
+        successors[edge.source].append(edge.target)
+
+    # depth-first from the start node: an edge to a node still on the stack closes a cycle
+    first = graph.first_node()
+    roots = ([first.id] if first else []) + ids
+    back, state = set(), {}
+    for root in roots:
+        if root in state:
+            continue
+        stack = [(root, iter(successors[root]))]
+        state[root] = 'open'
+        while stack:
+            node_id, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node_id] = 'done'
+                stack.pop()
+            elif state.get(child) == 'open':
+                back.add((node_id, child))
+            elif child not in state:
+                state[child] = 'open'
+                stack.append((child, iter(successors[child])))
+
+    layer = {node_id: 0 for node_id in ids}
+    incoming = {node_id: 0 for node_id in ids}
+    for source in ids:
+        for target in successors[source]:
+            if (source, target) not in back:
+                incoming[target] += 1
+    ready = [node_id for node_id in ids if not incoming[node_id]]
+    while ready:
+        source = ready.pop(0)
+        for target in successors[source]:
+            if (source, target) in back:
+                continue
+            layer[target] = max(layer[target], layer[source] + 1)
+            incoming[target] -= 1
+            if not incoming[target]:
+                ready.append(target)
+    last = graph.last_node()
+    if last is not None:
+        # the end node gets the bottom row to itself
+        others = [depth for node_id, depth in layer.items() if node_id != last.id]
+        layer[last.id] = max(others) + 1 if others else 0
+
+    layers = [[] for _ in range(max(layer.values()) + 1)] if ids else []
+    for node_id in ids:
+        layers[layer[node_id]].append(node_id)
+    # one barycenter sweep: children sit under the average position of their parents
+    position = {}
+    for row in layers:
+        def barycenter(node_id):
+            parents = [position[edge.source] for edge in graph.edges if edge.target == node_id and edge.source in position]
+            return sum(parents) / len(parents) if parents else 0.0
+        row.sort(key=barycenter)
+        for i, node_id in enumerate(row):
+            position[node_id] = i
+    return layers, back
+
+
+def _font():
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=FONT_SIZE)
+    except TypeError:
+        # Pillow without FreeType: the fixed bitmap font
+        return ImageFont.load_default()
+
+
+def _dashed(draw, start, end, dash=6, gap=4):
+    (x1, y1), (x2, y2) = start, end
+    length = max(1.0, ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5)
+    step = 0.0
+    while step < length:
+        a, b = step / length, min(step + dash, length) / length
+        draw.line([(x1 + (x2 - x1) * a, y1 + (y2 - y1) * a), (x1 + (x2 - x1) * b, y1 + (y2 - y1) * b)], fill=EDGE_COLOR, width=1)
+        step += dash + gap
+
+
+def _arrow(draw, start, end, size=8):
+    (x1, y1), (x2, y2) = start, end
+    length = max(1.0, ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5)
+    ux, uy = (x2 - x1) / length, (y2 - y1) / length
+    left = (x2 - ux * size - uy * size / 2, y2 - uy * size + ux * size / 2)
+    right = (x2 - ux * size + uy * size / 2, y2 - uy * size - ux * size / 2)
+    draw.polygon([(x2, y2), left, right], fill=EDGE_COLOR)
+
+
+def render_png(app) -> bytes:
+    """Draws the graph top to bottom with Pillow: no network, no graphviz."""
+    from PIL import Image, ImageDraw
+    graph = _graph(app)
+    font = _font()
+    layers, back = _layers(graph)
+
+    sizes = {}
+    for node_id, node in graph.nodes.items():
+        left, top, right, bottom = font.getbbox(str(node.name))
+        sizes[node_id] = (right - left + 2 * PAD_X, bottom - top + 2 * PAD_Y)
+    row_height = max((height for _, height in sizes.values()), default=0)
+    row_widths = [sum(sizes[node_id][0] for node_id in row) + H_GAP * (len(row) - 1) for row in layers]
+    content_width = max(row_widths, default=0)
+    width = content_width + 2 * MARGIN + LANE_GAP * (len(back) + 1)
+    height = len(layers) * row_height + (len(layers) - 1) * V_GAP + 2 * MARGIN
+
+    boxes = {}
+    for row_index, (row, row_width) in enumerate(zip(layers, row_widths)):
+        x = MARGIN + (content_width - row_width) / 2
+        y = MARGIN + row_index * (row_height + V_GAP)
+        for node_id in row:
+            node_width, node_height = sizes[node_id]
+            top = y + (row_height - node_height) / 2
+            boxes[node_id] = (x, top, x + node_width, top + node_height)
+            x += node_width + H_GAP
+
+    image = Image.new('RGB', (int(width), int(height)), 'white')
+    draw = ImageDraw.Draw(image)
+    labels = []
+    lane = MARGIN + content_width
+    for edge in graph.edges:
+        sx1, sy1, sx2, sy2 = boxes[edge.source]
+        tx1, ty1, tx2, ty2 = boxes[edge.target]
+        if (edge.source, edge.target) in back:
+            # up the right-hand side, in a lane of its own
+            lane += LANE_GAP
+            source_y, target_y = (sy1 + sy2) / 2, (ty1 + ty2) / 2
+            if edge.source == edge.target:
+                source_y, target_y = source_y + 4, target_y - 4
+            points = [(sx2, source_y), (lane, source_y), (lane, target_y), (tx2, target_y)]
+        else:
+            points = [((sx1 + sx2) / 2, sy2), ((tx1 + tx2) / 2, ty1)]
+        for start, end in zip(points, points[1:]):
+            if edge.conditional:
+                _dashed(draw, start, end)
+            else:
+                draw.line([start, end], fill=EDGE_COLOR, width=1)
+        _arrow(draw, points[-2], points[-1])
+        if edge.data is not None:
+            middle = len(points) // 2
+            (x1, y1), (x2, y2) = points[middle - 1], points[middle]
+            # nearer the target, where edges leaving the same node have fanned out
+            labels.append((x1 + (x2 - x1) * LABEL_AT, y1 + (y2 - y1) * LABEL_AT, str(edge.data)))
+
+    first, last = graph.first_node(), graph.last_node()
+    terminals = {node.id for node in (first, last) if node is not None}
+    for node_id, (x1, y1, x2, y2) in boxes.items():
+        fill = TERMINAL_FILL if node_id in terminals else NODE_FILL
+        draw.rounded_rectangle((x1, y1, x2, y2), radius=(y2 - y1) / 2 if node_id in terminals else 5,
+                               fill=fill, outline=NODE_LINE, width=1)
+        draw.text(((x1 + x2) / 2, (y1 + y2) / 2), str(graph.nodes[node_id].name), fill='black', font=font, anchor='mm')
+    placed = []
+    for x, y, text in labels:
+        left, top, right, bottom = draw.textbbox((x, y), text, font=font, anchor='mm')
+        box = [left - 2, top - 1, right + 2, bottom + 1]
+        # step down below any label it would cover
+        while any(box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3] for other in placed):
+            step = max(other[3] for other in placed
+                       if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]) - box[1] + 1
+            box[1] += step
+            box[3] += step
+            y += step
+        placed.append(box)
+        draw.rectangle(box, fill='white')
+        draw.text((x, y), text, fill=EDGE_COLOR, font=font, anchor='mm')
+
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+    return out.getvalue()
+
+
+def diagram_png(app, cache_dir: str = None, renderer: str = None) -> bytes:
+    """PNG bytes of `app`'s graph (a compiled graph or a Graph), drawn once per graph structure.
+
+    The picture is cached in `cache_dir` under graph_hash(); it is only drawn
+    again when nodes or edges change. The mermaid renderer needs the network
+    and falls back to the local one without it.
+    """
+    cache_dir = cache_dir or os.environ.get('DIAGRAM_CACHE_DIR', DIAGRAM_CACHE_DIR)
+    renderer = renderer or os.environ.get('DIAGRAM_RENDERER', DIAGRAM_RENDERER)
+    graph = _graph(app)
+    path = os.path.join(cache_dir, f'{graph_hash(graph, renderer)}.png')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    png = None
+    if renderer == 'mermaid':
+        try:
+            png = graph.draw_mermaid_png()
+        except Exception as e:
+            print(f"DIAGRAM: mermaid rendering failed ({type(e).__name__}: {e}), drawing locally")
+    if png is None:
+        png = render_png(graph)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(png)
+    os.replace(path + '.tmp', path)
+    return png
+
+
+def save_diagram(app, path: str) -> str:
+    with open(path, 'wb') as f:
+        f.write(diagram_png(app))
+    return path
+
+
+if __name__ == '__main__':
+    from note_taker import app
+    print("DIAGRAM WRITTEN:", save_diagram(app, './workflow.png'))
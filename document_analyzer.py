@@ -1,86 +1,791 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-loader = PyPDFLoader('./final_year_project_documentation.pdf')
-docs = loader.load()
+# heavy libraries (langchain loaders, FAISS, Ollama clients) are imported on first use,
+# so importing this module costs milliseconds; see DocumentQA.warm()
+DOCUMENT_PATHS = ['./final_year_project_documentation.pdf']
+FAISS_DIR = './faiss_store'
+MANIFEST_FILE = 'manifest.json'
+EMBED_MODEL = 'embeddinggemma:300m'
+LLM_MODEL = 'gemma3:4b'
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# embedding batches in flight while the next pages are parsed; bounds ingestion memory
+INGEST_WINDOW = 4
+# processes parsing PDFs when more than one file changed (PyPDF is pure Python: CPU-bound, GIL-limited)
+PARSE_WORKERS = os.cpu_count() or 1
 
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200
-)
-chunks = splitter.split_documents(docs)
+# FAISS index: 'flat' (exact, brute force), 'ivf_flat', 'hnsw', 'ivf_pq' or 'ivf_sq8'
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq', 'ivf_sq8')
+INDEX_TYPE = os.environ.get('FAISS_INDEX', 'flat')
+# FAISS_MMAP=1 opens an up-to-date index memory-mapped instead of reading it into RAM
+MMAP_INDEX = os.environ.get('FAISS_MMAP', '0') == '1'
+# below this many chunks exact search is fast and IVF/PQ training too noisy: the index stays flat
+MIN_TRAIN_VECTORS = 10_000
+TRAIN_SAMPLE = 100_000
+# vectors read back and added per step when an index is rebuilt
+REBUILD_BLOCK = 65_536
+INDEX_NLIST = 4096
+HNSW_M = 32
+# PQ code bytes per vector (the largest divisor of the dimension up to this)
+PQ_M = 64
+# search-time knobs: inverted lists probed (IVF) and candidate list size (HNSW)
+INDEX_NPROBE = 16
+INDEX_EF_SEARCH = 64
 
+# 'dense' (FAISS search), 'bm25' (keyword index only) or 'hybrid' (BM25 candidates, exact vector
+# rerank over them, the two rankings fused); RETRIEVAL_MODE sets the default, each query can pick its own
+RETRIEVAL_MODES = ('dense', 'bm25', 'hybrid')
+RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'dense')
+RETRIEVAL_K = 4
+HYBRID_CANDIDATES = 100
+KEYWORD_INDEX_FILE = 'bm25.pkl'
+# chunks retrieved per question when packing; overlaps and duplicates are merged away, then
+# the best of it fills the model's context budget (token_budget.CONTEXT_TOKEN_BUDGETS).
+# More candidates than RETRIEVAL_K buy coverage where the budget has room for it: questions
+# touching several pages reach all of them; where RETRIEVAL_K chunks already fill the budget, the
+# extra candidates only spend it (benchmark.py document_qa, prompt_tokens against hit_rate)
+CONTEXT_CANDIDATES = 2 * RETRIEVAL_K
+# prefix of a chunk searched for in its neighbour to detect the splitter's overlap
+OVERLAP_PROBE_CHARS = 32
 
-from langchain_ollama.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
-import faiss
-import os
+QA_PROMPT = """
+Answer the following question based on the provided context:
+CONTEXT:
+<context>
+{context}
+</context>
 
-FAISS_DIR = './faiss_store'
-EMBED_MODEL = 'embeddinggemma:300m'
-embeddings = OllamaEmbeddings(model=EMBED_MODEL)
-
-def load_vector_store():
-    if not os.path.exists(FAISS_DIR):
-        vector_store = FAISS.from_documents(chunks, embeddings)
-        FAISS.save_local(
-            vector_store,
-            folder_path=FAISS_DIR,
+QUESTION: "{question}"
+""".strip()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(path: str, page, text: str) -> str:
+    """The chunk's id in the index and docstore. Where it came from is part of it: identical text
+    on two pages is two entries, each with its own source/page metadata (the embedding cache is
+    keyed by content alone, so it is still embedded once)."""
+    return hashlib.sha256(json.dumps([path, page, text]).encode('utf-8')).hexdigest()
+
+def read_manifest(folder_path: str = FAISS_DIR) -> dict:
+    """{'embed_model': ..., 'index': {'type': ..., 'factory': ...}, 'files': {path: {'sha256': ..., 'chunks': [chunk id, ...]}}}"""
+    path = os.path.join(folder_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def manifest_version(manifest: dict) -> str:
+    """Changes whenever the indexed content, embedding model or index type does."""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()
+
+def write_manifest(manifest: dict, folder_path: str = FAISS_DIR):
+    path = os.path.join(folder_path, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+class DocumentParseError(Exception):
+    """A file could not be read or parsed; ingestion skips it and carries on."""
+
+
+def corpus_paths(directory: str):
+    """Every PDF under `directory`, in a stable order."""
+    paths = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        paths += [os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.pdf')]
+    return paths
+
+def parse_pdf(path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """The chunks of every page of `path`, one list per page; runs in a parser process."""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    # PyPDFLoader puts 'source' (the path) and 'page' in every page's metadata; the chunks inherit it
+    return [splitter.split_documents([page]) for page in PyPDFLoader(path).lazy_load()]
+
+def overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that `b` starts with."""
+    probe = b[:OVERLAP_PROBE_CHARS]
+    if len(probe) < OVERLAP_PROBE_CHARS:
+        return 0
+    start = a.find(probe)
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+def _join(a: str, b: str):
+    if b in a:
+        return a
+    if a in b:
+        return b
+    n = overlap(a, b)
+    if n:
+        return a + b[n:]
+    n = overlap(b, a)
+    if n:
+        return b + a[n:]
+    return None
+
+def merge_chunks(docs):
+    """Passage texts, best first: chunks of the same page that overlap or contain one another
+    (the splitter's chunk_overlap) become one passage at the rank of the best of them."""
+    passages = []
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get('source'), doc.metadata.get('page'))
+        text = doc.page_content
+        # a chunk can bridge two passages collected before it, so keep joining until nothing changes
+        merged = True
+        while merged:
+            merged = False
+            for passage in passages:
+                joined = _join(passage[2], text) if passage[1] == key else None
+                if joined is not None:
+                    passages.remove(passage)
+                    rank, text = min(rank, passage[0]), joined
+                    merged = True
+                    break
+        passages.append((rank, key, text))
+    return [text for _, _, text in sorted(passages, key=lambda passage: passage[0])]
+
+def _failed_pages(path: str, error: BaseException):
+    raise DocumentParseError(f"{path}: {type(error).__name__}: {error}") from error
+    yield
+
+
+def effective_index_type(index_type: str, n: int) -> str:
+    """The type an index of `n` vectors is built as: trained types fall back to flat while the corpus is small."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+    return 'flat' if index_type.startswith('ivf') and n < MIN_TRAIN_VECTORS else index_type
+
+def index_factory_string(index_type: str, dim: int, n: int) -> str:
+    """faiss.index_factory description for `n` vectors of `dim` dimensions."""
+    index_type = effective_index_type(index_type, n)
+    if index_type == 'flat':
+        return 'Flat'
+    if index_type == 'hnsw':
+        return f'HNSW{HNSW_M}'
+    # ~4 sqrt(n) lists, each with enough training points (faiss wants 39 per centroid)
+    nlist = max(1, min(INDEX_NLIST, int(4 * math.sqrt(n)), n // 39))
+    if index_type == 'ivf_pq':
+        m = max(m for m in range(1, min(PQ_M, dim) + 1) if dim % m == 0)
+        return f'IVF{nlist},PQ{m}'
+    if index_type == 'ivf_sq8':
+        return f'IVF{nlist},SQ8'
+    return f'IVF{nlist},Flat'
+
+def build_index(vectors, index_type: str = INDEX_TYPE, train_sample: int = TRAIN_SAMPLE):
+    """Returns (index, factory string): trained on a sample of at most `train_sample` vectors, then filled."""
+    import numpy as np
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    return build_index_from(lambda positions: vectors[positions], n, dim, index_type, train_sample)
+
+def build_index_from(read, n: int, dim: int, index_type: str = INDEX_TYPE, train_sample: int = TRAIN_SAMPLE,
+                     block: int = REBUILD_BLOCK):
+    """build_index over vectors that `read(positions)` returns a block at a time: only the
+    training sample and one block are held besides the index being filled."""
+    import faiss
+    import numpy as np
+    factory = index_factory_string(index_type, dim, n)
+    index = faiss.index_factory(dim, factory)
+    if isinstance(index, faiss.IndexIVFPQ):
+        # polysemous codes only serve Hamming-threshold search, which is never used here,
+        # and training them was most of an IVF-PQ build
+        index.do_polysemous_training = False
+    if not index.is_trained:
+        sample = np.arange(n)
+        if n > train_sample:
+            sample = np.sort(np.random.default_rng(0).choice(n, train_sample, replace=False))
+        index.train(np.ascontiguousarray(read(sample), dtype=np.float32))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # saved with the index and kept up to date by later adds, so a memory-mapped (read-only)
+        # copy can read vectors back by position (hybrid rerank) without building one
+        ivf.make_direct_map()
+    for start in range(0, n, block):
+        index.add(np.ascontiguousarray(read(np.arange(start, min(n, start + block))), dtype=np.float32))
+    return index, factory
+
+def has_direct_map(index) -> bool:
+    """Whether the index can reconstruct vectors by position: always, except IVF without a direct map."""
+    import faiss
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is None or ivf.direct_map.type != faiss.DirectMap.NoMap
+
+def tune_index(index, nprobe: int = INDEX_NPROBE, ef_search: int = INDEX_EF_SEARCH):
+    import faiss
+    params = faiss.ParameterSpace()
+    if faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, 'nprobe', nprobe)
+    if hasattr(faiss.downcast_index(index), 'hnsw'):
+        params.set_index_parameter(index, 'efSearch', ef_search)
+    return index
+
+
+class DocumentQA:
+    """Question answering over a set of documents.
+
+    Nothing is loaded in the constructor: the splitter, embeddings, index and LLM
+    are created on first use (thread-safe), or all at once with warm().
+    """
+
+    def __init__(self, paths=DOCUMENT_PATHS, folder_path: str = FAISS_DIR,
+                 embed_model: str = EMBED_MODEL, llm_model: str = LLM_MODEL, window: int = INGEST_WINDOW,
+                 index_type: str = INDEX_TYPE, nprobe: int = INDEX_NPROBE, ef_search: int = INDEX_EF_SEARCH,
+                 mmap: bool = MMAP_INDEX, workers: int = PARSE_WORKERS,
+                 retrieval_mode: str = RETRIEVAL_MODE, candidates: int = HYBRID_CANDIDATES,
+                 cache_answers: bool = True, pack_context: bool = True, context_tokens: int = None,
+                 context_candidates: int = CONTEXT_CANDIDATES):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"unknown retrieval mode {retrieval_mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+        self.paths = list(paths)
+        self.folder_path = folder_path
+        self.embed_model = embed_model
+        self.llm_model = llm_model
+        self.window = window
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.mmap = mmap
+        self.workers = workers
+        self.retrieval_mode = retrieval_mode
+        self.candidates = candidates
+        self.cache_answers = cache_answers
+        self.pack_context = pack_context
+        self.context_tokens = context_tokens
+        self.context_candidates = context_candidates
+        # totals over every prompt built: questions, chunks, passages, raw_tokens, packed_tokens
+        self.context_stats = {'questions': 0, 'chunks': 0, 'passages': 0, 'raw_tokens': 0, 'packed_tokens': 0}
+        # manifest_version() of the loaded index; the question and answer caches are tied to it
+        self.index_version = None
+        # counts from the last load_vector_store(): files, failed, pages, embedded, removed, reused, seconds
+        self.ingest_stats = {}
+        self._lock = threading.RLock()
+        self._splitter = None
+        self._embeddings = None
+        self._vector_store = None
+        self._keyword_index = None
+        self._positions = None
+        self._question_cache = None
+        self._answer_cache = None
+        self._llm = None
+
+    @property
+    def splitter(self):
+        with self._lock:
+            if self._splitter is None:
+                from langchain_text_splitters import RecursiveCharacterTextSplitter
+                self._splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=CHUNK_SIZE,
+                    chunk_overlap=CHUNK_OVERLAP
+                )
+            return self._splitter
+
+    @property
+    def embeddings(self):
+        with self._lock:
+            if self._embeddings is None:
+                from langchain_ollama.embeddings import OllamaEmbeddings
+                from embedding_cache import CachedEmbeddings, default_embedding_store
+                # batched, concurrent and cached by content hash; see embedding_cache for the knobs
+                self._embeddings = CachedEmbeddings(OllamaEmbeddings(model=self.embed_model), self.embed_model, default_embedding_store())
+            return self._embeddings
+
+    @property
+    def vector_store(self):
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = self.load_vector_store()
+                self.question_cache.invalidate(self.index_version)
+                if self.answer_cache is not None:
+                    self.answer_cache.invalidate(self.index_version)
+            return self._vector_store
+
+    @property
+    def question_cache(self):
+        """Normalized question -> embedding and retrieved chunks (answer_cache.QuestionCache)."""
+        with self._lock:
+            if self._question_cache is None:
+                from answer_cache import QuestionCache
+                self._question_cache = QuestionCache()
+            return self._question_cache
+
+    @property
+    def answer_cache(self):
+        """Semantic answer cache, or None when disabled (cache_answers=False or ANSWER_CACHE=0)."""
+        with self._lock:
+            if self._answer_cache is None and self.cache_answers:
+                from answer_cache import default_answer_cache
+                # answers are kept per store: other DocumentQAs share the SQLite file
+                self._answer_cache = default_answer_cache(os.path.abspath(self.folder_path))
+                # None (disabled by the environment) is not retried
+                self.cache_answers = self._answer_cache is not None
+            return self._answer_cache
+
+    @property
+    def retriever(self):
+        return self.vector_store.as_retriever()
+
+    @property
+    def keyword_index(self):
+        """BM25 over the chunks in the vector store, saved next to it and brought up to date on load."""
+        with self._lock:
+            if self._keyword_index is None:
+                from keyword_index import BM25Index
+                vector_store = self.vector_store
+                path = os.path.join(self.folder_path, KEYWORD_INDEX_FILE)
+                started = time.perf_counter()
+                index = BM25Index.load(path)
+                added, removed = index.sync(vector_store.index_to_docstore_id.values(),
+                                            lambda doc_id: vector_store.docstore.search(doc_id).page_content)
+                if added or removed:
+                    index.save(path)
+                print(f"BM25: {len(index)} chunks, {len(index.postings)} terms ({added} added, {removed} removed "
+                      f"in {time.perf_counter() - started:.2f}s)")
+                self._keyword_index = index
+            return self._keyword_index
+
+    @property
+    def positions(self):
+        """docstore id -> position in the FAISS index, for reading stored vectors back."""
+        with self._lock:
+            if self._positions is None:
+                vector_store = self.vector_store
+                if not has_direct_map(vector_store.index):
+                    # IVF indexes only reconstruct by position with a direct map; indexes built before
+                    # it was saved with them get one here, in memory (a memory-mapped copy is read-only)
+                    import faiss
+                    if self.mmap:
+                        vector_store.index = self.open_index().index
+                    faiss.extract_index_ivf(vector_store.index).make_direct_map()
+                self._positions = {doc_id: position for position, doc_id in vector_store.index_to_docstore_id.items()}
+            return self._positions
+
+    @property
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                from langchain_ollama import ChatOllama
+                self._llm = ChatOllama(model=self.llm_model)
+            return self._llm
+
+    def warm(self):
+        """Load everything up front, e.g. when a service starts."""
+        self.vector_store
+        if self.retrieval_mode != 'dense':
+            self.keyword_index
+            self.positions
+        self.llm
+        return self
+
+    def iter_pages(self, path: str):
+        """One page at a time; the PDF is never held in memory as a whole."""
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(path).lazy_load()
+
+    def split_pages(self, path: str):
+        try:
+            for page in self.iter_pages(path):
+                yield self.splitter.split_documents([page])
+        except Exception as error:
+            raise DocumentParseError(f"{path}: {type(error).__name__}: {error}") from error
+
+    def parse_files(self, paths):
+        """(path, pages) for every path, in order; each page is a list of chunks.
+
+        Iterating a file's pages raises DocumentParseError if it cannot be parsed.
+        A single file is streamed page by page in this process; several are parsed
+        in a pool of `workers` processes, a few files ahead of the indexer.
+        """
+        if self.workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                yield path, self.split_pages(path)
+            return
+
+        # multiprocessing costs more to import than the rest of this module
+        from concurrent.futures import ProcessPoolExecutor
+
+        pending = deque()
+        remaining = iter(paths)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            def fill():
+                while len(pending) < 2 * self.workers:
+                    path = next(remaining, None)
+                    if path is None:
+                        return
+                    pending.append((path, pool.submit(parse_pdf, path, CHUNK_SIZE, CHUNK_OVERLAP)))
+
+            try:
+                fill()
+                while pending:
+                    path, future = pending.popleft()
+                    try:
+                        pages = future.result()
+                    except Exception as error:
+                        pages = _failed_pages(path, error)
+                    fill()
+                    yield path, pages
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def open_index(self, mmap: bool = False):
+        """The saved index, searched with this instance's nprobe/efSearch.
+
+        With `mmap` the vectors stay on disk and are paged in by the OS as
+        searches touch them (read-only); the docstore is always read into memory.
+        """
+        import pickle
+        import faiss
+        from langchain_community.vectorstores import FAISS
+
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(os.path.join(self.folder_path, 'index.faiss'), flags)
+        tune_index(index, self.nprobe, self.ef_search)
+        # written by FAISS.save_local
+        with open(os.path.join(self.folder_path, 'index.pkl'), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+
+    def rebuild_index(self, vector_store, removed) -> str:
+        """Retrains the index as `index_type` on the vectors it holds, minus `removed`; returns the factory string.
+
+        No re-embedding: the vectors are read back from the current index, a block
+        at a time, so the two indexes are the only full copies held.
+        """
+        import faiss
+        import numpy as np
+        removed = set(removed)
+        ids = vector_store.index_to_docstore_id
+        old = vector_store.index
+        if not has_direct_map(old):
+            faiss.extract_index_ivf(old).make_direct_map()
+        keep = np.array([i for i in range(old.ntotal) if ids[i] not in removed], dtype=np.int64)
+        index, factory = build_index_from(lambda positions: old.reconstruct_batch(keep[positions]), len(keep), old.d, self.index_type)
+        vector_store.index = tune_index(index, self.nprobe, self.ef_search)
+        vector_store.index_to_docstore_id = {position: ids[i] for position, i in enumerate(keep.tolist())}
+        if removed:
+            vector_store.docstore.delete(list(removed))
+        return factory
+
+    def load_vector_store(self):
+        """Brings the saved index in line with `paths`, embedding only chunks it has not seen.
+
+        Unchanged files (same sha256) are not even parsed; chunks that disappeared
+        from every file are deleted from the index and docstore. Changed files are
+        streamed: pages are split as they are read and new chunks go out in
+        embedding batches, at most `window` in flight, and are appended to the
+        index as each batch returns. A new store is built flat and then trained
+        as `index_type`; an index that is already up to date is opened as is,
+        memory-mapped if `mmap` is set.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        manifest = read_manifest(self.folder_path)
+        vector_store = None
+        index_type, factory = 'flat', 'Flat'
+        sha256s, failed = {}, {}
+        for path in self.paths:
+            try:
+                sha256s[path] = file_hash(path)
+            except OSError as error:
+                failed[path] = f"{path}: {type(error).__name__}: {error}"
+        if manifest.get('embed_model') == self.embed_model and os.path.exists(os.path.join(self.folder_path, 'index.faiss')):
+            saved = manifest.get('index', {'type': 'flat', 'factory': 'Flat'})
+            index_type, factory = saved['type'], saved['factory']
+            files = manifest.get('files', {})
+            chunks = len({key for entry in files.values() for key in entry['chunks']})
+            unchanged = files.keys() == sha256s.keys() and all(files[path]['sha256'] == sha256 for path, sha256 in sha256s.items())
+            if unchanged and index_type == effective_index_type(self.index_type, chunks):
+                vector_store = self.open_index(mmap=self.mmap)
+                self.index_version = manifest_version(manifest)
+                self.ingest_stats = {'files': len(self.paths), 'failed': {}, 'pages': 0, 'embedded': 0, 'removed': 0,
+                                     'reused': vector_store.index.ntotal, 'seconds': 0.0}
+                print(f"Index: up to date, {vector_store.index.ntotal} chunks ({factory}{', memory-mapped' if self.mmap else ''})")
+                return vector_store
+            vector_store = self.open_index()
+        elif os.path.exists(self.folder_path):
+            # no manifest (or another embedding model): nothing in there can be trusted
+            print("Rebuilding index:", self.folder_path)
+            manifest = {}
+        files = manifest.get('files', {}) if vector_store is not None else {}
+
+        indexed = set(vector_store.index_to_docstore_id.values()) if vector_store is not None else set()
+        seen = set(indexed)
+        batch_size = self.embeddings.batch_size
+        new_files = {}
+        batch = []
+        in_flight = deque()
+        added = pages = 0
+        started = time.perf_counter()
+
+        def append(limit: int):
+            # oldest first, so the index keeps document order
+            nonlocal vector_store, added
+            while len(in_flight) > limit:
+                future, keys, chunks = in_flight.popleft()
+                text_embeddings = list(zip([chunk.page_content for chunk in chunks], future.result()))
+                metadatas = [chunk.metadata for chunk in chunks]
+                if vector_store is None:
+                    vector_store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=keys)
+                else:
+                    vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=keys)
+                added += len(keys)
+
+        with ThreadPoolExecutor(max_workers=self.window) as pool:
+            def submit():
+                if batch:
+                    keys, chunks = zip(*batch)
+                    future = pool.submit(self.embeddings.embed_batch, [chunk.page_content for chunk in chunks])
+                    in_flight.append((future, list(keys), list(chunks)))
+                    batch.clear()
+
+            try:
+                changed = []
+                for path, sha256 in sha256s.items():
+                    if files.get(path, {}).get('sha256') == sha256:
+                        new_files[path] = files[path]
+                    else:
+                        changed.append(path)
+                for path, parsed in self.parse_files(changed):
+                    hashes = []
+                    try:
+                        for chunks in parsed:
+                            pages += 1
+                            for chunk in chunks:
+                                key = chunk_id(path, chunk.metadata.get('page'), chunk.page_content)
+                                hashes.append(key)
+                                if key in seen:
+                                    continue
+                                seen.add(key)
+                                batch.append((key, chunk))
+                                if len(batch) >= batch_size:
+                                    submit()
+                                    append(self.window)
+                            if pages % 100 == 0:
+                                elapsed = time.perf_counter() - started
+                                print(f"INGEST: {pages} pages, {added} chunks indexed ({pages / elapsed:.1f} pages/s)")
+                    except DocumentParseError as error:
+                        failed[path] = str(error)
+                        print("INGEST FAILED:", failed[path])
+                        continue
+                    new_files[path] = {'sha256': sha256s[path], 'chunks': hashes}
+                submit()
+                append(0)
+            except BaseException:
+                for future, _, _ in in_flight:
+                    future.cancel()
+                raise
+
+        for path in failed:
+            # keep what was indexed for it before; the next run tries again
+            if path in files:
+                new_files[path] = files[path]
+        if vector_store is None:
+            raise ValueError(f"nothing to index in {self.paths}" + (f" ({len(failed)} failed)" if failed else ""))
+        wanted = {key for entry in new_files.values() for key in entry['chunks']}
+        # everything in the index, so chunks of a file that failed halfway go too
+        removed = list(set(vector_store.index_to_docstore_id.values()) - wanted)
+        target_type = effective_index_type(self.index_type, len(wanted))
+        # IVF and HNSW indexes cannot drop vectors the way FAISS.delete expects
+        # (HNSW has no remove_ids, IVF keeps the old ids): those rebuild, and so does a change of type
+        rebuilt = target_type != index_type or (removed and index_type != 'flat')
+        if rebuilt:
+            trained = time.perf_counter()
+            factory = self.rebuild_index(vector_store, removed)
+            index_type = target_type
+            print(f"Index: trained {factory} on {vector_store.index.ntotal} chunks in {time.perf_counter() - trained:.2f}s")
+        elif removed:
+            vector_store.delete(removed)
+        elapsed = time.perf_counter() - started
+        reused = len(wanted & indexed)
+        print(
+            f"Index: {added} embedded, {len(removed)} removed, {reused} reused, {len(failed)} files failed "
+            f"({pages} pages parsed in {elapsed:.2f}s, {pages / elapsed if elapsed else 0:.1f} pages/s, "
+            f"{added / elapsed if elapsed else 0:.1f} chunks/s)"
         )
-        print("Store")
+        self.ingest_stats = {'files': len(self.paths), 'failed': failed, 'pages': pages, 'embedded': added,
+                             'removed': len(removed), 'reused': reused, 'seconds': elapsed}
+        print("EMBEDDINGS:", self.embeddings.stats())
+
+        manifest = {
+            'embed_model': self.embed_model,
+            'index': {'type': index_type, 'factory': factory},
+            'files': new_files,
+        }
+        if added or removed or rebuilt or new_files != files:
+            vector_store.save_local(self.folder_path)
+            write_manifest(manifest, self.folder_path)
+        self.index_version = manifest_version(manifest)
         return vector_store
 
-    vector_store = FAISS.load_local(
-        folder_path=FAISS_DIR,
-        embeddings=embeddings,
-        allow_dangerous_deserialization=True,
-    )
-    print("Local")
-    return vector_store
+    def question_vector(self, question: str):
+        """The question's embedding; repeats of a question are not embedded again."""
+        vector = self.question_cache.get(question, 'vector')
+        if vector is None:
+            vector = self.embeddings.embed_query(question)
+            self.question_cache.put(question, 'vector', vector)
+        return vector
 
+    def rerank(self, question: str, ids):
+        """`ids` by exact L2 distance between their stored vectors and the question's embedding."""
+        import numpy as np
+        query = np.asarray(self.question_vector(question), dtype=np.float32)
+        positions = np.array([self.positions[doc_id] for doc_id in ids], dtype=np.int64)
+        # after self.positions, which may swap in an index that can read vectors back
+        vectors = self.vector_store.index.reconstruct_batch(positions)
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        return [ids[i] for i in np.argsort(distances, kind='stable')]
 
-# # vector_store = FAISS.from_documents(chunks, embeddings)
-# # faiss.write_index(vector_store.index, 'index_file.faiss')
-# vector_store = FAISS.load_local(faiss.read_index('index_file.faiss'))
+    def retrieve(self, question: str, mode: str = None, k: int = RETRIEVAL_K):
+        """The `k` chunks for `question`; `mode` overrides retrieval_mode for this query.
 
+        'bm25' and 'hybrid' only look at the top `candidates` keyword matches, so
+        a keyword-heavy question never scans the dense index; hybrid falls back to
+        dense search when no chunk shares a term with the question. Results are
+        cached per normalized question until the index changes.
+        """
+        mode = mode or self.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"unknown retrieval mode {mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+        vector_store = self.vector_store
+        docs = self.question_cache.get(question, 'docs', (mode, k))
+        if docs is None:
+            docs = self._retrieve(vector_store, question, mode, k)
+            self.question_cache.put(question, 'docs', docs, (mode, k))
+        return docs
 
-vector_store = load_vector_store()
-retriever = vector_store.as_retriever()
+    def _retrieve(self, vector_store, question: str, mode: str, k: int):
+        from keyword_index import reciprocal_rank_fusion
+        if mode == 'dense':
+            return vector_store.similarity_search_by_vector(self.question_vector(question), k=k)
 
+        candidates = [doc_id for doc_id, _ in self.keyword_index.search(question, self.candidates)]
+        if mode == 'bm25':
+            ranked = candidates[:k]
+        elif not candidates:
+            return vector_store.similarity_search_by_vector(self.question_vector(question), k=k)
+        else:
+            ranked = reciprocal_rank_fusion([candidates, self.rerank(question, candidates)])[:k]
+        return [vector_store.docstore.search(doc_id) for doc_id in ranked]
 
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import PromptTemplate
+    def context(self, question: str, mode: str = None) -> str:
+        """Retrieved chunks as prompt context.
 
-llm = ChatOllama(model='gemma3:4b')
+        With pack_context, overlapping chunks of a page are merged, sentences seen
+        in a better passage are dropped, and the passages fill the model's token
+        budget best first. Otherwise the top RETRIEVAL_K chunks are joined as they are.
+        """
+        from token_budget import context_budget, count_tokens, dedupe_sentences, pack
+        if not self.pack_context:
+            return "\n\n".join(doc.page_content for doc in self.retrieve(question, mode))
 
-def ask_on_document(question:str):
-    context = retriever.invoke(question)
-    context = [doc.page_content for doc in context]
-    context = "\n\n".join(context)
+        docs = self.retrieve(question, mode, k=self.context_candidates)
+        budget = self.context_tokens or context_budget(self.llm_model)
+        passages = pack(dedupe_sentences(merge_chunks(docs)), budget)
+        context = "\n\n".join(passages)
+        raw_tokens = count_tokens("\n\n".join(doc.page_content for doc in docs))
+        packed_tokens = count_tokens(context)
+        for key, value in (('questions', 1), ('chunks', len(docs)), ('passages', len(passages)),
+                           ('raw_tokens', raw_tokens), ('packed_tokens', packed_tokens)):
+            self.context_stats[key] += value
+        print(f"CONTEXT: {len(docs)} chunks -> {len(passages)} passages, {raw_tokens} -> {packed_tokens} tokens "
+              f"(budget {budget}, {1 - packed_tokens / raw_tokens if raw_tokens else 0:.0%} saved)")
+        return context
 
-    prompt = PromptTemplate.from_template("""
-Answer the following question based on the provided context:
-CONTEXT: 
-<context>
-{context}
-</context>
+    def prompt(self, question: str, mode: str = None) -> str:
+        return QA_PROMPT.format(context=self.context(question, mode), question=question)
 
-QUESTION: "{question}"
-""".strip()).format(
-        context=context,
-        question=question
+    def ask(self, question: str, mode: str = None) -> str:
+        """The LLM's answer; a question close enough to one answered before gets that answer."""
+        mode = mode or self.retrieval_mode
+        self.vector_store
+        cache = self.answer_cache
+        if cache is None:
+            return self.llm.invoke(self.prompt(question, mode)).content
+        scope = f'{self.llm_model}|{mode}'
+        vector = self.question_vector(question)
+        answer = cache.lookup(scope, question, vector)
+        if answer is None:
+            answer = self.llm.invoke(self.prompt(question, mode)).content
+            cache.put(scope, question, vector, answer)
+        return answer
+
+
+document_qa = DocumentQA()
+
+def ask_on_document(question:str, mode: str = None):
+    print(
+        # document_qa.ask(question, mode)
+        document_qa.prompt(question, mode)
     )
 
+def ingest_corpus(directory: str, folder_path: str = FAISS_DIR, workers: int = PARSE_WORKERS) -> dict:
+    """Indexes every PDF under `directory` into the store at `folder_path`."""
+    started = time.perf_counter()
+    paths = corpus_paths(directory)
+    if not paths:
+        raise ValueError(f"no PDFs under {directory}")
+    qa = DocumentQA(paths, folder_path, workers=workers)
+    qa.load_vector_store()
+    stats = dict(qa.ingest_stats, wall_seconds=time.perf_counter() - started)
     print(
-        # llm.invoke(prompt).content
-        prompt
+        f"INGESTED: {stats['files']} files ({len(stats['failed'])} failed), {stats['pages']} pages, "
+        f"{stats['embedded']} chunks embedded in {stats['wall_seconds']:.2f}s "
+        f"({stats['pages'] / stats['wall_seconds']:.1f} pages/s, {workers} parser processes)"
     )
+    for error in stats['failed'].values():
+        print("  FAILED:", error)
+    return stats
+
+def __getattr__(name):
+    # the old module-level objects, built on first access
+    if name in ('vector_store', 'retriever', 'embeddings', 'llm', 'splitter'):
+        return getattr(document_qa, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-ask_on_document('What is the project?')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Question answering over the project documents')
+    commands = parser.add_subparsers(dest='command')
+    ingest = commands.add_parser('ingest', help='index every PDF under a directory')
+    ingest.add_argument('directory')
+    ingest.add_argument('--store', default=FAISS_DIR, help='FAISS store folder')
+    ingest.add_argument('--workers', type=int, default=PARSE_WORKERS, help='PDF parser processes')
+    ask = commands.add_parser('ask', help='print the prompt for a question')
+    ask.add_argument('question')
+    ask.add_argument('--mode', choices=RETRIEVAL_MODES, help=f'retrieval mode (default {RETRIEVAL_MODE})')
+    args = parser.parse_args()
 
-# if __name__ == '__main__':
-#     while True:
-#         print("="*75)
-#         usr = input("Ask on document: ")
-#         result = qa_chain.run(usr)
-#         print(result, end='\n\n')
+    if args.command == 'ingest':
+        ingest_corpus(args.directory, args.store, args.workers)
+    elif args.command == 'ask':
+        ask_on_document(args.question, args.mode)
+    else:
+        document_qa.warm()
+        ask_on_document('What is the project?')
+    # while True:
+    #     print("="*75)
+    #     usr = input("Ask on document: ")
+    #     print(document_qa.ask(usr), end='\n\n')
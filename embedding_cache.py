@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = './.embedding_cache.sqlite'
+EMBED_BATCH_SIZE = 32
+EMBED_IN_FLIGHT = 4
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """content hash -> float32 vector, per embedding model."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # opened on first use: importing or constructing a DocumentQA must not create (or lock) the file
+        with self._lock:
+            if self._db is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        model TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        PRIMARY KEY (model, key)
+                    )
+                """)
+                conn.commit()
+                self._db = conn
+            return self._db
+
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    (model, *batch)
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, key, vector) VALUES (?, ?, ?)",
+                [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeds documents in batches, several batches in flight, each distinct text at most once.
+
+    Texts are deduplicated by content hash and looked up in the store first, so
+    overlapping or repeated chunks and re-index runs only embed what is new.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, store: Optional[EmbeddingStore] = None,
+                 batch_size: int = EMBED_BATCH_SIZE, max_in_flight: int = EMBED_IN_FLIGHT):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.texts = 0
+        self.cached = 0
+        self.embedded = 0
+        self.seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _lookup(self, texts: List[str]):
+        keys = [text_hash(text) for text in texts]
+        vectors = self.store.get_many(self.model, list(set(keys))) if self.store is not None else {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        return keys, vectors, missing
+
+    def _count(self, texts: int, missing: int, elapsed: float):
+        with self._stats_lock:
+            self.texts += texts
+            self.cached += texts - missing
+            self.embedded += missing
+            self.seconds += elapsed
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """One batch, one request per `batch_size` misses, no progress output: for callers that run their own pipeline."""
+        started = time.perf_counter()
+        keys, vectors, missing = self._lookup(texts)
+        missing_keys = list(missing)
+        for i in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[i:i + self.batch_size]
+            embedded = dict(zip(batch, self.embeddings.embed_documents([missing[key] for key in batch])))
+            vectors.update(embedded)
+            if self.store is not None:
+                self.store.put_many(self.model, embedded)
+        self._count(len(texts), len(missing), time.perf_counter() - started)
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        keys, vectors, missing = self._lookup(texts)
+
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+            done = 0
+            report_every = max(1, len(batches) // 10)
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+                results = pool.map(lambda batch: self.embeddings.embed_documents([missing[key] for key in batch]), batches)
+                for i, (batch, batch_vectors) in enumerate(zip(batches, results), 1):
+                    embedded = dict(zip(batch, batch_vectors))
+                    vectors.update(embedded)
+                    if self.store is not None:
+                        self.store.put_many(self.model, embedded)
+                    done += len(batch)
+                    if i % report_every == 0 or i == len(batches):
+                        elapsed = time.perf_counter() - started
+                        print(f"EMBED: {done}/{len(missing_keys)} new chunks ({done / elapsed:.1f} chunks/s)")
+
+        elapsed = time.perf_counter() - started
+        self._count(len(texts), len(missing), elapsed)
+        print(
+            f"EMBEDDED {len(texts)} chunks in {elapsed:.2f}s ({len(texts) / elapsed if elapsed else 0:.1f} chunks/s): "
+            f"{len(missing)} embedded, {len(texts) - len(missing)} from cache or duplicates"
+        )
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        return {
+            'texts': self.texts,
+            'cached': self.cached,
+            'embedded': self.embedded,
+            'chunks_per_s': round(self.texts / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+
+def default_embedding_store() -> Optional[EmbeddingStore]:
+    if os.environ.get('EMBEDDING_CACHE', '1') == '0':
+        return None
+    return EmbeddingStore(os.environ.get('EMBEDDING_CACHE_PATH', EMBEDDING_CACHE_PATH))
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+INTENT_FAISS_DIR = './intent_faiss_store'
+EMBED_MODEL = 'embeddinggemma:300m'
+NEIGHBOURS = 5
+# escalate to the LLM when the two best categories are closer than this (share of the vote)
+MIN_MARGIN = 0.2
+
+EXEMPLARS: Dict[str, List[str]] = {
+    'greeting': [
+        "Hello!",
+        "Hi there, how are you?",
+        "Hey! How's it going?",
+        "Good morning",
+        "Goodbye, see you later",
+        "Thanks, have a nice day",
+    ],
+    'question': [
+        "What is LangGraph?",
+        "How does a neural network learn?",
+        "Why is the sky blue?",
+        "What is the difference between LangChain and LangGraph?",
+        "How do conditional edges work?",
+        "Can you explain how vector databases store embeddings?",
+    ],
+    'command': [
+        "Create a summary of the latest AI research papers",
+        "Write a Python function that sorts a list",
+        "Translate this paragraph into French",
+        "Generate a report of last week's sales",
+        "Send an email to the team about the meeting",
+        "Schedule a reminder for tomorrow at 9am",
+    ],
+    'feedback': [
+        "This tool is amazing! The responses are really helpful.",
+        "The answer was wrong and not useful",
+        "I love the new interface",
+        "It is too slow, please make it faster",
+        "Great job, very clear explanation",
+        "I'm disappointed with the results",
+    ],
+    'fallback': [
+        "hmm...I see",
+        "asdfgh",
+        "ok",
+        "whatever",
+        "...",
+        "blue seven banana",
+    ],
+}
+
+
+class EmbeddingIntentClassifier:
+    """kNN over a FAISS index of labelled exemplars: one embedding call per input.
+
+    The index is built lazily on first use and saved next to the exemplars' hash,
+    so changing the exemplars rebuilds it.
+    """
+
+    def __init__(self, exemplars: Dict[str, List[str]] = EXEMPLARS, folder_path: str = INTENT_FAISS_DIR,
+                 model: str = EMBED_MODEL, neighbours: int = NEIGHBOURS):
+        self.exemplars = exemplars
+        self.folder_path = folder_path
+        self.model = model
+        self.neighbours = neighbours
+        self._embeddings = None
+        self._vector_store = None
+        self._lock = threading.Lock()
+
+    @property
+    def exemplars_hash(self) -> str:
+        payload = json.dumps({'model': self.model, 'exemplars': self.exemplars}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def load(self):
+        if self._vector_store is not None:
+            return self._vector_store
+        # concurrent first calls (batch mode) must not build the index twice
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = self._load()
+        return self._vector_store
+
+    def _load(self):
+        from langchain_ollama.embeddings import OllamaEmbeddings
+        from langchain_community.vectorstores import FAISS
+
+        self._embeddings = OllamaEmbeddings(model=self.model)
+        hash_file = os.path.join(self.folder_path, 'exemplars.sha256')
+        saved_hash = ''
+        if os.path.exists(hash_file):
+            with open(hash_file) as f:
+                saved_hash = f.read().strip()
+        if saved_hash == self.exemplars_hash:
+            return FAISS.load_local(
+                folder_path=self.folder_path,
+                embeddings=self._embeddings,
+                allow_dangerous_deserialization=True,
+                # not saved with the index: without it queries are no longer unit vectors
+                normalize_L2=True,
+            )
+
+        texts = [text for texts in self.exemplars.values() for text in texts]
+        metadatas = [{'category': category} for category, texts in self.exemplars.items() for _ in texts]
+        vector_store = FAISS.from_texts(texts, self._embeddings, metadatas=metadatas, normalize_L2=True)
+        vector_store.save_local(self.folder_path)
+        with open(hash_file, 'w') as f:
+            f.write(self.exemplars_hash)
+        return vector_store
+
+    def scores(self, text: str) -> Tuple[Dict[str, float], List[tuple]]:
+        vector_store = self.load()
+        vector = self._embeddings.embed_query(text)
+        neighbours = vector_store.similarity_search_with_score_by_vector(vector, k=self.neighbours)
+        votes = {}
+        for doc, distance in neighbours:
+            # unit vectors: squared L2 distance -> cosine similarity
+            similarity = max(0.0, 1.0 - float(distance) / 2.0)
+            category = doc.metadata['category']
+            votes[category] = votes.get(category, 0.0) + similarity
+        return votes, neighbours
+
+    def classify(self, text: str) -> Tuple[Optional[str], float, float, str]:
+        """Returns (category, confidence, margin, reasoning); category is None when nothing is close."""
+        votes, neighbours = self.scores(text)
+        total = sum(votes.values())
+        if not total:
+            return None, 0.0, 0.0, 'no similar exemplars'
+        ranked = sorted(votes.items(), key=lambda item: item[1], reverse=True)
+        category, best = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = best / total
+        margin = (best - second) / total
+        nearest = ', '.join(f'"{doc.page_content}" ({doc.metadata["category"]})' for doc, _ in neighbours[:3])
+        return category, confidence, margin, f"nearest exemplars: {nearest}"
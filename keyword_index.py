@@ -0,0 +1,118 @@
+import heapq
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# reciprocal-rank fusion constant: dampens the head of each ranking (60 is the usual choice)
+RRF_K = 60
+STOP_WORDS = frozenset(
+    'a an and are as at be by can do does for from has have how i if in is it its of on or '
+    'that the their this to was were what when where which who why will with you your'.split()
+)
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = RRF_K) -> List[str]:
+    """Ids ordered by sum(1 / (k + rank)) over the rankings they appear in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, keyed by the ids the vector store uses.
+
+    Postings map term -> {id: term frequency}. Each document keeps its distinct
+    terms, so removing it only touches its own postings.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.terms: Dict[str, Tuple[str, ...]] = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.lengths:
+            return
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.terms[doc_id] = tuple(counts)
+        self.lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: str):
+        terms = self.terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def sync(self, ids: Iterable[str], text_of: Callable[[str], str]) -> Tuple[int, int]:
+        """Adds the ids it lacks (text from `text_of`) and drops the ones not in `ids`; returns (added, removed)."""
+        ids = set(ids)
+        removed = [doc_id for doc_id in self.lengths if doc_id not in ids]
+        for doc_id in removed:
+            self.remove(doc_id)
+        added = [doc_id for doc_id in ids if doc_id not in self.lengths]
+        for doc_id in added:
+            self.add(doc_id, text_of(doc_id))
+        return len(added), len(removed)
+
+    def search(self, query: str, k: int, weights: Dict[str, float] = None) -> List[Tuple[str, float]]:
+        """The `k` best (id, score) pairs; only documents sharing a term with the query are scored.
+
+        `weights` multiplies the score of single query terms (1 for the terms it leaves out):
+        repeating a word in the query does not.
+        """
+        n = len(self.lengths)
+        if not n:
+            return []
+        weights = weights or {}
+        average_length = self.total_length / n or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = weights.get(term, 1.0) * math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = frequency + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def save(self, path: str):
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump((self.postings, self.lengths, self.terms, self.total_length), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path: str, k1: float = BM25_K1, b: float = BM25_B) -> 'BM25Index':
+        """The index saved at `path`, or an empty one."""
+        index = cls(k1, b)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                index.postings, index.lengths, index.terms, index.total_length = pickle.load(f)
+        return index
@@ -2,6 +2,7 @@ from typing import TypedDict, Annotated
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import START, END, StateGraph
 from operator import add
+from tracing import traced
 
 class AgentSate(TypedDict):
     messages: Annotated[list, add]
@@ -106,7 +107,8 @@ def run_workflow(usr_inp):
         'result': ''
     }
 
-    final_state = app.invoke(init_state)
+    with traced('linear_workflow'):
+        final_state = app.invoke(init_state)
     display("FINAL STATE:", final_state)
     return final_state
 
@@ -124,8 +126,12 @@ def run_workflow(usr_inp):
 # run_workflow("Tell me about LangGraph")
 
 
-from IPython.display import Image, display
-linear_workflow_diagram = Image(
-        app.get_graph()
-        .draw_mermaid_png()
-    )
\ No newline at end of file
+def __getattr__(name):
+    # rendered on first access (locally, cached by graph structure; see diagram.py)
+    if name == 'linear_workflow_diagram':
+        from IPython.display import Image
+        from diagram import diagram_png
+        diagram = Image(diagram_png(app))
+        globals()[name] = diagram
+        return diagram
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
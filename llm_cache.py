@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+from langchain_ollama import ChatOllama
+
+LLM_CACHE_PATH = './.llm_cache.sqlite'
+LLM_CACHE_MEMORY_ENTRIES = 256
+LLM_CACHE_DISK_BYTES = 256 * 1024 * 1024
+
+# ChatOllama fields that change what the model generates
+OPTION_FIELDS = {
+    'model', 'reasoning', 'mirostat', 'mirostat_eta', 'mirostat_tau',
+    'num_ctx', 'num_predict', 'repeat_last_n', 'repeat_penalty',
+    'temperature', 'seed', 'stop', 'tfs_z', 'top_k', 'top_p', 'format',
+}
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode('utf-8')).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class LRUMemoryCache(BaseCache):
+    """In-process LRU tier, bounded by number of entries."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, Sequence[Generation]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            if key not in self._entries:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return self._entries[key]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            self._entries[key] = return_val
+            self._entries.move_to_end(key)
+            self.stats.writes += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteDiskCache(BaseCache):
+    """On-disk tier, evicts least recently used rows once the payload exceeds `max_bytes`."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_DISK_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.RLock()
+        self._db = None
+        self._total_bytes = 0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # opened on first use: importing a graph module must not create (or lock) the file
+        with self._lock:
+            if self._db is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+                conn.commit()
+                self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+                self._db = conn
+            return self._db
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats.hits += 1
+        return loads(row[0], allowed_objects='core')
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = cache_key(prompt, llm_string)
+        value = dumps(list(return_val))
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self.stats.writes += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.stats.evictions += 1
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._total_bytes = 0
+
+
+class TieredLLMCache(BaseCache):
+    """Memory LRU in front of the SQLite tier; disk hits are promoted to memory."""
+
+    def __init__(self, memory: Optional[LRUMemoryCache] = None, disk: Optional[SQLiteDiskCache] = None):
+        self.memory = memory or LRUMemoryCache()
+        self.disk = disk
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        value = self.memory.lookup(prompt, llm_string)
+        if value is not None or self.disk is None:
+            return value
+        value = self.disk.lookup(prompt, llm_string)
+        if value is not None:
+            self.memory.update(prompt, llm_string, value)
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.memory.update(prompt, llm_string, return_val)
+        if self.disk is not None:
+            self.disk.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        stats = {'memory': self.memory.stats.as_dict()}
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats.as_dict()
+        return stats
+
+
+class CachedChatOllama(ChatOllama):
+    """ChatOllama whose cache key also covers the model name and generation options.
+
+    The stock key only carries the bound call kwargs (e.g. the structured output
+    `format` schema), so two different models would share entries.
+    """
+
+    def _get_llm_string(self, stop: Optional[list] = None, **kwargs) -> str:
+        options = self.model_dump(include=OPTION_FIELDS, exclude_none=True)
+        options_string = json.dumps(options, sort_keys=True, default=str)
+        return f"{options_string}---{super()._get_llm_string(stop=stop, **kwargs)}"
+
+
+def default_llm_cache() -> TieredLLMCache:
+    if os.environ.get('LLM_CACHE', '1') == '0':
+        return TieredLLMCache()
+    return TieredLLMCache(disk=SQLiteDiskCache(os.environ.get('LLM_CACHE_PATH', LLM_CACHE_PATH)))
+
+
+def with_cache(llm: ChatOllama, cache: BaseCache) -> CachedChatOllama:
+    fields = llm.model_dump(exclude={'cache'}, exclude_unset=True)
+    return CachedChatOllama(**fields, cache=cache)
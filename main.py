@@ -1,35 +1,49 @@
+import startup
 import tkinter as tk
 from PIL import ImageTk, Image
 import io
-from linear_workflow import linear_workflow_diagram
-# from conditional_workflow import conditional_workflow_diagram
-from note_taker import diagram
-
-root = tk.Tk()
-root.title("Lang Graph")
-
-# Create a frame to hold the images in a column layout
-frame = tk.Frame(root)
-frame.pack(pady=10)
-
-# Convert IPython display Image to PIL Image
-# The diagram is a PNG image in bytes format
-image_bytes1 = linear_workflow_diagram.data
-pil_image1 = Image.open(io.BytesIO(image_bytes1))
-
-# Convert PIL Image to Tkinter PhotoImage
-tk_img1 = ImageTk.PhotoImage(pil_image1)
-label1 = tk.Label(frame, image=tk_img1)
-label1.grid(row=0, column=0, padx=10, pady=5)
-
-# Convert IPython display Image to PIL Image
-# The diagram is a PNG image in bytes format
-image_bytes2 = diagram.data
-pil_image2 = Image.open(io.BytesIO(image_bytes2))
-
-# Convert PIL Image to Tkinter PhotoImage
-tk_img2 = ImageTk.PhotoImage(pil_image2)
-label2 = tk.Label(frame, image=tk_img2)
-label2.grid(row=0, column=1, padx=10, pady=5)
-
-root.mainloop()
+
+
+def load_diagrams():
+    # both graphs are built here, off the Tk thread; the pictures come from the diagram cache
+    from linear_workflow import app as linear_app
+    # from conditional_workflow import app as conditional_app
+    from note_taker import app as note_taker_app
+    from diagram import diagram_png
+    return [diagram_png(linear_app), diagram_png(note_taker_app)]
+
+
+def main():
+    root = tk.Tk()
+    root.title("Lang Graph")
+
+    # Create a frame to hold the images in a column layout
+    frame = tk.Frame(root)
+    frame.pack(pady=10)
+
+    labels = []
+    for column in range(2):
+        label = tk.Label(frame, text="Loading graph...")
+        label.grid(row=0, column=column, padx=10, pady=5)
+        labels.append(label)
+
+    def show(diagrams):
+        for label, image_bytes in zip(labels, diagrams):
+            # The diagram is a PNG image in bytes format
+            pil_image = Image.open(io.BytesIO(image_bytes))
+            # Convert PIL Image to Tkinter PhotoImage (kept on the label, or Tk drops it)
+            label.image = ImageTk.PhotoImage(pil_image)
+            label.configure(image=label.image, text='')
+        startup.mark('diagrams shown')
+
+    def show_error(error):
+        for label in labels:
+            label.configure(text=f"Could not load the graph:\n{type(error).__name__}: {error}")
+
+    startup.run_in_background(root, load_diagrams, show, show_error)
+    root.after_idle(startup.mark, 'window ready')
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
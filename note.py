@@ -1,12 +1,18 @@
+import startup
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from datetime import datetime
-from note_taker import app, run_note_taker
-from IPython.display import Image as IP_Image
 from PIL import ImageTk, Image as PIL_Image
 import io
 
 
+def load_workflow_diagram() -> bytes:
+    # the graph module (langgraph, model client, tools) loads here, off the Tk thread
+    from note_taker import app
+    from diagram import diagram_png
+    return diagram_png(app)
+
+
 class NoteTakerAgentGUI:
     def __init__(self):
         root = tk.Tk()
@@ -50,15 +56,23 @@ class NoteTakerAgentGUI:
         )
         discard_button.pack(side="left")
 
+        # the window is usable right away; the workflow diagram appears once the graph has loaded
+        self.img_label = tk.Label(container)
+        self.img_label.pack(anchor='center')
+        startup.run_in_background(root, load_workflow_diagram, self.show_diagram, self.show_load_error)
+        root.after_idle(startup.mark, 'window ready')
 
-        note_taker_workflow_diagram = IP_Image(app.get_graph().draw_mermaid_png())
-        image_bytes = note_taker_workflow_diagram.data
+        root.mainloop()
+
+    def show_diagram(self, image_bytes):
         pil_image = PIL_Image.open(io.BytesIO(image_bytes))
-        tk_image = ImageTk.PhotoImage(pil_image)
-        img_label = tk.Label(container, image=tk_image)
-        img_label.pack(anchor='center')
+        # kept on self: Tk drops images nothing in Python refers to
+        self.tk_image = ImageTk.PhotoImage(pil_image)
+        self.img_label.configure(image=self.tk_image)
+        startup.mark('diagram shown')
 
-        root.mainloop()
+    def show_load_error(self, error):
+        self.img_label.configure(text=f"Could not load the workflow:\n{type(error).__name__}: {error}")
 
     def generate_content(self):
         topic = self.topic_entry.get().strip()
@@ -67,6 +81,7 @@ class NoteTakerAgentGUI:
             return
 
         messagebox.showinfo("Acknowledgement", f"Generating Content: \n\n{topic}")
+        from note_taker import run_note_taker
         content = run_note_taker(topic)
         self.content = content['final_note']
         messagebox.showinfo("Congratulation", f"Generate: \n\n{self.content[:250]}...")
@@ -98,4 +113,5 @@ class NoteTakerAgentGUI:
         self.topic_entry.delete(0, tk.END)
         self.content = ''
 
-NoteTakerAgentGUI()
\ No newline at end of file
+if __name__ == '__main__':
+    NoteTakerAgentGUI()
\ No newline at end of file
@@ -1,23 +1,38 @@
-from typing import TypedDict, Annotated, List, Literal, Dict
+from typing import TypedDict, Annotated, List, Literal
 from operator import add
 from langchain_ollama import ChatOllama
 from pydantic import BaseModel, Field
-from langchain_core.prompts import PromptTemplate
 from langchain_community.tools import WikipediaQueryRun, DuckDuckGoSearchRun
 from langchain_community.utilities import WikipediaAPIWrapper
 from approval_gui import ApprovalGUI
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+from llm_cache import default_llm_cache, with_cache
+from search_cache import CachedSearchTool, default_search_store
+from routing import default_router
+from tracing import traced
+from startup import Lazy
+from synthesis import default_synthesizer, section_parts
+from compression import compress
 
-llm = ChatOllama(model='smollm2:135m')
+llm_cache = default_llm_cache()
+# model client and search tools are built on first use: importing the graph (to draw it, say) needs neither
+llm = Lazy(lambda: with_cache(ChatOllama(model='smollm2:135m'), llm_cache))
 # llm = ChatOllama(model='gemma3:4b') #(model='smollm2:135m')
-wkp_search = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
-ddg_search = DuckDuckGoSearchRun()
+search_store = default_search_store()
+wkp_search = CachedSearchTool(Lazy(lambda: WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())), 'wikipedia', search_store)
+ddg_search = CachedSearchTool(Lazy(DuckDuckGoSearchRun), 'duck_duck_go', search_store)
+router = default_router(llm)
 
 class SectionState(TypedDict):
     title: str
     raw_content: str
     draft_content: str
     final_content: str
+    route: str
+    route_source: str
+    # compressed / raw search content tokens (1.0 when nothing was dropped)
+    compression_ratio: float
 
 class NoteState(TypedDict):
     topic: str
@@ -48,7 +63,10 @@ def planning_node(state: NoteState) -> NoteState:
                 'title': section,
                 'raw_content': '',
                 'draft_content': '',
-                'final_content': ''
+                'final_content': '',
+                'route': '',
+                'route_source': '',
+                'compression_ratio': 1.0
             })
         )
     print('pass')
@@ -65,43 +83,25 @@ def is_final_loop(state: NoteState) -> Literal['final_loop', 'not_final_loop']:
     else:
         return 'final_loop'
 
-class IsSearchNeedDecisionResponse(BaseModel):
-    is_search_need: bool = Field(description='is searching is necessary')
-
-def is_search_need(state: NoteState) -> Literal['need_search', 'not_need_search']:
-    print("IS SEARCH NEED NODE:", end='')
+def route_section_node(state: NoteState) -> NoteState:
+    print("ROUTE SECTION NODE:", end='')
     topic = state['topic']
     section = state['sections'][state['current_section_index']]
-    structured_llm = llm.with_structured_output(IsSearchNeedDecisionResponse)
-    decision: IsSearchNeedDecisionResponse = structured_llm.invoke(f"""
-        You are expert content generator.
-        for the following topic and section is need further search?
-        TOPIC: "{topic}"
-        SECTION: "{section}"
-    """.strip())
-
+    # one decision for both branches; the LLM is only asked when the local router is unsure
+    decision = router.route(topic, section)
+    state['sections_content'][state['current_section_index']]['route'] = decision.route
+    state['sections_content'][state['current_section_index']]['route_source'] = decision.source
     print('pass')
-    if decision.is_search_need:
-        return 'need_search'
-    else:
-        return 'not_need_search'
+    return state
 
-class SearchTypeDecisionResponse(BaseModel):
-    search_type: Literal['duck_duck_go', 'wikipedia', 'both'] = Field(description='Best search result')
+def is_search_need(state: NoteState) -> Literal['need_search', 'not_need_search']:
+    route = state['sections_content'][state['current_section_index']]['route']
+    if route == 'not_need_search':
+        return 'not_need_search'
+    return 'need_search'
 
 def decide_search_type(state: NoteState) -> Literal['duck_duck_go', 'wikipedia', 'both']:
-    print("DECIDE SEARCH TYPE NODE:", end='')
-    topic = state['topic']
-    section = state['sections'][state['current_section_index']]
-    structured_llm = llm.with_structured_output(SearchTypeDecisionResponse)
-    decision: SearchTypeDecisionResponse = structured_llm.invoke(f"""
-        You are expert content generator.
-        which search tool is best for the following topic and section?
-        TOPIC: "{topic}"
-        SECTION: "{section}"
-    """.strip())
-    print('pass')
-    return decision.search_type.lower()
+    return state['sections_content'][state['current_section_index']]['route']
 
 def duck_duck_go_search_node(state: NoteState) -> NoteState:
     print("DUCK DUCK GO SEARCH NODE:", end='')
@@ -160,6 +160,15 @@ def both_search_node(state: NoteState) -> NoteState:
     print('pass')
     return state
 
+def compress_content_node(state: NoteState) -> NoteState:
+    print("COMPRESS CONTENT NODE:", end='')
+    section = state['sections'][state['current_section_index']]
+    section_content = state['sections_content'][state['current_section_index']]
+    # only the passages most relevant to the section, within a token budget, reach the draft prompt
+    section_content['raw_content'], section_content['compression_ratio'] = compress(section_content['raw_content'], state['topic'], section)
+    print('pass')
+    return state
+
 def background_idea_generator_node(state: NoteState) -> NoteState:
     print("BACKGROUND IDEA NODE:", end='')
     topic = state['topic']
@@ -209,22 +218,9 @@ def section_human_approval_node(state: NoteState) -> NoteState:
 def final_content_generator_node(state: NoteState) -> NoteState:
     print("FINAL CONTENT GENERATOR NODE:", end='')
     topic = state['topic']
-    current_content = ''
-    
-    for i, section in enumerate(state['sections_content'], start=1):
-        current_content += f"""
-            ## Section {i}: {section['title']}
-            {section['final_content']} \n\n
-        """
-
-    response = llm.invoke(f"""
-        You are expert content generator.
-        for the following topic and its content, 
-        tell me organized and improved idea in proper markdown format
-        TOPIC: "{topic}"
-        CONTENT: "{current_content}"
-    """.strip())
-    state['draft_note'] = response.content
+    parts = section_parts([(section['title'], section['final_content']) for section in state['sections_content']])
+    # sections are merged in groups that fit the model's context, then the merges, down to one call
+    state['draft_note'] = default_synthesizer(llm).run(topic, parts)
     print('pass')
     return state
 
@@ -253,6 +249,7 @@ DDG_SEARCH = 'ddg_search'
 WKP_SEARCH = 'wkp_search'
 BOTH_SEARCH = 'both_search'
 BACKGROUND_IDEA = 'background_idea'
+COMPRESS_CONTENT = 'compress_content'
 DRAFT_CONTENT = 'draft_content'
 SECTION_HUMAN_APPROVAL = 'section_human_approval'
 FINAL_CONTENT = 'final_content'
@@ -260,12 +257,13 @@ FINAL_HUMAN_APPROVAL = 'final_human_approval'
 
 workflow.add_node(PLAN, planning_node)
 workflow.add_node(IS_FINAL, default_node)
-workflow.add_node(IS_SEARCH_NEED, default_node)
+workflow.add_node(IS_SEARCH_NEED, route_section_node)
 workflow.add_node(DECIDE_SEARCH_TYPE, default_node)
 workflow.add_node(DDG_SEARCH, duck_duck_go_search_node)
 workflow.add_node(WKP_SEARCH, wikipedia_search_node)
 workflow.add_node(BOTH_SEARCH, both_search_node)
 workflow.add_node(BACKGROUND_IDEA, background_idea_generator_node)
+workflow.add_node(COMPRESS_CONTENT, compress_content_node)
 workflow.add_node(DRAFT_CONTENT, draft_content_generator_node)
 workflow.add_node(SECTION_HUMAN_APPROVAL, section_human_approval_node)
 workflow.add_node(FINAL_CONTENT, final_content_generator_node)
@@ -299,9 +297,10 @@ workflow.add_conditional_edges(
     }
 )
 workflow.add_edge(BACKGROUND_IDEA, DRAFT_CONTENT)
-workflow.add_edge(DDG_SEARCH, DRAFT_CONTENT)
-workflow.add_edge(WKP_SEARCH, DRAFT_CONTENT)
-workflow.add_edge(BOTH_SEARCH, DRAFT_CONTENT)
+workflow.add_edge(DDG_SEARCH, COMPRESS_CONTENT)
+workflow.add_edge(WKP_SEARCH, COMPRESS_CONTENT)
+workflow.add_edge(BOTH_SEARCH, COMPRESS_CONTENT)
+workflow.add_edge(COMPRESS_CONTENT, DRAFT_CONTENT)
 workflow.add_edge(DRAFT_CONTENT, SECTION_HUMAN_APPROVAL)
 workflow.add_edge(SECTION_HUMAN_APPROVAL, IS_FINAL)
 workflow.add_edge(FINAL_CONTENT, FINAL_HUMAN_APPROVAL)
@@ -309,7 +308,94 @@ workflow.add_edge(FINAL_HUMAN_APPROVAL, END)
 
 app = workflow.compile()
 
-def run_note_taker(topic:str):
+
+# Parallel mode: every planned section runs search + drafting as its own branch,
+# approvals are collected one by one after the join (Tk windows stay on one thread).
+MAX_PARALLEL_SECTIONS = 4
+SECTION_WORKER = 'section_worker'
+SECTION_APPROVALS = 'section_approvals'
+
+class ParallelNoteState(NoteState):
+    drafted_sections: Annotated[List[tuple], add]
+
+class SectionTask(TypedDict):
+    topic: str
+    sections: List[str]
+    index: int
+
+def fan_out_sections(state: ParallelNoteState) -> List[Send]:
+    return [
+        Send(SECTION_WORKER, SectionTask({
+            'topic': state['topic'],
+            'sections': state['sections'],
+            'index': i
+        }))
+        for i in range(len(state['sections']))
+    ]
+
+def section_worker_node(task: SectionTask) -> ParallelNoteState:
+    index = task['index']
+    # the per-section nodes address their section through current_section_index
+    state = NoteState({
+        'topic': task['topic'],
+        'sections': task['sections'],
+        'sections_content': [
+            SectionState({
+                'title': title,
+                'raw_content': '',
+                'draft_content': '',
+                'final_content': '',
+                'route': '',
+                'route_source': '',
+                'compression_ratio': 1.0
+            })
+            for title in task['sections']
+        ],
+        'current_section_index': index,
+        'draft_note': '',
+        'final_note': ''
+    })
+
+    state = route_section_node(state)
+    if is_search_need(state) == 'need_search':
+        search_nodes = {
+            'duck_duck_go': duck_duck_go_search_node,
+            'wikipedia': wikipedia_search_node,
+            'both': both_search_node
+        }
+        state = search_nodes[decide_search_type(state)](state)
+        state = compress_content_node(state)
+    else:
+        state = background_idea_generator_node(state)
+    state = draft_content_generator_node(state)
+    return {'drafted_sections': [(index, state['sections_content'][index])]}
+
+def section_approvals_node(state: ParallelNoteState) -> ParallelNoteState:
+    for index, section in sorted(state['drafted_sections'], key=lambda item: item[0]):
+        state['sections_content'][index] = section
+    state['current_section_index'] = 0
+    for _ in state['sections_content']:
+        state = section_human_approval_node(state)
+    # only what changed: returning drafted_sections would append it to itself again
+    return {'sections_content': state['sections_content'], 'current_section_index': state['current_section_index']}
+
+parallel_workflow = StateGraph(ParallelNoteState)
+parallel_workflow.add_node(PLAN, planning_node)
+parallel_workflow.add_node(SECTION_WORKER, section_worker_node)
+parallel_workflow.add_node(SECTION_APPROVALS, section_approvals_node)
+parallel_workflow.add_node(FINAL_CONTENT, final_content_generator_node)
+parallel_workflow.add_node(FINAL_HUMAN_APPROVAL, final_human_approval_node)
+
+parallel_workflow.add_edge(START, PLAN)
+parallel_workflow.add_conditional_edges(PLAN, fan_out_sections, [SECTION_WORKER])
+parallel_workflow.add_edge(SECTION_WORKER, SECTION_APPROVALS)
+parallel_workflow.add_edge(SECTION_APPROVALS, FINAL_CONTENT)
+parallel_workflow.add_edge(FINAL_CONTENT, FINAL_HUMAN_APPROVAL)
+parallel_workflow.add_edge(FINAL_HUMAN_APPROVAL, END)
+
+parallel_app = parallel_workflow.compile()
+
+def run_note_taker(topic:str, parallel: bool = False, max_parallel_sections: int = MAX_PARALLEL_SECTIONS):
     print("START:pass")
     initial_state = NoteState({
         'topic': topic,
@@ -319,6 +405,13 @@ def run_note_taker(topic:str):
         'draft_note': '',
         'final_note': ''
     })
-    final_state = app.invoke(initial_state)
+    with traced(f"note_taker-{topic}"):
+        if parallel:
+            initial_state['drafted_sections'] = []
+            final_state = parallel_app.invoke(initial_state, {'max_concurrency': max_parallel_sections})
+        else:
+            final_state = app.invoke(initial_state)
+    print("LLM CACHE:", llm_cache.stats())
+    print("SEARCH CACHE:", {'duck_duck_go': ddg_search.stats(), 'wikipedia': wkp_search.stats()})
     print("END:pass")
     return final_state
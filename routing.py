@@ -0,0 +1,249 @@
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+ROUTING_MEMORY_PATH = './.routing_memory.sqlite'
+ROUTING_LOG_PATH = './routing_log.jsonl'
+# one matching title word scores 0.5 on its own: the local routers need more than that to skip the LLM
+ROUTING_CONFIDENCE_THRESHOLD = 0.6
+
+SearchType = Literal['duck_duck_go', 'wikipedia', 'both']
+
+# title words that point at a route; topic words count half. Question words and generic
+# nouns ('how', 'types', 'tools') say nothing about where the content lives and are left out
+RECENT_WORDS = {
+    'latest', 'recent', 'news', 'current', 'today', 'trend', 'trends', 'update', 'updates',
+    'price', 'prices', 'market', 'release', 'releases', 'version', 'companies',
+    '2023', '2024', '2025', '2026', 'future', 'upcoming', 'statistics', 'report',
+}
+ENCYCLOPEDIC_WORDS = {
+    'history', 'historical', 'origin', 'origins', 'definition', 'biography', 'founder', 'founders',
+    'invention', 'evolution', 'theory', 'principle', 'principles', 'law', 'laws', 'timeline',
+    'classification', 'architecture', 'background', 'etymology',
+}
+NO_SEARCH_WORDS = {
+    'introduction', 'conclusion', 'summary', 'overview', 'tips', 'ideas', 'benefits',
+    'advantages', 'disadvantages', 'pros', 'cons', 'importance', 'examples', 'practices',
+    'steps', 'guide', 'challenges', 'opinion', 'takeaways', 'faq',
+}
+
+
+def tokenize(text: str):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+class RouteDecision(BaseModel):
+    is_search_need: bool
+    search_type: SearchType = 'both'
+    confidence: float = 0.0
+    source: str = ''
+
+    @property
+    def route(self) -> str:
+        return self.search_type if self.is_search_need else 'not_need_search'
+
+
+class FusedRouteResponse(BaseModel):
+    is_search_need: bool = Field(description='is searching is necessary or not?')
+    search_type: SearchType = Field(description='Best search tool, if searching is necessary')
+
+
+class KeywordRouter:
+    def route(self, topic: str, title: str) -> Optional[RouteDecision]:
+        title_words, topic_words = tokenize(title), tokenize(topic)
+        scores = {}
+        for route, words in (('duck_duck_go', RECENT_WORDS), ('wikipedia', ENCYCLOPEDIC_WORDS), ('none', NO_SEARCH_WORDS)):
+            scores[route] = len(title_words & words) + 0.5 * len(topic_words & words)
+
+        if scores['duck_duck_go'] and scores['wikipedia'] and not scores['none']:
+            hits = scores['duck_duck_go'] + scores['wikipedia']
+            return RouteDecision(is_search_need=True, search_type='both', confidence=hits / (hits + 1), source='keyword')
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best, top), (_, second) = ranked[0], ranked[1]
+        if not top:
+            return None
+        confidence = (top - second) / (top + second + 1)
+        if best == 'none':
+            return RouteDecision(is_search_need=False, confidence=confidence, source='keyword')
+        return RouteDecision(is_search_need=True, search_type=best, confidence=confidence, source='keyword')
+
+
+def jaccard(a, b) -> float:
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+class RoutingMemory:
+    """Past LLM routing decisions, matched by word overlap (nearest neighbours).
+
+    The title drives the route, so it dominates the similarity; sibling sections
+    share their topic and would otherwise all look alike.
+    """
+
+    def __init__(self, path: str = ROUTING_MEMORY_PATH, neighbours: int = 3, max_rows: int = 2000):
+        self.path = path
+        self.neighbours = neighbours
+        self.max_rows = max_rows
+        self._lock = threading.RLock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # opened on first use: importing a graph module must not create (or lock) the file
+        with self._lock:
+            if self._db is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS routing_memory (
+                        title_words TEXT NOT NULL,
+                        topic_words TEXT NOT NULL,
+                        route TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (title_words, topic_words)
+                    )
+                """)
+                conn.commit()
+                self._db = conn
+            return self._db
+
+    def route(self, topic: str, title: str) -> Optional[RouteDecision]:
+        title_words, topic_words = tokenize(title), tokenize(topic)
+        if not title_words:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title_words, topic_words, route FROM routing_memory ORDER BY created_at DESC LIMIT ?",
+                (self.max_rows,)
+            ).fetchall()
+        scored = []
+        for stored_title, stored_topic, route in rows:
+            similarity = (
+                0.8 * jaccard(title_words, set(stored_title.split()))
+                + 0.2 * jaccard(topic_words, set(stored_topic.split()))
+            )
+            scored.append((similarity, route))
+        nearest = sorted(scored, reverse=True)[:self.neighbours]
+        if not nearest or not nearest[0][0]:
+            return None
+
+        votes = {}
+        for similarity, route in nearest:
+            votes[route] = votes.get(route, 0.0) + similarity
+        route, weight = max(votes.items(), key=lambda item: item[1])
+        # agreement among the neighbours, scaled by how close the nearest one is
+        confidence = weight / sum(votes.values()) * nearest[0][0]
+        if route == 'not_need_search':
+            return RouteDecision(is_search_need=False, confidence=confidence, source='memory')
+        return RouteDecision(is_search_need=True, search_type=route, confidence=confidence, source='memory')
+
+    def remember(self, topic: str, title: str, decision: RouteDecision):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routing_memory (title_words, topic_words, route, created_at) VALUES (?, ?, ?, ?)",
+                (' '.join(sorted(tokenize(title))), ' '.join(sorted(tokenize(topic))), decision.route, time.time())
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM routing_memory")
+            self._conn.commit()
+
+
+class SectionRouter:
+    """Decides search need and search tool in one step.
+
+    Local deciders (keyword rules, memory of past decisions) answer first; only
+    when none is confident enough does one fused structured LLM call decide both.
+    Every decision and its source is appended to the routing log.
+    """
+
+    def __init__(self, llm, memory: Optional[RoutingMemory] = None, threshold: float = ROUTING_CONFIDENCE_THRESHOLD,
+                 log_path: Optional[str] = ROUTING_LOG_PATH, local: bool = True):
+        self.llm = llm
+        self.deciders = [KeywordRouter()] + ([memory] if memory is not None else [])
+        self.memory = memory
+        self.threshold = threshold
+        self.log_path = log_path
+        self.local = local
+        self._log_lock = threading.Lock()
+
+    def local_route(self, topic: str, title: str) -> Optional[RouteDecision]:
+        if not self.local:
+            return None
+        candidates = [decider.route(topic, title) for decider in self.deciders]
+        candidates = [decision for decision in candidates if decision is not None]
+        if not candidates:
+            return None
+        best = max(candidates, key=lambda decision: decision.confidence)
+        return best if best.confidence >= self.threshold else None
+
+    def prompt(self, topic: str, title: str) -> str:
+        return f"""
+            You are expert content generator.
+            for the following general topic and its specific title, decide
+            1. is further search necessary?
+            2. which search tool is best: duck_duck_go (recent web content), wikipedia (encyclopedic background) or both
+            TOPIC: "{topic}"
+            TITLE: "{title}"
+        """.strip()
+
+    def _from_llm(self, topic: str, title: str, response: FusedRouteResponse) -> RouteDecision:
+        decision = RouteDecision(
+            is_search_need=response.is_search_need,
+            search_type=response.search_type,
+            confidence=1.0,
+            source='llm'
+        )
+        if self.memory is not None:
+            self.memory.remember(topic, title, decision)
+        return decision
+
+    def route(self, topic: str, title: str) -> RouteDecision:
+        started = time.perf_counter()
+        decision = self.local_route(topic, title)
+        if decision is None:
+            structured_llm = self.llm.with_structured_output(FusedRouteResponse)
+            decision = self._from_llm(topic, title, structured_llm.invoke(self.prompt(topic, title)))
+        self.log(topic, title, decision, time.perf_counter() - started)
+        return decision
+
+    async def aroute(self, topic: str, title: str, llm_slot=None) -> RouteDecision:
+        """`llm_slot` is an optional async context manager held around the LLM fallback."""
+        started = time.perf_counter()
+        decision = self.local_route(topic, title)
+        if decision is None:
+            structured_llm = self.llm.with_structured_output(FusedRouteResponse)
+            async with llm_slot or contextlib.nullcontext():
+                response = await structured_llm.ainvoke(self.prompt(topic, title))
+            decision = self._from_llm(topic, title, response)
+        self.log(topic, title, decision, time.perf_counter() - started)
+        return decision
+
+    def log(self, topic: str, title: str, decision: RouteDecision, elapsed: float):
+        print(f"ROUTE [{decision.source} {decision.confidence:.2f}]: {title} -> {decision.route}")
+        if not self.log_path:
+            return
+        record = {
+            'time': time.time(),
+            'topic': topic,
+            'title': title,
+            'route': decision.route,
+            'source': decision.source,
+            'confidence': round(decision.confidence, 3),
+            'elapsed': round(elapsed, 4),
+        }
+        with self._log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+def default_router(llm) -> SectionRouter:
+    # ROUTER=llm turns the local fast path off, e.g. to compare against it
+    local = os.environ.get('ROUTER', 'fast') != 'llm'
+    return SectionRouter(llm, memory=RoutingMemory(os.environ.get('ROUTING_MEMORY_PATH', ROUTING_MEMORY_PATH)), local=local)
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
+
+# priority and timing record of the section task currently running
+_priority: ContextVar[int] = ContextVar('scheduler_priority', default=0)
+_record: ContextVar[Optional[dict]] = ContextVar('scheduler_record', default=None)
+
+
+class PriorityLimiter:
+    """Async semaphore that hands free slots to the waiter with the lowest priority value."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int = 0):
+        if self._active < self.capacity and not self._waiters:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # the slot may have been handed over just before the cancellation landed
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # hand the slot straight to the next waiter, _active stays the same
+                future.set_result(None)
+                return
+        self._active -= 1
+
+
+class SectionScheduler:
+    """Bounds how many sections run at once and how many LLM/search calls they make concurrently.
+
+    Sections are admitted in priority order (lower first) and each resource slot
+    inherits the priority of the section that asks for it.
+    """
+
+    def __init__(self, max_sections: int, resource_limits: Dict[str, int]):
+        self.sections = PriorityLimiter(max_sections)
+        self.resources = {name: PriorityLimiter(limit) for name, limit in resource_limits.items()}
+        self.records = []
+
+    async def run(self, label: str, task: Callable[[], Awaitable], priority: int = 0):
+        record = {
+            'label': label,
+            'priority': priority,
+            'queue_wait': 0.0,
+            'service_time': 0.0,
+            'resource_wait': {name: 0.0 for name in self.resources},
+        }
+        self.records.append(record)
+        submitted = time.perf_counter()
+        await self.sections.acquire(priority)
+        started = time.perf_counter()
+        record['queue_wait'] = started - submitted
+        priority_token = _priority.set(priority)
+        record_token = _record.set(record)
+        try:
+            return await task()
+        finally:
+            record['service_time'] = time.perf_counter() - started
+            _priority.reset(priority_token)
+            _record.reset(record_token)
+            self.sections.release()
+
+    @asynccontextmanager
+    async def limit(self, resource: str):
+        limiter = self.resources.get(resource)
+        if limiter is None:
+            yield
+            return
+        requested = time.perf_counter()
+        await limiter.acquire(_priority.get())
+        record = _record.get()
+        if record is not None:
+            record['resource_wait'][resource] += time.perf_counter() - requested
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    async def limited(self, resource: str, awaitable: Awaitable):
+        try:
+            async with self.limit(resource):
+                return await awaitable
+        finally:
+            # cancelled while queued: close the never-started coroutine (no-op once it ran)
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()
+
+    def report(self):
+        for record in self.records:
+            waits = ', '.join(f"{name} wait {wait:.2f}s" for name, wait in record['resource_wait'].items())
+            print(
+                f"SECTION {record['label']!r}: queued {record['queue_wait']:.2f}s, "
+                f"service {record['service_time']:.2f}s ({waits})"
+            )
+
+    def reset(self):
+        self.records = []
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+SEARCH_CACHE_PATH = './.search_cache.sqlite'
+SEARCH_TTLS = {
+    'duck_duck_go': 6 * 60 * 60,        # web results go stale quickly
+    'wikipedia': 7 * 24 * 60 * 60,      # encyclopedia articles barely move
+}
+DEFAULT_TTL = 24 * 60 * 60
+SEARCH_CACHE_MEMORY_ENTRIES = 256
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation/markdown and extra whitespace so near-identical queries share a key.
+
+    Word order and repeats are kept: "rust vs python" is not "python vs rust".
+    """
+    return ' '.join(re.findall(r"[\w+#]+", query.lower()))
+
+
+class SearchResultStore:
+    def __init__(self, path: str = SEARCH_CACHE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # opened on first use: importing a graph module must not create (or lock) the file
+        with self._lock:
+            if self._db is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        source TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        result TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (source, key)
+                    )
+                """)
+                conn.commit()
+                self._db = conn
+                self.purge_expired()
+            return self._db
+
+    def get(self, source: str, key: str, ttl: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM search_cache WHERE source = ? AND key = ?",
+                (source, key)
+            ).fetchone()
+        if row is None or time.time() - row[1] > ttl:
+            return None
+        return row[0]
+
+    def put(self, source: str, key: str, query: str, result: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (source, key, query, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                (source, key, query, result, time.time())
+            )
+            self._conn.commit()
+
+    def purge_expired(self, ttls: Dict[str, float] = SEARCH_TTLS):
+        now = time.time()
+        with self._lock:
+            for source, ttl in ttls.items():
+                self._conn.execute(
+                    "DELETE FROM search_cache WHERE source = ? AND created_at < ?",
+                    (source, now - ttl)
+                )
+            self._conn.commit()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CachedSearchTool:
+    """Wraps a search tool with a TTL cache and single-flight coalescing.
+
+    Concurrent calls for the same normalized query (sync or async) wait on the
+    one request already in flight instead of issuing their own.
+    """
+
+    def __init__(self, tool, source: str, store: Optional[SearchResultStore] = None, ttl: Optional[float] = None,
+                 max_entries: int = SEARCH_CACHE_MEMORY_ENTRIES):
+        self.tool = tool
+        self.source = source
+        self.store = store
+        self.ttl = ttl if ttl is not None else SEARCH_TTLS.get(source, DEFAULT_TTL)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple] = OrderedDict()
+        self._sync_flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[tuple, asyncio.Future] = {}
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None and time.time() - entry[1] <= self.ttl:
+            return entry[0]
+        if self.store is not None:
+            result = self.store.get(self.source, key, self.ttl)
+            if result is not None:
+                self._remember(key, result)
+                return result
+        return None
+
+    def _remember(self, key: str, result: str):
+        # least recently used first out, as in LRUMemoryCache
+        with self._lock:
+            self._memory[key] = (result, time.time())
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _save(self, key: str, query: str, result: str):
+        self._remember(key, result)
+        if self.store is not None:
+            self.store.put(self.source, key, query, result)
+
+    def invoke(self, query: str) -> str:
+        key = normalize_query(query)
+        result = self._lookup(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        with self._lock:
+            flight = self._sync_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._sync_flights[key] = _Flight()
+
+        if not leader:
+            self.coalesced += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self.misses += 1
+        try:
+            flight.result = self.tool.invoke(query)
+            self._save(key, query, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._sync_flights[key]
+            flight.done.set()
+
+    async def ainvoke(self, query: str) -> str:
+        key = normalize_query(query)
+        result = self._lookup(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        flight_key = (id(asyncio.get_running_loop()), key)
+        future = self._async_flights.get(flight_key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._async_flights[flight_key] = future
+        try:
+            result = await self.tool.ainvoke(query)
+            self._save(key, query, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure is not reported as "never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._async_flights[flight_key]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
+
+    def clear(self):
+        """Forget the in-memory results (the disk store is left alone)."""
+        with self._lock:
+            self._memory.clear()
+
+
+def default_search_store() -> Optional[SearchResultStore]:
+    """Expired rows are purged when the store is first opened."""
+    if os.environ.get('SEARCH_CACHE', '1') == '0':
+        return None
+    return SearchResultStore(os.environ.get('SEARCH_CACHE_PATH', SEARCH_CACHE_PATH))
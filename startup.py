@@ -0,0 +1,152 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# entry points import this module first; marks are timed from here
+STARTED = time.perf_counter()
+# STARTUP_PROFILE=1 prints when each startup phase is reached
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', '0') == '1'
+REPORT_TOP = 20
+BACKGROUND_POLL_MS = 50
+
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def mark(label: str):
+    if STARTUP_PROFILE:
+        print(f"STARTUP: {label} at {(time.perf_counter() - STARTED) * 1000:.0f} ms")
+
+
+class Lazy:
+    """Stands in for an object that is costly to build (an LLM client, a search tool):
+    `factory` runs on the first attribute access, once, and every access after that
+    goes to what it returned."""
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+    @property
+    def built(self) -> bool:
+        return self._value is not None
+
+    # the calls made on model clients and tools are spelled out: looking them up must not
+    # build anything (compiling a graph walks the attributes its node functions use)
+    def invoke(self, *args, **kwargs):
+        return self._resolve().invoke(*args, **kwargs)
+
+    def ainvoke(self, *args, **kwargs):
+        return self._resolve().ainvoke(*args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        return self._resolve().stream(*args, **kwargs)
+
+    def astream(self, *args, **kwargs):
+        return self._resolve().astream(*args, **kwargs)
+
+    def with_structured_output(self, *args, **kwargs):
+        return self._resolve().with_structured_output(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # copy/pickle probe dunders on a half-built instance: never build for those
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+
+def run_in_background(root, work: Callable[[], object], done: Callable[[object], None],
+                      on_error: Callable[[Exception], None] = None, poll_ms: int = BACKGROUND_POLL_MS):
+    """Runs `work` on a thread while the Tk window stays responsive, then `done(result)` on the Tk loop.
+
+    If `work` raises, `on_error(exception)` runs on the Tk loop instead; without `on_error` the
+    exception is raised there, where Tk reports it.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = work()
+        except Exception as e:
+            print(f"STARTUP: background load failed ({type(e).__name__}: {e})")
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    # Tk is not thread safe: the loop polls instead of being called from the thread
+    def poll():
+        if thread.is_alive():
+            root.after(poll_ms, poll)
+        elif 'error' in outcome:
+            if on_error is None:
+                raise outcome['error']
+            on_error(outcome['error'])
+        else:
+            done(outcome['result'])
+    root.after(poll_ms, poll)
+
+
+def import_costs(module: str, cwd: str = None) -> List[Dict]:
+    """Per-module import cost of `import module` in a fresh interpreter (python -X importtime).
+
+    One dict per imported module, in import order: name, depth in the import
+    tree, and self / cumulative microseconds.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    costs = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            costs.append({'module': name, 'depth': len(indent) // 2, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+    return costs
+
+
+def package_costs(costs: List[Dict]) -> Dict[str, int]:
+    """Self time summed per top-level package, in microseconds, most expensive first."""
+    totals = defaultdict(int)
+    for cost in costs:
+        totals[cost['module'].split('.')[0]] += cost['self_us']
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def report(module: str, cwd: str = None, top: int = REPORT_TOP):
+    costs = import_costs(module, cwd)
+    total = next((cost['cumulative_us'] for cost in costs if cost['module'] == module), sum(cost['self_us'] for cost in costs))
+    print(f"IMPORT {module}: {total / 1000:.0f} ms, {len(costs)} modules")
+    print("\nby package (self time):")
+    for package, self_us in list(package_costs(costs).items())[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+    print("\nby module (cumulative):")
+    for cost in sorted(costs, key=lambda cost: cost['cumulative_us'], reverse=True)[:top]:
+        print(f"  {cost['cumulative_us'] / 1000:8.1f} ms  {'  ' * cost['depth']}{cost['module']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report what importing an entry point costs, per package and per module')
+    parser.add_argument('target', help='a module name or a .py path, e.g. note.py or content_crator_agent/main.py')
+    parser.add_argument('--top', type=int, default=REPORT_TOP)
+    args = parser.parse_args()
+
+    if args.target.endswith('.py'):
+        path = os.path.abspath(args.target)
+        report(os.path.splitext(os.path.basename(path))[0], os.path.dirname(path), args.top)
+    else:
+        report(args.target, top=args.top)
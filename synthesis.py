@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import os
+from typing import Callable, List, Optional, Tuple
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from token_budget import count_tokens, split_sentences, truncate_to_tokens
+
+# 'hierarchical': sections are merged in groups that fit one call, the merges merged again,
+# until one call covers everything; 'single': one call however long the note (the old way)
+SYNTHESIS_MODES = ('hierarchical', 'single')
+SYNTHESIS_MODE = 'hierarchical'
+# parts merged by one call
+SYNTHESIS_FAN_IN = 4
+# content tokens per call, per model (SYNTHESIS_TOKENS overrides): small local models have
+# short context windows, and ollama's default num_ctx is shorter still
+SYNTHESIS_TOKEN_BUDGETS = {
+    'smollm2:135m': 1536,
+    'gemma3:4b': 3072,
+}
+DEFAULT_SYNTHESIS_TOKENS = 1536
+# merge calls in flight at once in the synchronous graphs (the async ones use the scheduler's llm slots)
+SYNTHESIS_WORKERS = 4
+# langgraph leaves runs with this tag out of stream_mode='messages': merges are not the draft
+NOSTREAM_TAG = 'nostream'
+PART_SEPARATOR = '\n\n'
+
+FINAL_PROMPT = """
+You are expert content generator.
+for the following topic and its content,
+tell me organized and improved idea in proper markdown format
+TOPIC: "{topic}"
+CONTENT: "{content}"
+"""
+
+MERGE_PROMPT = """
+You are expert content generator.
+merge the following sections of a note into one organized passage in markdown format,
+keep the section headings and their key points, in at most {words} words
+TOPIC: "{topic}"
+SECTIONS: "{content}"
+"""
+
+
+def section_parts(sections: List[Tuple[str, str]]) -> List[str]:
+    """One markdown block per (title, content) section, numbered in order."""
+    return [f"## Section {i}: {title}\n{content}".strip() for i, (title, content) in enumerate(sections, start=1)]
+
+
+class Synthesizer:
+    """Writes one document from many parts with LLM calls of bounded size.
+
+    In hierarchical mode parts are grouped (at most `fan_in` parts and `tokens`
+    content tokens per group), each group is merged by one call into at most
+    tokens / fan_in tokens, and the merges are grouped again until everything
+    fits the final call. The merges of a level run concurrently.
+    """
+
+    def __init__(self, llm, fan_in: int = SYNTHESIS_FAN_IN, tokens: int = DEFAULT_SYNTHESIS_TOKENS,
+                 mode: str = SYNTHESIS_MODE, workers: int = SYNTHESIS_WORKERS):
+        if mode not in SYNTHESIS_MODES:
+            raise ValueError(f"mode must be one of {SYNTHESIS_MODES}, not {mode!r}")
+        self.llm = llm
+        # one part per call would never shrink the tree
+        self.fan_in = max(2, fan_in)
+        self.tokens = tokens
+        self.mode = mode
+        self.workers = workers
+        self.stats = {}
+
+    @property
+    def merge_tokens(self) -> int:
+        """The most a merge may write: fan_in merges still fit one call."""
+        return self.tokens // self.fan_in
+
+    def final_prompt(self, topic: str, parts: List[str]) -> str:
+        return FINAL_PROMPT.format(topic=topic, content=PART_SEPARATOR.join(parts)).strip()
+
+    def merge_prompt(self, topic: str, group: List[str]) -> str:
+        # ~0.75 words per token
+        words = self.merge_tokens * 3 // 4
+        return MERGE_PROMPT.format(topic=topic, content=PART_SEPARATOR.join(group), words=words).strip()
+
+    def leaves(self, parts: List[str]) -> List[str]:
+        """The parts, with any that alone overflow a call cut at sentence breaks into pieces that do not."""
+        leaves = []
+        for part in parts:
+            if count_tokens(part) <= self.tokens:
+                leaves.append(part)
+                continue
+            piece = ''
+            for sentence in split_sentences(part):
+                if piece and count_tokens(piece + sentence) > self.tokens:
+                    leaves.append(piece.strip())
+                    piece = ''
+                piece += sentence
+            if piece.strip():
+                leaves.append(truncate_to_tokens(piece.strip(), self.tokens))
+        return leaves
+
+    def fits(self, parts: List[str]) -> bool:
+        return count_tokens(PART_SEPARATOR.join(parts)) <= self.tokens
+
+    def groups(self, parts: List[str]) -> List[List[str]]:
+        """Consecutive parts, greedily: a group closes at fan_in parts or when the next would overflow the call."""
+        groups, group, used = [], [], 0
+        separator = count_tokens(PART_SEPARATOR)
+        for part in parts:
+            cost = count_tokens(part) + (separator if group else 0)
+            if group and (len(group) == self.fan_in or used + cost > self.tokens):
+                groups.append(group)
+                group, used, cost = [], 0, count_tokens(part)
+            group.append(part)
+            used += cost
+        if group:
+            groups.append(group)
+        return groups
+
+    def _start(self, parts: List[str]) -> List[str]:
+        self.stats = {'parts': len(parts), 'levels': 0, 'merge_calls': 0, 'max_call_tokens': 0}
+        return self.leaves(parts) if self.mode == 'hierarchical' else parts
+
+    def _next_level(self, parts: List[str]) -> Optional[List[List[str]]]:
+        """The groups to merge next, or None once the parts fit the final call."""
+        if self.mode != 'hierarchical' or len(parts) <= 1 or self.fits(parts):
+            self._record(count_tokens(PART_SEPARATOR.join(parts)))
+            return None
+        groups = self.groups(parts)
+        self.stats['levels'] += 1
+        self.stats['merge_calls'] += len(groups)
+        for group in groups:
+            self._record(count_tokens(PART_SEPARATOR.join(group)))
+        return groups
+
+    def _record(self, tokens: int):
+        self.stats['max_call_tokens'] = max(self.stats['max_call_tokens'], tokens)
+
+    def _merged(self, text: str) -> str:
+        # the model may not keep to the word limit; the next level relies on it
+        return truncate_to_tokens(text.strip(), self.merge_tokens)
+
+    def _report(self):
+        print(f"SYNTHESIS: {self.stats['parts']} parts, {self.stats['levels']} merge levels, "
+              f"{self.stats['merge_calls']} merge calls, largest call {self.stats['max_call_tokens']} tokens")
+
+    def merge(self, topic: str, group: List[str]) -> str:
+        return self._merged(self.llm.invoke(self.merge_prompt(topic, group)).content)
+
+    def run(self, topic: str, parts: List[str]) -> str:
+        parts = self._start(parts)
+        while True:
+            groups = self._next_level(parts)
+            if groups is None:
+                break
+            # threads that carry the node's run context (callbacks, tracing)
+            with ContextThreadPoolExecutor(max_workers=min(self.workers, len(groups))) as pool:
+                parts = list(pool.map(lambda group: self.merge(topic, group), groups))
+        self._report()
+        return self.llm.invoke(self.final_prompt(topic, parts)).content
+
+    async def amerge(self, topic: str, group: List[str], llm_slot: Optional[Callable] = None) -> str:
+        async with llm_slot() if llm_slot else contextlib.nullcontext():
+            response = await self.llm.ainvoke(self.merge_prompt(topic, group), config={'tags': [NOSTREAM_TAG]})
+        return self._merged(response.content)
+
+    async def arun(self, topic: str, parts: List[str], llm_slot: Optional[Callable] = None) -> str:
+        """`llm_slot` makes an async context manager held around each call, merges and the final one
+        (e.g. lambda: scheduler.limit('llm'))."""
+        parts = self._start(parts)
+        while True:
+            groups = self._next_level(parts)
+            if groups is None:
+                break
+            parts = list(await asyncio.gather(*[self.amerge(topic, group, llm_slot) for group in groups]))
+        self._report()
+        # the final call streams into the draft; it holds a slot like any other
+        async with llm_slot() if llm_slot else contextlib.nullcontext():
+            response = await self.llm.ainvoke(self.final_prompt(topic, parts))
+        return response.content
+
+
+def synthesis_budget(model: str) -> int:
+    if os.environ.get('SYNTHESIS_TOKENS'):
+        return int(os.environ['SYNTHESIS_TOKENS'])
+    return SYNTHESIS_TOKEN_BUDGETS.get(model, DEFAULT_SYNTHESIS_TOKENS)
+
+
+def default_synthesizer(llm) -> Synthesizer:
+    """SYNTHESIS_MODE, SYNTHESIS_FAN_IN and SYNTHESIS_TOKENS override the defaults."""
+    return Synthesizer(
+        llm,
+        fan_in=int(os.environ.get('SYNTHESIS_FAN_IN', SYNTHESIS_FAN_IN)),
+        tokens=synthesis_budget(getattr(llm, 'model', '')),
+        mode=os.environ.get('SYNTHESIS_MODE', SYNTHESIS_MODE),
+    )
@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'content_crator_agent')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmark import FakeBackend, Latency
+
+
+@pytest.fixture(scope='session')
+def fake_backend(tmp_path_factory):
+    """Ollama, the searches and the approval windows replaced by benchmark's fakes (no latency),
+    run from a scratch directory so caches, checkpoints and logs stay out of the tree."""
+    os.chdir(tmp_path_factory.mktemp('run'))
+    os.environ['LLM_CACHE'] = '0'
+    os.environ['SEARCH_CACHE'] = '0'
+    backend = FakeBackend(Latency('fixed:0'), Latency('fixed:0'), Latency('fixed:0'))
+    backend.install()
+    return backend
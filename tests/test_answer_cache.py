@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from answer_cache import AnswerStore, QuestionCache, SemanticAnswerCache, normalize_question
+from benchmark import write_text_pdf, document_page
+from document_analyzer import DocumentQA
+
+SCOPE = 'gemma3:4b|dense'
+
+
+def vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_normalize_question_keeps_word_order():
+    assert normalize_question('  What is FAISS?? ') == 'what is faiss'
+    assert normalize_question('is FAISS what') != normalize_question('what is FAISS')
+
+
+def test_question_cache_is_dropped_when_the_index_changes():
+    cache = QuestionCache(max_entries=2)
+    cache.invalidate('v1')
+    cache.put('What is FAISS?', 'vector', [1.0, 0.0])
+    cache.put('What is FAISS?', 'docs', ['chunk'], ('dense', 4))
+    assert cache.get('what is faiss', 'vector') == [1.0, 0.0]
+    assert cache.get('what is faiss', 'docs', ('bm25', 4)) is None
+    assert cache.get('what is faiss', 'docs', ('dense', 4)) == ['chunk']
+
+    cache.invalidate('v2')
+    assert cache.get('what is faiss', 'vector') is None
+
+
+def test_close_questions_share_an_answer_and_scopes_do_not():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.invalidate('v1')
+    cache.put(SCOPE, 'What is FAISS?', vector(1, 0, 0), 'a vector index')
+
+    assert cache.lookup(SCOPE, 'what is faiss', vector(0, 1, 0)) == 'a vector index'
+    assert cache.lookup(SCOPE, 'Tell me about FAISS', vector(0.99, 0.1, 0)) == 'a vector index'
+    assert cache.lookup(SCOPE, 'What is BM25?', vector(0.5, 0.5, 0.7)) is None
+    assert cache.lookup('gemma3:4b|bm25', 'What is FAISS?', vector(1, 0, 0)) is None
+    assert cache.stats()['exact_hits'] == 1 and cache.stats()['semantic_hits'] == 1
+
+
+def test_answers_outlive_the_process_until_the_index_changes(tmp_path):
+    path = str(tmp_path / 'answers.sqlite')
+    store = AnswerStore(path)
+    assert not os.path.exists(path)
+    cache = SemanticAnswerCache(store, 'store-a')
+    cache.invalidate('v1')
+    cache.put(SCOPE, 'What is FAISS?', vector(1, 0, 0), 'a vector index')
+
+    reopened = SemanticAnswerCache(AnswerStore(path), 'store-a')
+    reopened.invalidate('v1')
+    assert reopened.lookup(SCOPE, 'What is FAISS?', vector(1, 0, 0)) == 'a vector index'
+
+    changed = SemanticAnswerCache(AnswerStore(path), 'store-a')
+    changed.invalidate('v2')
+    assert changed.lookup(SCOPE, 'What is FAISS?', vector(1, 0, 0)) is None
+
+
+def test_stores_sharing_the_file_keep_each_others_answers(tmp_path):
+    path = str(tmp_path / 'answers.sqlite')
+    first = SemanticAnswerCache(AnswerStore(path), '/stores/first_store')
+    first.invalidate('v1')
+    first.put(SCOPE, 'What is FAISS?', vector(1, 0, 0), 'first answer')
+    # another corpus, whose name '_' would match as a LIKE wildcard
+    other = SemanticAnswerCache(AnswerStore(path), '/stores/first')
+    other.invalidate('v2')
+    other.put(SCOPE, 'What is FAISS?', vector(1, 0, 0), 'other answer')
+
+    first_again = SemanticAnswerCache(AnswerStore(path), '/stores/first_store')
+    first_again.invalidate('v1')
+    assert first_again.lookup(SCOPE, 'What is FAISS?', vector(1, 0, 0)) == 'first answer'
+    other_again = SemanticAnswerCache(AnswerStore(path), '/stores/first')
+    other_again.invalidate('v2')
+    assert other_again.lookup(SCOPE, 'What is FAISS?', vector(1, 0, 0)) == 'other answer'
+
+
+def test_document_qas_over_different_stores_keep_their_answers(fake_backend, tmp_path):
+    qas = []
+    for name in ('first', 'second'):
+        pdf = str(tmp_path / f'{name}.pdf')
+        write_text_pdf(pdf, [document_page(len(qas) * 10 + i) for i in range(3)])
+        qas.append((pdf, str(tmp_path / f'{name}_store')))
+
+    pdf, folder_path = qas[0]
+    answer = DocumentQA([pdf], folder_path, workers=1).ask('What is the project about?')
+    DocumentQA([qas[1][0]], qas[1][1], workers=1).ask('What is the project about?')
+
+    fake_backend.calls.clear()
+    again = DocumentQA([pdf], folder_path, workers=1)
+    assert again.ask('What is the project about?') == answer
+    assert again.answer_cache.stats()['exact_hits'] == 1
+    assert fake_backend.calls['llm'] == 0
@@ -0,0 +1,68 @@
+import asyncio
+import os
+from typing import TypedDict
+from langgraph.graph import StateGraph, START, END
+from checkpoints import durable_checkpointer
+
+
+class CountState(TypedDict):
+    count: int
+
+
+def counter_app(checkpointer):
+    graph = StateGraph(CountState)
+    graph.add_node('step', lambda state: {'count': state['count'] + 1})
+    graph.add_edge(START, 'step')
+    graph.add_edge('step', END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def test_file_is_created_on_first_use(tmp_path):
+    path = str(tmp_path / 'checkpoints.sqlite')
+    checkpointer = durable_checkpointer(path)
+    assert not os.path.exists(path)
+
+    counter_app(checkpointer).invoke({'count': 0}, {'configurable': {'thread_id': 'a'}})
+    assert os.path.exists(path)
+
+
+def test_thread_prefixes_are_matched_literally(tmp_path):
+    checkpointer = durable_checkpointer(str(tmp_path / 'checkpoints.sqlite'))
+    app = counter_app(checkpointer)
+    for thread_id in ('run_1', 'run_1/0-section', 'runx1', 'RUN_1', 'run%1'):
+        app.invoke({'count': 0}, {'configurable': {'thread_id': thread_id}})
+
+    assert sorted(thread_id for thread_id, _, _ in checkpointer.list_threads('run_')) == ['run_1', 'run_1/0-section']
+    assert [thread_id for thread_id, _, _ in checkpointer.list_threads('run%')] == ['run%1']
+
+    checkpointer.delete_threads('run_1')
+    assert sorted(thread_id for thread_id, _, _ in checkpointer.list_threads()) == ['RUN_1', 'run%1', 'runx1']
+
+
+def test_standalone_section_run_starts_over_once_finished(fake_backend):
+    import section_graph
+    section_graph.router.log_path = None
+    fake_backend.calls.clear()
+    state = section_graph.SectionState(topic='Checkpoint Topic', title='Standalone Section')
+
+    asyncio.run(section_graph.run_section_graph(state))
+    asyncio.run(section_graph.run_section_graph(state))
+
+    # the second run drafts and asks for approval again instead of returning the first result
+    assert fake_backend.calls['approval'] == 2
+
+
+def test_interrupted_section_state_is_rebuilt_from_disk(fake_backend, caplog):
+    import config
+    import section_graph
+    section_graph.router.log_path = None
+    state = section_graph.SectionState(topic='Checkpoint Topic', title='Interrupted Section')
+
+    run_config, _ = asyncio.run(section_graph.start_section_graph(state, 'interrupted-section'))
+
+    # a fresh saver on the same file, as after a restart
+    reopened = durable_checkpointer(config.checkpointer.path, config.CHECKPOINT_STATE_TYPES)
+    interrupt = reopened.get_tuple(run_config).pending_writes
+    values = [value for _, channel, value in interrupt if channel == '__interrupt__']
+    assert isinstance(values[0][0].value['interrupt_state'], section_graph.SectionState)
+    assert 'unregistered type' not in caplog.text
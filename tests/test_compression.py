@@ -0,0 +1,48 @@
+from compression import bm25_ranking, compress, query_weights, split_passages, split_sources
+from token_budget import count_tokens
+
+TOPIC = 'Astronomy'
+TITLE = 'Telescopes'
+FILLER = 'It was written for a general audience by a small team of editors.'
+
+
+def test_split_sources_keeps_labels_and_leading_text():
+    raw = 'Intro text.\n[Wikipedia search result]: First page.\n[DuckDuckGo search result]: Snippet one.'
+    assert split_sources(raw) == [
+        ('', 'Intro text.'),
+        ('Wikipedia search result', 'First page.'),
+        ('DuckDuckGo search result', 'Snippet one.'),
+    ]
+
+
+def test_split_passages_cuts_paragraphs_at_sentence_breaks():
+    paragraph = ' '.join(f'Sentence {i} is about nothing in particular.' for i in range(30))
+    passages = split_passages(f'{paragraph}\n\nA second paragraph.', tokens=40)
+    assert passages[-1] == 'A second paragraph.'
+    assert all(count_tokens(passage) <= 40 for passage in passages)
+    assert ' '.join(passages[:-1]) == paragraph
+
+
+def test_title_terms_weigh_more_than_topic_terms():
+    assert query_weights('machine learning', 'learning systems') == {'machine': 1.0, 'learning': 3.0, 'systems': 2.0}
+    passages = [
+        f'Astronomy is old and astronomy is popular. {FILLER}',
+        f'Telescopes gather light from far away. {FILLER}',
+        FILLER,
+    ]
+    # the topic passage says its word twice, the title passage once: the title still ranks first
+    assert bm25_ranking(passages, TOPIC, TITLE) == [1, 0]
+
+
+def test_compress_keeps_the_best_passages_in_their_order():
+    relevant = 'Telescopes collect light with mirrors or lenses.'
+    raw = '\n\n'.join(
+        [f'[Wikipedia search result]: {FILLER} {FILLER}', f'[DuckDuckGo search result]: {relevant}']
+        + [f'Unrelated paragraph {i} about {FILLER.lower()}' for i in range(10)]
+    )
+    compressed, ratio = compress(raw, TOPIC, TITLE, tokens=40, mode='bm25')
+    assert compressed == f'[DuckDuckGo search result]: {relevant}'
+    assert ratio == count_tokens(compressed) / count_tokens(raw)
+
+    assert compress(raw, TOPIC, TITLE, tokens=40, mode='off') == (raw, 1.0)
+    assert compress(raw, TOPIC, TITLE, tokens=count_tokens(raw)) == (raw, 1.0)
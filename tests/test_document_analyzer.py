@@ -0,0 +1,106 @@
+import pytest
+from langchain_core.documents import Document
+from benchmark import write_text_pdf, document_page
+from document_analyzer import DocumentQA, merge_chunks, read_manifest
+
+
+@pytest.fixture
+def pdfs(fake_backend, tmp_path, monkeypatch):
+    """Two documents that share their first page word for word (and an empty embedding cache)."""
+    monkeypatch.setenv('EMBEDDING_CACHE_PATH', str(tmp_path / 'embeddings.sqlite'))
+    shared = document_page(0)
+    paths = []
+    for name, pages in (('a.pdf', [shared, document_page(1)]), ('b.pdf', [shared, document_page(2)])):
+        path = str(tmp_path / name)
+        write_text_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+
+def test_identical_chunks_keep_their_own_source_and_page(pdfs, tmp_path):
+    qa = DocumentQA(pdfs, str(tmp_path / 'store'), workers=1, cache_answers=False)
+    vector_store = qa.vector_store
+
+    docs = [vector_store.docstore.search(doc_id) for doc_id in vector_store.index_to_docstore_id.values()]
+    first_chunk = next(doc.page_content for doc in docs if doc.metadata['source'] == pdfs[0])
+    copies = [doc for doc in docs if doc.page_content == first_chunk]
+    assert sorted((doc.metadata['source'], doc.metadata['page']) for doc in copies) == [(pdfs[0], 0), (pdfs[1], 0)]
+
+    manifest = read_manifest(qa.folder_path)['files']
+    assert not set(manifest[pdfs[0]]['chunks']) & set(manifest[pdfs[1]]['chunks'])
+    # the shared text was embedded once
+    assert qa.embeddings.stats()['embedded'] == len({doc.page_content for doc in docs})
+
+
+def test_removing_a_file_keeps_the_other_copy(pdfs, tmp_path):
+    folder_path = str(tmp_path / 'store')
+    DocumentQA(pdfs, folder_path, workers=1, cache_answers=False).vector_store
+
+    vector_store = DocumentQA(pdfs[1:], folder_path, workers=1, cache_answers=False).vector_store
+    sources = {vector_store.docstore.search(doc_id).metadata['source'] for doc_id in vector_store.index_to_docstore_id.values()}
+    assert sources == {pdfs[1]}
+    assert vector_store.index.ntotal == len(read_manifest(folder_path)['files'][pdfs[1]]['chunks'])
+
+
+def test_merge_chunks_joins_overlapping_chunks_of_one_page_only():
+    text = document_page(3)
+    a, b = text[:600], text[400:1000]
+    docs = [
+        Document(page_content=b, metadata={'source': 'x.pdf', 'page': 1}),
+        Document(page_content='unrelated passage', metadata={'source': 'x.pdf', 'page': 2}),
+        Document(page_content=a, metadata={'source': 'x.pdf', 'page': 1}),
+        Document(page_content=a, metadata={'source': 'y.pdf', 'page': 1}),
+    ]
+    assert merge_chunks(docs) == [text[:1000], 'unrelated passage', a]
+
+
+@pytest.fixture
+def ivf_store(fake_backend, tmp_path, monkeypatch):
+    """A saved ivf_flat store (the corpus is far below the size that normally trains one)."""
+    monkeypatch.setattr('document_analyzer.MIN_TRAIN_VECTORS', 40)
+    pdf = str(tmp_path / 'manual.pdf')
+    write_text_pdf(pdf, [document_page(i) for i in range(20)])
+    folder_path = str(tmp_path / 'ivf_store')
+    qa = DocumentQA([pdf], folder_path, workers=1, index_type='ivf_flat', cache_answers=False)
+    assert qa.vector_store.index.nlist > 1
+    return pdf, folder_path
+
+
+QUESTION = ' '.join(document_page(7)[850:].split()[1:4])
+
+
+def test_memory_mapped_ivf_store_answers_hybrid_queries(ivf_store):
+    pdf, folder_path = ivf_store
+    in_memory = DocumentQA([pdf], folder_path, workers=1, index_type='ivf_flat', cache_answers=False)
+    mapped = DocumentQA([pdf], folder_path, workers=1, index_type='ivf_flat', mmap=True, cache_answers=False)
+
+    docs = mapped.retrieve(QUESTION, mode='hybrid')
+    assert mapped.ingest_stats['embedded'] == 0
+    assert [doc.page_content for doc in docs] == [doc.page_content for doc in in_memory.retrieve(QUESTION, mode='hybrid')]
+    assert any(doc.metadata['page'] == 7 for doc in docs)
+
+
+def test_memory_mapped_ivf_store_saved_without_a_direct_map(ivf_store):
+    import faiss
+    pdf, folder_path = ivf_store
+    path = f'{folder_path}/index.faiss'
+    index = faiss.read_index(path)
+    faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.NoMap)
+    faiss.write_index(index, path)
+
+    mapped = DocumentQA([pdf], folder_path, workers=1, index_type='ivf_flat', mmap=True, cache_answers=False)
+    assert any(doc.metadata['page'] == 7 for doc in mapped.retrieve(QUESTION, mode='hybrid'))
+
+
+def test_ivf_store_is_rebuilt_without_removed_chunks(ivf_store):
+    pdf, folder_path = ivf_store
+    write_text_pdf(pdf, [document_page(i) for i in range(20) if i != 7])
+
+    qa = DocumentQA([pdf], folder_path, workers=1, index_type='ivf_flat', cache_answers=False)
+    vector_store = qa.vector_store
+    assert qa.ingest_stats['removed'] > 0
+    pages = {vector_store.docstore.search(doc_id).metadata['page'] for doc_id in vector_store.index_to_docstore_id.values()}
+    assert len(pages) == 19
+    # the vectors read back still line up with their chunks (nprobe covers every list: search is exact)
+    reranked = qa.rerank(QUESTION, list(vector_store.index_to_docstore_id.values()))
+    assert vector_store.docstore.search(reranked[0]).page_content == qa.retrieve(QUESTION, mode='dense', k=1)[0].page_content
@@ -0,0 +1,58 @@
+import os
+import threading
+from embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings:
+    """Two-dimensional vectors from the text; every text it is asked to embed is recorded."""
+
+    def __init__(self):
+        self.texts = []
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.texts += texts
+            self.requests += 1
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_each_distinct_text_is_embedded_once_in_batches():
+    model = CountingEmbeddings()
+    cached = CachedEmbeddings(model, 'fake', batch_size=2)
+    texts = ['alpha', 'beta', 'alpha', 'gamma', 'delta', 'beta']
+
+    vectors = cached.embed_documents(texts)
+    assert sorted(model.texts) == ['alpha', 'beta', 'delta', 'gamma']
+    assert model.requests == 2
+    assert vectors[0] == vectors[2] and vectors[1] == vectors[5]
+    assert vectors == [model.embed_query(text) for text in texts]
+    assert cached.stats()['embedded'] == 4
+
+
+def test_store_is_opened_on_first_use_and_shared_across_runs(tmp_path):
+    path = str(tmp_path / 'embeddings.sqlite')
+    store = EmbeddingStore(path)
+    assert not os.path.exists(path)
+    CachedEmbeddings(CountingEmbeddings(), 'fake', store).embed_batch(['alpha', 'beta'])
+    assert os.path.exists(path)
+
+    model = CountingEmbeddings()
+    again = CachedEmbeddings(model, 'fake', EmbeddingStore(path))
+    texts = ['beta', 'gamma', 'alpha']
+    assert again.embed_batch(texts) == CountingEmbeddings().embed_documents(texts)
+    assert model.texts == ['gamma']
+    assert again.stats()['cached'] == 2
+
+
+def test_vectors_are_cached_per_model(tmp_path):
+    store = EmbeddingStore(str(tmp_path / 'embeddings.sqlite'))
+    CachedEmbeddings(CountingEmbeddings(), 'model-a', store).embed_batch(['alpha'])
+
+    model = CountingEmbeddings()
+    CachedEmbeddings(model, 'model-b', store).embed_batch(['alpha'])
+    assert model.texts == ['alpha']
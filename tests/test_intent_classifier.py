@@ -0,0 +1,23 @@
+from intent_classifier import EmbeddingIntentClassifier
+
+SAMPLES = ['Hello, how are you today?', 'What is a vector database?', 'Write a haiku about autumn', 'This is great, thanks']
+
+
+def test_reloaded_index_scores_like_the_built_one(fake_backend, tmp_path):
+    folder_path = str(tmp_path / 'intent_faiss_store')
+    built = EmbeddingIntentClassifier(folder_path=folder_path)
+    built_results = [built.classify(text) for text in SAMPLES]
+
+    # a second classifier finds the saved index (as every run after the first does)
+    reloaded = EmbeddingIntentClassifier(folder_path=folder_path)
+    reloaded_results = [reloaded.classify(text) for text in SAMPLES]
+
+    for (category, confidence, margin, _), (category2, confidence2, margin2, _) in zip(built_results, reloaded_results):
+        assert category2 == category
+        assert abs(confidence2 - confidence) < 1e-6
+        assert abs(margin2 - margin) < 1e-6
+    for text in SAMPLES:
+        votes, _ = built.scores(text)
+        votes2, _ = reloaded.scores(text)
+        assert votes2.keys() == votes.keys()
+        assert all(abs(votes2[category] - votes[category]) < 1e-6 for category in votes)
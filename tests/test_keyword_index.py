@@ -0,0 +1,69 @@
+from keyword_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    'faiss': 'FAISS builds an inverted file index over vectors for fast similarity search.',
+    'bm25': 'BM25 ranks documents by term frequency and inverse document frequency.',
+    'both': 'Hybrid search fuses BM25 keyword ranking with vector similarity search.',
+    'other': 'The weather was pleasant for the whole week.',
+}
+
+
+def index_of(docs=DOCS):
+    index = BM25Index()
+    for doc_id, text in docs.items():
+        index.add(doc_id, text)
+    return index
+
+
+def test_tokenize_drops_stop_words():
+    assert tokenize('What is the BM25 score of a document?') == ['bm25', 'score', 'document']
+
+
+def test_search_scores_only_documents_sharing_a_term():
+    results = index_of().search('similarity search over vectors', 10)
+    assert [doc_id for doc_id, _ in results] == ['faiss', 'both']
+    assert results[0][1] > results[1][1] > 0
+    assert index_of().search('nothing matches', 10) == []
+
+
+def test_rare_terms_outweigh_common_ones():
+    # 'search' is in two documents, 'frequency' only in one
+    assert index_of().search('search frequency', 1)[0][0] == 'bm25'
+
+
+def test_removed_documents_leave_no_postings():
+    index = index_of()
+    index.remove('faiss')
+    assert [doc_id for doc_id, _ in index.search('inverted file vectors', 10)] == []
+    assert 'inverted' not in index.postings
+    assert index.total_length == sum(len(tokenize(text)) for doc_id, text in DOCS.items() if doc_id != 'faiss')
+
+
+def test_sync_adds_and_removes_and_survives_a_round_trip(tmp_path):
+    index = index_of()
+    texts = dict(DOCS, new='Reciprocal rank fusion combines rankings.')
+    assert index.sync(['bm25', 'both', 'new'], texts.__getitem__) == (1, 2)
+
+    path = str(tmp_path / 'bm25.pkl')
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 3
+    assert loaded.search('fusion rankings', 10) == index.search('fusion rankings', 10)
+    assert len(BM25Index.load(str(tmp_path / 'missing.pkl'))) == 0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    keyword = ['a', 'b', 'c', 'd']
+    vector = ['b', 'c', 'a', 'e']
+    # b is near the top of both, a first in one but third in the other; d and e, each fourth in one
+    # ranking only, come last (ties keep first-seen order)
+    assert reciprocal_rank_fusion([keyword, vector]) == ['b', 'a', 'c', 'd', 'e']
+    assert reciprocal_rank_fusion([keyword]) == keyword
+
+
+def test_weights_scale_single_query_terms():
+    index = index_of()
+    # both terms are in one document only; 'frequency' is there twice, 'inverted' once
+    assert index.search('inverted frequency', 1)[0][0] == 'bm25'
+    assert index.search('inverted frequency', 1, {'inverted': 2.0})[0][0] == 'faiss'
+    assert index.search('inverted inverted frequency', 2) == index.search('inverted frequency', 2)
@@ -0,0 +1,57 @@
+import os
+from langchain_core.outputs import Generation
+from llm_cache import LRUMemoryCache, SQLiteDiskCache, TieredLLMCache
+
+
+def generations(text):
+    return [Generation(text=text)]
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = LRUMemoryCache(max_entries=2)
+    cache.update('a', 'model', generations('A'))
+    cache.update('b', 'model', generations('B'))
+    assert cache.lookup('a', 'model')[0].text == 'A'
+    cache.update('c', 'model', generations('C'))
+
+    assert cache.lookup('b', 'model') is None
+    assert cache.lookup('a', 'model')[0].text == 'A'
+    assert cache.lookup('c', 'model')[0].text == 'C'
+    stats = cache.stats.as_dict()
+    assert (stats['hits'], stats['misses'], stats['writes'], stats['evictions']) == (3, 1, 3, 1)
+
+
+def test_entries_are_keyed_by_model_string():
+    cache = LRUMemoryCache()
+    cache.update('prompt', 'model-a', generations('A'))
+    assert cache.lookup('prompt', 'model-b') is None
+
+
+def test_disk_tier_survives_reopening_and_stays_under_its_budget(tmp_path):
+    path = str(tmp_path / 'llm_cache.sqlite')
+    disk = SQLiteDiskCache(path)
+    assert not os.path.exists(path)
+    disk.update('prompt', 'model', generations('answer'))
+
+    reopened = SQLiteDiskCache(path)
+    assert reopened.lookup('prompt', 'model')[0].text == 'answer'
+    assert reopened.lookup('other', 'model') is None
+
+    small = SQLiteDiskCache(str(tmp_path / 'small.sqlite'), max_bytes=1000)
+    for i in range(10):
+        small.update(f'prompt {i}', 'model', generations('x' * 200))
+    assert small.stats.evictions > 0
+    assert small._total_bytes <= 1000
+    assert small.lookup('prompt 9', 'model') is not None
+    assert small.lookup('prompt 0', 'model') is None
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    disk = SQLiteDiskCache(str(tmp_path / 'llm_cache.sqlite'))
+    disk.update('prompt', 'model', generations('answer'))
+    cache = TieredLLMCache(disk=disk)
+
+    assert cache.lookup('prompt', 'model')[0].text == 'answer'
+    assert cache.lookup('prompt', 'model')[0].text == 'answer'
+    assert cache.stats()['memory']['hits'] == 1
+    assert cache.stats()['disk']['hits'] == 1
@@ -0,0 +1,79 @@
+import asyncio
+import concurrent.futures
+import pytest
+
+
+@pytest.fixture
+def note_graph(fake_backend, monkeypatch):
+    import note_graph
+    import section_graph
+    section_graph.router.log_path = None
+    fake_backend.sections = 4
+    fake_backend.calls.clear()
+    monkeypatch.setattr(note_graph, 'SECTION_REVIEW_MODE', 'batch')
+    return note_graph
+
+
+def test_batch_mode_reviews_all_sections_in_one_window(note_graph, fake_backend):
+    state = asyncio.run(note_graph.run_note_graph(note_graph.NoteState(topic='Batch Review Topic')))
+
+    assert len(state.sections) == 4
+    assert all(section.final_content for section in state.sections)
+    # one window for the sections, one for the final note
+    assert fake_backend.calls['approval'] == 2
+
+
+def test_batch_mode_resumes_each_section_once_reviewed(note_graph, monkeypatch):
+    events = []
+
+    async def start_section_graph(section, thread_id=None, on_token=None):
+        await asyncio.sleep(0.02 * int(section.title[-1]))
+        return {'configurable': {'thread_id': thread_id}}, section.model_copy(update={'draft_content': f'draft of {section.title}'})
+
+    async def resume_section_graph(config, final_content=None):
+        events.append(('resume', final_content))
+        return note_graph.SectionState(final_content=final_content)
+
+    class RecordingDesk:
+        def submit(self, topic, section, content):
+            events.append(('review', content))
+            future = concurrent.futures.Future()
+            future.set_result(content)
+            return future
+
+    monkeypatch.setattr(note_graph, 'start_section_graph', start_section_graph)
+    monkeypatch.setattr(note_graph, 'resume_section_graph', resume_section_graph)
+    sections = [note_graph.SectionState(topic='Overlap Topic', title=f'Section {i}') for i in range(3)]
+
+    reviewed = asyncio.run(note_graph.review_sections_in_batch(sections, 'overlap-topic', RecordingDesk()))
+
+    assert [section.final_content for section in reviewed] == [f'draft of Section {i}' for i in range(3)]
+    # the first section is reviewed and resumed while the last one is still drafting
+    assert events.index(('resume', 'draft of Section 0')) < events.index(('review', 'draft of Section 2'))
+
+
+def test_batch_mode_cancels_other_sections_when_one_fails(note_graph, monkeypatch):
+    started, cancelled = [], []
+
+    async def start_section_graph(section, thread_id=None, on_token=None):
+        started.append(section.title)
+        if len(started) == 1:
+            await asyncio.sleep(0)
+            raise RuntimeError('section failed')
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(section.title)
+            raise
+
+    monkeypatch.setattr(note_graph, 'start_section_graph', start_section_graph)
+    sections = [note_graph.SectionState(topic='Failing Topic', title=f'Section {i}') for i in range(3)]
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await note_graph.review_sections_in_batch(sections, 'failing-topic', None)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert len(started) == 3
+    assert sorted(cancelled) == sorted(started[1:])
@@ -0,0 +1,10 @@
+def test_parallel_run_keeps_one_draft_per_section(fake_backend):
+    import note_taker
+    note_taker.router.log_path = None
+    fake_backend.sections = 5
+
+    state = note_taker.run_note_taker('Test Topic', parallel=True)
+
+    assert len(state['sections']) == 5
+    assert sorted(index for index, _ in state['drafted_sections']) == list(range(5))
+    assert all(section['final_content'] for section in state['sections_content'])
@@ -0,0 +1,59 @@
+import pytest
+from routing import FusedRouteResponse, RoutingMemory, SectionRouter
+
+TOPIC = 'Artificial Intelligence'
+
+
+class FakeLLM:
+    """Structured routing calls answer 'wikipedia' and are counted."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def with_structured_output(self, schema):
+        return self
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return FusedRouteResponse(is_search_need=True, search_type='wikipedia')
+
+
+@pytest.mark.parametrize('title, route', [
+    ('Latest News and Trends', 'duck_duck_go'),
+    ('History and Origins of Computing', 'wikipedia'),
+    ('Recent History of Robotics', 'both'),
+    ('Introduction and Overview', 'not_need_search'),
+    ('Key Takeaways and Summary', 'not_need_search'),
+])
+def test_titles_with_several_keywords_are_routed_locally(title, route):
+    llm = FakeLLM()
+    decision = SectionRouter(llm, log_path=None).route(TOPIC, title)
+    assert (decision.route, decision.source) == (route, 'keyword')
+    assert llm.calls == 0
+
+
+@pytest.mark.parametrize('title', [
+    'How Neural Networks Learn',
+    'Why AI Matters',
+    'Types of Machine Learning',
+    'Development Tools',
+    'A Brief History',
+    'Ethical Challenges',
+    'Reinforcement Learning',
+])
+def test_titles_with_one_or_no_keyword_go_to_the_llm(title):
+    llm = FakeLLM()
+    decision = SectionRouter(llm, log_path=None).route(TOPIC, title)
+    assert (decision.route, decision.source) == ('wikipedia', 'llm')
+    assert llm.calls == 1
+
+
+def test_llm_decisions_are_remembered_for_the_same_title(tmp_path):
+    llm = FakeLLM()
+    router = SectionRouter(llm, memory=RoutingMemory(str(tmp_path / 'routing.sqlite')), log_path=None)
+    router.route(TOPIC, 'Reinforcement Learning')
+
+    decision = router.route(TOPIC, 'reinforcement learning')
+    assert (decision.route, decision.source) == ('wikipedia', 'memory')
+    assert router.route(TOPIC, 'Computer Vision').source == 'llm'
+    assert llm.calls == 2
@@ -0,0 +1,68 @@
+import asyncio
+from scheduler import PriorityLimiter, SectionScheduler
+
+
+def test_sections_start_in_priority_order_within_the_limit():
+    scheduler = SectionScheduler(max_sections=2, resource_limits={})
+    started = []
+    running = 0
+    most_running = 0
+
+    async def section(label):
+        nonlocal running, most_running
+        started.append(label)
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return label
+
+    async def main():
+        # submitted in reverse: the queued ones must still be admitted lowest priority first
+        return await asyncio.gather(*(
+            scheduler.run(f's{i}', lambda i=i: section(f's{i}'), priority=i) for i in reversed(range(6))
+        ))
+
+    assert asyncio.run(main()) == [f's{i}' for i in reversed(range(6))]
+    assert started == ['s5', 's4', 's0', 's1', 's2', 's3']
+    assert most_running == 2
+    assert [record['label'] for record in scheduler.records] == [f's{i}' for i in reversed(range(6))]
+
+
+def test_resource_slots_follow_section_priority():
+    scheduler = SectionScheduler(max_sections=4, resource_limits={'llm': 1})
+    calls = []
+
+    async def section(label, hold):
+        async with scheduler.limit('llm'):
+            calls.append(label)
+            await asyncio.sleep(hold)
+
+    async def main():
+        first = asyncio.create_task(scheduler.run('a', lambda: section('a', 0.02), priority=3))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, *(
+            scheduler.run(label, lambda label=label: section(label, 0), priority=priority)
+            for label, priority in (('c', 2), ('b', 0), ('d', 1))
+        ))
+
+    asyncio.run(main())
+    assert calls == ['a', 'b', 'd', 'c']
+    assert scheduler.records[0]['resource_wait']['llm'] < scheduler.records[1]['resource_wait']['llm']
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    limiter = PriorityLimiter(1)
+
+    async def main():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        limiter.release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        # the slot is free again
+        await asyncio.wait_for(limiter.acquire(), 1)
+
+    asyncio.run(main())
+    assert limiter._active == 1
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import time
+from search_cache import CachedSearchTool, SearchResultStore, normalize_query
+
+
+class CountingTool:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.queries = []
+
+    def invoke(self, query):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        return f'result for {query}'
+
+    async def ainvoke(self, query):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        return f'result for {query}'
+
+
+def test_normalize_query_keeps_word_order():
+    assert normalize_query('  **Rust**  vs. Python? ') == 'rust vs python'
+    assert normalize_query('python vs rust') != normalize_query('rust vs python')
+    assert normalize_query('C++ and C#') == 'c++ and c#'
+
+
+def test_repeated_queries_hit_the_cache():
+    tool = CountingTool()
+    cached = CachedSearchTool(tool, 'wikipedia')
+    cached.invoke('LangGraph')
+    assert cached.invoke('langgraph!') == 'result for LangGraph'
+    assert tool.queries == ['LangGraph']
+    assert cached.stats() == {'hits': 1, 'misses': 1, 'coalesced': 0}
+
+
+def test_memory_tier_is_bounded():
+    tool = CountingTool()
+    cached = CachedSearchTool(tool, 'wikipedia', max_entries=2)
+    for query in ('a', 'b', 'a', 'c', 'a', 'b'):
+        cached.invoke(query)
+    # 'b' was the least recently used when 'c' arrived
+    assert tool.queries == ['a', 'b', 'c', 'b']
+    assert len(cached._memory) == 2
+
+
+def test_results_outlive_the_process_until_they_expire(tmp_path):
+    path = str(tmp_path / 'search_cache.sqlite')
+    store = SearchResultStore(path)
+    assert not os.path.exists(path)
+    CachedSearchTool(CountingTool(), 'duck_duck_go', store).invoke('vector databases')
+
+    tool = CountingTool()
+    assert CachedSearchTool(tool, 'duck_duck_go', SearchResultStore(path)).invoke('Vector databases') == 'result for vector databases'
+    assert tool.queries == []
+
+    expired = CachedSearchTool(tool, 'duck_duck_go', SearchResultStore(path), ttl=0)
+    time.sleep(0.01)
+    expired.invoke('vector databases')
+    assert tool.queries == ['vector databases']
+
+
+def test_concurrent_sync_calls_share_one_request():
+    tool = CountingTool(delay=0.1)
+    cached = CachedSearchTool(tool, 'wikipedia')
+    threads = [threading.Thread(target=cached.invoke, args=('LangGraph',)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tool.queries == ['LangGraph']
+    assert cached.stats()['coalesced'] == 3
+
+
+def test_concurrent_async_calls_share_one_request():
+    tool = CountingTool(delay=0.05)
+    cached = CachedSearchTool(tool, 'wikipedia')
+
+    async def main():
+        return await asyncio.gather(*(cached.ainvoke('LangGraph') for _ in range(4)))
+
+    assert asyncio.run(main()) == ['result for LangGraph'] * 4
+    assert tool.queries == ['LangGraph']
+    assert cached.stats() == {'hits': 0, 'misses': 1, 'coalesced': 3}
@@ -0,0 +1,62 @@
+import threading
+import time
+import pytest
+from startup import Lazy, run_in_background
+
+
+class FakeRoot:
+    """Keeps the callbacks scheduled with after(); run() calls them on this thread, as the Tk loop would."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback, *args):
+        self.scheduled.append((callback, args))
+
+    def run(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.scheduled:
+            assert time.monotonic() < deadline, 'still polling'
+            callback, args = self.scheduled.pop(0)
+            callback(*args)
+            time.sleep(0.001)
+
+
+def fail():
+    raise RuntimeError('no model')
+
+
+def test_done_runs_on_the_polling_thread_with_the_result():
+    root = FakeRoot()
+    calls = []
+    run_in_background(root, lambda: 42, lambda result: calls.append((result, threading.current_thread())), poll_ms=1)
+    root.run()
+    assert calls == [(42, threading.current_thread())]
+
+
+def test_a_failed_load_reaches_on_error():
+    root = FakeRoot()
+    done, errors = [], []
+    run_in_background(root, fail, done.append, errors.append, poll_ms=1)
+    root.run()
+    assert done == [] and [str(error) for error in errors] == ['no model']
+
+
+def test_without_on_error_the_failure_is_raised_on_the_loop():
+    root = FakeRoot()
+    run_in_background(root, fail, lambda result: None, poll_ms=1)
+    with pytest.raises(RuntimeError, match='no model'):
+        root.run()
+
+
+def test_lazy_builds_once_on_first_use():
+    built = []
+
+    def factory():
+        built.append(1)
+        return 'value'
+
+    lazy = Lazy(factory)
+    assert not lazy.built
+    assert lazy.upper() == 'VALUE' and lazy.title() == 'Value'
+    assert lazy.built and built == [1]
@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+from types import SimpleNamespace
+import pytest
+from synthesis import NOSTREAM_TAG, Synthesizer, section_parts
+from token_budget import count_tokens
+
+TOPIC = 'Vector Search'
+
+
+class FakeLLM:
+    """Answers every prompt with a short summary; records the prompts, their tags and whether a slot was held."""
+
+    def __init__(self):
+        self.prompts = []
+        self.tags = []
+        self.in_slot = []
+        self.slots_held = 0
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=f'Summary {len(self.prompts)}.')
+
+    async def ainvoke(self, prompt, config=None):
+        self.tags.append((config or {}).get('tags', []))
+        self.in_slot.append(self.slots_held > 0)
+        await asyncio.sleep(0)
+        return self.invoke(prompt)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        self.slots_held += 1
+        try:
+            yield
+        finally:
+            self.slots_held -= 1
+
+
+def sentences(n: int, start: int = 0) -> str:
+    return ' '.join(f'Point {i} of the section is explained here.' for i in range(start, start + n))
+
+
+def sections(n: int, length: int = 12):
+    return section_parts([(f'Title {i}', sentences(length, i * length)) for i in range(n)])
+
+
+def test_section_parts_are_numbered_in_order():
+    assert section_parts([('Intro', 'Text.'), ('End', '')]) == ['## Section 1: Intro\nText.', '## Section 2: End']
+
+
+def test_an_oversized_part_is_cut_at_sentence_breaks():
+    synthesizer = Synthesizer(FakeLLM(), tokens=100)
+    part = sentences(40)
+    leaves = synthesizer.leaves([part, 'Short.'])
+    assert len(leaves) > 2 and leaves[-1] == 'Short.'
+    assert all(count_tokens(leaf) <= 100 for leaf in leaves)
+    assert ' '.join(leaves[:-1]) == part
+
+
+def test_groups_close_at_fan_in_or_at_the_budget():
+    synthesizer = Synthesizer(FakeLLM(), fan_in=3, tokens=100)
+    small = ['a' * 40] * 7
+    assert [len(group) for group in synthesizer.groups(small)] == [3, 3, 1]
+    large = ['a' * 200] * 3
+    assert [len(group) for group in synthesizer.groups(large)] == [1, 1, 1]
+
+
+def test_every_call_fits_the_budget_and_one_writes_the_note():
+    llm = FakeLLM()
+    synthesizer = Synthesizer(llm, fan_in=2, tokens=300)
+    note = synthesizer.run(TOPIC, sections(6))
+    assert note == f'Summary {len(llm.prompts)}.'
+    assert synthesizer.stats['merge_calls'] == len(llm.prompts) - 1 > 0
+    assert synthesizer.stats['max_call_tokens'] <= 300
+    assert llm.prompts[-1] == synthesizer.final_prompt(TOPIC, ['Summary 1.', 'Summary 2.', 'Summary 3.'])
+
+
+def test_single_mode_makes_one_call_however_long():
+    llm = FakeLLM()
+    synthesizer = Synthesizer(llm, tokens=300, mode='single')
+    parts = sections(6)
+    synthesizer.run(TOPIC, parts)
+    assert llm.prompts == [synthesizer.final_prompt(TOPIC, parts)]
+    with pytest.raises(ValueError):
+        Synthesizer(llm, mode='flat')
+
+
+def test_async_calls_each_hold_a_slot_and_only_the_final_one_streams():
+    llm = FakeLLM()
+    synthesizer = Synthesizer(llm, fan_in=2, tokens=300)
+    note = asyncio.run(synthesizer.arun(TOPIC, sections(6), llm_slot=llm.slot))
+    assert note == f'Summary {len(llm.prompts)}.'
+    assert len(llm.in_slot) > 1 and all(llm.in_slot)
+    assert llm.tags[:-1] == [[NOSTREAM_TAG]] * (len(llm.tags) - 1) and llm.tags[-1] == []
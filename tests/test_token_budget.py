@@ -0,0 +1,44 @@
+from token_budget import MIN_PARTIAL_TOKENS, count_tokens, dedupe_sentences, pack, split_sentences, truncate_to_tokens
+
+BOILERPLATE = 'This manual describes the installation of the vector search service.'
+
+
+def passage(sentences: int, start: int = 0) -> str:
+    return ' '.join(f'Sentence number {i} says something specific.' for i in range(start, start + sentences))
+
+
+def test_split_sentences_keeps_the_text():
+    text = 'First one. Second one?\nThird one! Last'
+    assert split_sentences(text) == ['First one. ', 'Second one?\n', 'Third one! ', 'Last']
+    assert ''.join(split_sentences(text)) == text
+
+
+def test_truncate_keeps_whole_sentences_then_whole_words():
+    text = passage(10)
+    short = truncate_to_tokens(text, 30)
+    assert text.startswith(short) and short.endswith('.')
+    assert count_tokens(short) <= 30
+    assert truncate_to_tokens(text, 1000) == text
+    assert truncate_to_tokens('one two three four five six', 3) == 'one two'
+
+
+def test_dedupe_drops_long_repeats_only():
+    first = f'{BOILERPLATE} See above. Alpha is first.'
+    second = f'{BOILERPLATE.upper()} See above. Beta is second.'
+    assert dedupe_sentences([first, second, BOILERPLATE]) == [first, 'See above. Beta is second.']
+
+
+def test_pack_fills_the_budget_best_first():
+    passages = [passage(4), passage(4, 4), passage(20, 8), passage(4, 28)]
+    budget = count_tokens(passages[0]) + count_tokens(passages[1]) + 1 + MIN_PARTIAL_TOKENS + 20
+    packed = pack(passages, budget)
+    assert packed[:2] == passages[:2]
+    # the third passage is cut to what is left; the fourth, although short, comes after it
+    assert len(packed) == 3 and passages[2].startswith(packed[2]) and packed[2] != passages[2]
+    assert count_tokens('\n\n'.join(packed)) <= budget
+
+
+def test_pack_leaves_out_a_passage_that_would_be_cut_too_short():
+    passages = [passage(4), passage(20, 4)]
+    assert pack(passages, count_tokens(passages[0]) + MIN_PARTIAL_TOKENS - 1) == passages[:1]
+    assert pack(passages, 0) == []
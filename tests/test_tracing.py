@@ -0,0 +1,21 @@
+import pytest
+from tracing import traced
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_note_taker_spans_get_a_lane_per_section(fake_backend, tmp_path, parallel):
+    import note_taker
+    note_taker.router.log_path = None
+    fake_backend.sections = 3
+
+    with traced('note_taker-test', trace_dir=str(tmp_path)) as tracer:
+        state = note_taker.run_note_taker('Tracing Topic', parallel=parallel)
+
+    titles = set(state['sections'])
+    traced_titles = {span['title'] for span in tracer.spans if span['kind'] in ('node', 'llm')}
+    assert titles <= traced_titles
+    # planning, the final note and (in parallel mode) the approvals join stay in the note lane
+    assert traced_titles - titles == {None}
+
+    lanes = {event['args']['name'] for event in tracer.chrome_trace()['traceEvents'] if event['name'] == 'thread_name'}
+    assert lanes == titles | {'note'}
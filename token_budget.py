@@ -0,0 +1,84 @@
+import math
+import os
+import re
+from typing import List
+
+# the local models' tokenizers are not available offline; ~4 characters per token holds for English prose
+CHARS_PER_TOKEN = 4.0
+# prompt tokens spent on retrieved context, per model (CONTEXT_TOKENS overrides)
+CONTEXT_TOKEN_BUDGETS = {
+    'gemma3:4b': 1024,
+}
+DEFAULT_CONTEXT_TOKENS = 1024
+# shorter repeated sentences ("See above.") are left alone
+MIN_DUPLICATE_CHARS = 40
+# a passage cut to fit the budget keeps at least this much, or is left out
+MIN_PARTIAL_TOKENS = 32
+
+_SENTENCE_BREAK = re.compile(r'((?<=[.!?])\s+|\n+)')
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def context_budget(model: str) -> int:
+    if os.environ.get('CONTEXT_TOKENS'):
+        return int(os.environ['CONTEXT_TOKENS'])
+    return CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences with their trailing whitespace, so ''.join() gives back the text."""
+    parts = _SENTENCE_BREAK.split(text)
+    return [sentence + separator for sentence, separator in zip(parts[::2], parts[1::2] + [''])]
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """The longest run of whole sentences within `tokens` (whole words if not even one sentence fits)."""
+    if count_tokens(text) <= tokens:
+        return text
+    kept = ''
+    for sentence in split_sentences(text):
+        if count_tokens(kept + sentence) > tokens:
+            break
+        kept += sentence
+    if not kept:
+        kept = text[:int(tokens * CHARS_PER_TOKEN)].rsplit(' ', 1)[0]
+    return kept.rstrip()
+
+
+def dedupe_sentences(passages: List[str]) -> List[str]:
+    """Drops sentences already seen in an earlier passage (boilerplate, overlap left after merging)."""
+    seen = set()
+    deduped = []
+    for passage in passages:
+        kept = []
+        for sentence in split_sentences(passage):
+            key = ' '.join(sentence.lower().split())
+            if len(key) >= MIN_DUPLICATE_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(sentence)
+        text = ''.join(kept).strip()
+        if text:
+            deduped.append(text)
+    return deduped
+
+
+def pack(passages: List[str], budget: int, separator: str = '\n\n') -> List[str]:
+    """Best-first greedy packing: whole passages while they fit, then what fits of the next one."""
+    packed = []
+    used = 0
+    for passage in passages:
+        cost = count_tokens(passage) + (count_tokens(separator) if packed else 0)
+        if used + cost <= budget:
+            packed.append(passage)
+            used += cost
+            continue
+        remaining = budget - used - (count_tokens(separator) if packed else 0)
+        if remaining >= MIN_PARTIAL_TOKENS:
+            packed.append(truncate_to_tokens(passage, remaining))
+        break
+    return packed
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+# TRACE_DIR=./traces turns tracing on for the run_* entry points
+TRACE_DIR_ENV = 'TRACE_DIR'
+
+_active_tracer: ContextVar[Optional['NodeTracer']] = ContextVar('node_tracer', default=None)
+# every runnable started while a tracer is active reports to it, graphs nested in nodes included
+register_configure_hook(_active_tracer, inheritable=True)
+
+
+class NodeTracer(BaseCallbackHandler):
+    """Records a span for every graph, graph node, LLM call and tool (search) call.
+
+    Chains inside a node (prompts, parsers, channel writes) are not recorded;
+    their children hang off the nearest recorded ancestor. Each span carries the
+    thread id, the section title of the state it runs on, and its parent span.
+    """
+
+    run_inline = True
+
+    def __init__(self, name: str = 'trace'):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._open: Dict[UUID, dict] = {}
+        # run id -> nearest recorded span (itself when recorded), for every live run
+        self._anchor: Dict[UUID, Optional[dict]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, kind: str, name: str, run_id: UUID, parent_run_id: Optional[UUID],
+               metadata: Optional[dict], title: Optional[str] = None, record: bool = True):
+        metadata = metadata or {}
+        with self._lock:
+            parent = self._anchor.get(parent_run_id) if parent_run_id else None
+            if not record:
+                self._anchor[run_id] = parent
+                return
+            span = {
+                'id': len(self.spans) + 1,
+                'kind': kind,
+                'name': name,
+                'parent': parent['id'] if parent else None,
+                'thread_id': metadata.get('thread_id') or (parent['thread_id'] if parent else None),
+                'title': title or (parent['title'] if parent else None),
+                'start': time.perf_counter() - self.origin,
+                'end': None,
+            }
+            self.spans.append(span)
+            self._open[run_id] = span
+            self._anchor[run_id] = span
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None):
+        with self._lock:
+            self._anchor.pop(run_id, None)
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            span['end'] = time.perf_counter() - self.origin
+            if error is not None:
+                span['error'] = f'{type(error).__name__}: {error}'
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs: Any):
+        metadata = metadata or {}
+        name = name or (serialized or {}).get('name', 'chain')
+        if parent_run_id is None or parent_run_id not in self._anchor or name == 'LangGraph':
+            # top-level runs, and section graphs started from inside a note node
+            kind = 'graph'
+        elif name == metadata.get('langgraph_node'):
+            kind = 'node'
+        else:
+            self._start('chain', name, run_id, parent_run_id, metadata, record=False)
+            return
+        self._start(kind, name, run_id, parent_run_id, metadata, title=_section_title(inputs))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any):
+        # GraphInterrupt (human approval) ends a run too; it is not a failure
+        self._end(run_id, None if type(error).__name__ == 'GraphInterrupt' else error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs: Any):
+        model = (metadata or {}).get('ls_model_name') or name or 'llm'
+        self._start('llm', model, run_id, parent_run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs: Any):
+        self._start('llm', name or 'llm', run_id, parent_run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs: Any):
+        name = name or (serialized or {}).get('name', 'tool')
+        self._start('search', name, run_id, parent_run_id, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error)
+
+    def chrome_trace(self) -> dict:
+        """Chrome trace-event JSON (chrome://tracing, Perfetto): one lane per section."""
+        lanes = {}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': self.name}}]
+        now = time.perf_counter() - self.origin
+        for span in self.spans:
+            lane = span['title'] or 'note'
+            if lane not in lanes:
+                lanes[lane] = len(lanes) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lanes[lane], 'args': {'name': lane}})
+            end = span['end'] if span['end'] is not None else now
+            args = {key: span[key] for key in ('id', 'parent', 'thread_id', 'title', 'error') if span.get(key) is not None}
+            events.append({
+                'name': span['name'],
+                'cat': span['kind'],
+                'ph': 'X',
+                'ts': round(span['start'] * 1e6),
+                'dur': round((end - span['start']) * 1e6),
+                'pid': 1,
+                'tid': lanes[lane],
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def report(self):
+        """Total and count per span kind and name, slowest first."""
+        totals = {}
+        for span in self.spans:
+            if span['end'] is None or span['kind'] == 'graph':
+                continue
+            key = (span['kind'], span['name'])
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + span['end'] - span['start'], count + 1)
+        for (kind, name), (total, count) in sorted(totals.items(), key=lambda item: item[1][0], reverse=True):
+            print(f"TRACE {kind} {name!r}: {total:.2f}s in {count} call(s)")
+
+
+def _section_title(inputs) -> Optional[str]:
+    """The section a node's input state is about, if any.
+
+    section_graph states carry their title; note_taker states carry the planned
+    titles and the one being worked on (SectionTask.index, NoteState.current_section_index).
+    """
+    if not isinstance(inputs, dict):
+        title = getattr(inputs, 'title', None)
+    elif 'title' in inputs:
+        title = inputs['title']
+    elif inputs.get('drafted_sections'):
+        # the parallel join works on every section at once
+        title = None
+    else:
+        sections = inputs.get('sections')
+        index = inputs.get('index', inputs.get('current_section_index'))
+        in_range = isinstance(sections, list) and isinstance(index, int) and 0 <= index < len(sections)
+        title = sections[index] if in_range else None
+    return title if isinstance(title, str) and title else None
+
+
+@contextmanager
+def traced(name: str, trace_dir: Optional[str] = None):
+    """Trace every graph run inside the block and write <trace_dir>/<name>-<time>.json.
+
+    A no-op unless `trace_dir` or TRACE_DIR is set; nested blocks join the outer trace.
+    """
+    trace_dir = trace_dir or os.environ.get(TRACE_DIR_ENV)
+    outer = _active_tracer.get()
+    if outer is not None or not trace_dir:
+        yield outer
+        return
+
+    tracer = NodeTracer(name)
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+        os.makedirs(trace_dir, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '-' for c in name)[:60]
+        path = os.path.join(trace_dir, f"{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        tracer.export(path)
+        tracer.report()
+        print("TRACE WRITTEN:", path)